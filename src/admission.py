@@ -0,0 +1,286 @@
+"""
+Admission control and backpressure for conversation turns
+
+LEARNING NOTES:
+===============
+Every `send_message` event becomes a model call lasting seconds. Without a
+limit, a client that auto-retries (or a burst of users) can start an
+unbounded number of concurrent calls: the deployment starts returning 429s,
+every reply gets slower, and two turns of the same conversation can run at
+once and interleave their replies in the history.
+
+The AdmissionController sits in front of the model call:
+
+1. **Per-conversation serialization**: one turn per conversation runs at a
+   time. A newer turn supersedes an older one still waiting (its reply would
+   be stale anyway - the newer turn answers with the full history)
+2. **Per-connection limit**: one socket cannot hold more than N turns
+   (running + waiting)
+3. **Global bounded queue**: at most MAX_CONCURRENT turns run; the rest wait
+   in FIFO order and are told their queue position (`queued` event)
+4. **Load shedding**: if the estimated queue wait exceeds the SLO, or the
+   queue is full, the turn is rejected immediately with a `retry_after`
+   hint - failing fast is kinder than a reply that arrives after the user gave up
+
+KEY CONCEPTS:
+- Little's law: expected wait ~ (turns ahead / concurrency) x average turn time
+- The average turn time is an EWMA of completed turns, so the estimate
+  follows the model's current latency
+- Under eventlet, threading.Condition is green: waiting parks only the
+  greenlet handling that event, never the worker
+"""
+import math
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, Optional
+
+import metrics
+
+# Ticket states
+QUEUED = "queued"
+RUNNING = "running"
+SUPERSEDED = "superseded"
+CANCELLED = "cancelled"
+DONE = "done"
+
+# Rejection reasons (also the values of the "reason" metric label)
+REASON_CONNECTION_LIMIT = "connection_limit"
+REASON_QUEUE_FULL = "queue_full"
+REASON_OVERLOADED = "overloaded"
+
+
+class AdmissionRejected(Exception):
+    """Raised when a turn is shed instead of queued"""
+
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class Ticket:
+    """A turn's place in the admission queue"""
+
+    __slots__ = ("sid", "conversation_id", "state", "enqueued_at", "started_at")
+
+    def __init__(self, sid: Optional[str], conversation_id: str):
+        self.sid = sid
+        self.conversation_id = conversation_id
+        self.state = QUEUED
+        self.enqueued_at = time.perf_counter()
+        self.started_at: Optional[float] = None
+
+    @property
+    def admitted(self) -> bool:
+        return self.state == RUNNING
+
+
+class AdmissionController:
+    """Bounded concurrency with per-conversation serialization and load shedding"""
+
+    # Weight of the newest turn in the running average turn duration
+    EWMA_ALPHA = 0.2
+
+    def __init__(self,
+                 max_concurrent: int = 16,
+                 max_queue: int = 64,
+                 per_connection: int = 2,
+                 queue_slo_seconds: float = 10.0,
+                 initial_turn_seconds: float = 3.0):
+        """
+        Args:
+            max_concurrent: Turns allowed to run at once on this replica
+            max_queue: Turns allowed to wait; beyond this new turns are rejected
+            per_connection: Turns (running + waiting) a single socket may hold
+            queue_slo_seconds: Reject turns whose estimated wait exceeds this
+            initial_turn_seconds: Turn duration assumed before any turn completed
+        """
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_queue = max_queue
+        self.per_connection = per_connection
+        self.queue_slo_seconds = queue_slo_seconds
+        self._avg_turn_seconds = initial_turn_seconds
+
+        self._cond = threading.Condition()
+        self._queue: Deque[Ticket] = deque()
+        self._running_conversations: set = set()
+        self._running = 0
+        self._by_sid: Dict[str, int] = {}
+        self._waiting_by_conversation: Dict[str, Ticket] = {}
+
+        metrics.ADMISSION_QUEUE_DEPTH.set_callback(lambda: len(self._queue))
+        metrics.ADMISSION_RUNNING.set_callback(lambda: self._running)
+
+    # ------------------------------------------------------------------
+    # Admission
+    # ------------------------------------------------------------------
+    def enqueue(self, sid: Optional[str], conversation_id: str) -> Ticket:
+        """
+        Reserve a place for a turn, or raise AdmissionRejected
+
+        Always pair with release(), whatever happens afterwards.
+        """
+        with self._cond:
+            # A newer turn replaces an older one still waiting for this conversation
+            previous = self._waiting_by_conversation.get(conversation_id)
+
+            held = self._by_sid.get(sid, 0) - (1 if previous is not None and previous.sid == sid else 0)
+            if sid and self.per_connection and held >= self.per_connection:
+                self._reject(REASON_CONNECTION_LIMIT, self._avg_turn_seconds)
+
+            waiting = len(self._queue) - (1 if previous is not None else 0)
+
+            if self._running >= self.max_concurrent or waiting:
+                if waiting >= self.max_queue:
+                    self._reject(REASON_QUEUE_FULL, self.estimated_wait(waiting + 1))
+                estimate = self.estimated_wait(waiting + 1)
+                if self.queue_slo_seconds and estimate > self.queue_slo_seconds:
+                    self._reject(REASON_OVERLOADED, estimate)
+
+            if previous is not None:
+                self._finish_waiting(previous, SUPERSEDED)
+            ticket = Ticket(sid, conversation_id)
+            self._queue.append(ticket)
+            self._waiting_by_conversation[conversation_id] = ticket
+            if sid:
+                self._by_sid[sid] = self._by_sid.get(sid, 0) + 1
+            self._cond.notify_all()
+            return ticket
+
+    def wait(self, ticket: Ticket,
+             on_position: Optional[Callable[[int, float], None]] = None) -> bool:
+        """
+        Block until the ticket may run
+
+        on_position(position, estimated_wait_seconds) is called whenever the
+        ticket's 1-based queue position changes while it waits.
+
+        Returns:
+            True once admitted; False if the turn was superseded or cancelled
+        """
+        reported = None
+        with self._cond:
+            while True:
+                if ticket.state != QUEUED:
+                    break
+                if self._grantable() is ticket:
+                    self._grant(ticket)
+                    break
+                position = self._position(ticket)
+                if on_position and position != reported:
+                    reported = position
+                    estimate = self.estimated_wait(position)
+                    # Don't emit while holding the lock
+                    self._cond.release()
+                    try:
+                        on_position(position, estimate)
+                    finally:
+                        self._cond.acquire()
+                    continue
+                self._cond.wait(timeout=1.0)
+        metrics.ADMISSION_WAIT_SECONDS.labels(outcome=ticket.state).observe(
+            time.perf_counter() - ticket.enqueued_at
+        )
+        return ticket.admitted
+
+    def release(self, ticket: Ticket) -> None:
+        """Free a ticket's slot (running) or queue place (still waiting)"""
+        with self._cond:
+            if ticket.state == QUEUED:
+                self._finish_waiting(ticket, CANCELLED)
+            elif ticket.state == RUNNING:
+                ticket.state = DONE
+                self._running -= 1
+                self._running_conversations.discard(ticket.conversation_id)
+                duration = time.perf_counter() - ticket.started_at
+                self._avg_turn_seconds += self.EWMA_ALPHA * (duration - self._avg_turn_seconds)
+            else:
+                return
+            self._release_sid(ticket.sid)
+            self._cond.notify_all()
+
+    def cancel_sid(self, sid: str) -> int:
+        """Drop every waiting turn of a disconnected socket; returns how many"""
+        with self._cond:
+            tickets = [t for t in self._queue if t.sid == sid]
+            for ticket in tickets:
+                self._finish_waiting(ticket, CANCELLED)
+                self._release_sid(sid)
+            if tickets:
+                self._cond.notify_all()
+            return len(tickets)
+
+    # ------------------------------------------------------------------
+    # Internals (caller holds the lock)
+    # ------------------------------------------------------------------
+    def _reject(self, reason: str, retry_after: float) -> None:
+        metrics.ADMISSION_REJECTED_TOTAL.labels(reason=reason).inc()
+        raise AdmissionRejected(reason, max(1, math.ceil(retry_after)))
+
+    def _grantable(self) -> Optional[Ticket]:
+        """The oldest waiting ticket whose conversation is idle, if a slot is free"""
+        if self._running >= self.max_concurrent:
+            return None
+        for ticket in self._queue:
+            if ticket.conversation_id not in self._running_conversations:
+                return ticket
+        return None
+
+    def _grant(self, ticket: Ticket) -> None:
+        self._queue.remove(ticket)
+        if self._waiting_by_conversation.get(ticket.conversation_id) is ticket:
+            del self._waiting_by_conversation[ticket.conversation_id]
+        ticket.state = RUNNING
+        ticket.started_at = time.perf_counter()
+        self._running += 1
+        self._running_conversations.add(ticket.conversation_id)
+        # Positions behind this ticket changed
+        self._cond.notify_all()
+
+    def _finish_waiting(self, ticket: Ticket, state: str) -> None:
+        ticket.state = state
+        try:
+            self._queue.remove(ticket)
+        except ValueError:
+            pass
+        if self._waiting_by_conversation.get(ticket.conversation_id) is ticket:
+            del self._waiting_by_conversation[ticket.conversation_id]
+        if state == SUPERSEDED:
+            # The superseded turn's own release() must not free the newer turn's sid slot
+            self._release_sid(ticket.sid)
+            ticket.sid = None
+
+    def _release_sid(self, sid: Optional[str]) -> None:
+        if not sid:
+            return
+        remaining = self._by_sid.get(sid, 0) - 1
+        if remaining > 0:
+            self._by_sid[sid] = remaining
+        else:
+            self._by_sid.pop(sid, None)
+
+    def _position(self, ticket: Ticket) -> int:
+        for index, queued in enumerate(self._queue):
+            if queued is ticket:
+                return index + 1
+        return 0
+
+    # ------------------------------------------------------------------
+    # Reporting
+    # ------------------------------------------------------------------
+    def estimated_wait(self, position: int) -> float:
+        """Expected seconds until a turn at this queue position starts"""
+        return math.ceil(position / self.max_concurrent) * self._avg_turn_seconds
+
+    def get_stats(self) -> Dict:
+        with self._cond:
+            return {
+                "running": self._running,
+                "queued": len(self._queue),
+                "max_concurrent": self.max_concurrent,
+                "max_queue": self.max_queue,
+                "per_connection": self.per_connection,
+                "queue_slo_seconds": self.queue_slo_seconds,
+                "avg_turn_seconds": round(self._avg_turn_seconds, 3),
+            }
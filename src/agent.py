@@ -1,18 +1,32 @@
 """
 Voice Agent Implementation using Azure OpenAI
 """
+import math
 import os
-from typing import Dict, List, Optional
-from azure.identity import DefaultAzureCredential
-from openai import AzureOpenAI
+import time
+from typing import Dict, List, Optional, Union
 from config import Config
+from generation_tracker import GenerationHandle
+from messages import Message
+from model_routing import CONVERSATION, EVALUATION, ModelRoute, build_routes
+import metrics
+from log_service import get_logger
+
+log = get_logger("agent")
+
+# Rubric criteria, in the order the evaluation prompt lists them
+EVALUATION_CRITERIA = ("professionalism", "communication", "problem_resolution", "empathy", "efficiency")
 
 # Import OpenTelemetry for tracing
-try:
-    from opentelemetry import trace
-    tracer = trace.get_tracer(__name__)
-except ImportError:
-    tracer = None
+# Only when App Insights is configured - without an exporter spans are no-ops,
+# so skipping the import keeps cold start and test imports fast
+tracer = None
+if os.getenv('APPLICATIONINSIGHTS_CONNECTION_STRING'):
+    try:
+        from opentelemetry import trace
+        tracer = trace.get_tracer(__name__)
+    except ImportError:
+        tracer = None
 
 class VoiceAgent:
     """AI Voice Agent for customer service interactions"""
@@ -20,19 +34,24 @@ class VoiceAgent:
     def __init__(self):
         """Initialize the voice agent with Azure AI Foundry connection"""
         self.config = Config()
+        self.routes = build_routes(self.config)
         self.agent = None
         self._initialize_agent()
     
     def _initialize_agent(self):
         """Set up the agent with Microsoft Agent Framework"""
         try:
+            # Azure SDK imports are deferred until the agent is first warmed up
+            from azure.identity import DefaultAzureCredential
+            from openai import AzureOpenAI
+            
             # Initialize Azure OpenAI client
             # Use API key if provided, otherwise use DefaultAzureCredential (Azure CLI auth)
             if self.config.AZURE_AI_FOUNDRY_API_KEY:
                 self.client = AzureOpenAI(
                     azure_endpoint=self.config.AZURE_AI_FOUNDRY_ENDPOINT,
                     api_key=self.config.AZURE_AI_FOUNDRY_API_KEY,
-                    api_version="2024-08-01-preview"
+                    api_version=self.config.AZURE_OPENAI_API_VERSION
                 )
             else:
                 # Use Azure CLI credentials (DefaultAzureCredential)
@@ -44,24 +63,26 @@ class VoiceAgent:
                 self.client = AzureOpenAI(
                     azure_endpoint=self.config.AZURE_AI_FOUNDRY_ENDPOINT,
                     azure_ad_token=token.token,
-                    api_version="2024-08-01-preview"
+                    api_version=self.config.AZURE_OPENAI_API_VERSION
                 )
             
             # Store agent configuration
             self.agent = {
                 "name": self.config.AGENT_NAME,
                 "description": self.config.AGENT_DESCRIPTION,
-                "model": self.config.AZURE_AI_MODEL_NAME,
+                "model": self.routes[CONVERSATION].deployment,
                 "system_prompt": self.config.AGENT_SYSTEM_PROMPT
             }
             
-            print(f"✓ Voice agent '{self.config.AGENT_NAME}' initialized successfully")
+            log.info("agent_initialized", agent=self.config.AGENT_NAME,
+                     conversation_model=self.routes[CONVERSATION].deployment,
+                     evaluation_model=self.routes[EVALUATION].deployment)
             
         except Exception as e:
-            print(f"✗ Failed to initialize voice agent: {str(e)}")
+            log.error("agent_init_failed", error=str(e))
             raise
     
-    async def process_message(self, user_message: str, conversation_history: List[Dict] = None, mood: str = "neutral", is_scenario_prompt: bool = False) -> Dict:
+    async def process_message(self, user_message: str, conversation_history: List[Union[Message, Dict]] = None, mood: str = "neutral", is_scenario_prompt: bool = False, generation: Optional[GenerationHandle] = None, max_tokens: Optional[int] = None) -> Dict:
         """
         Process a user message and return the agent's response
         
@@ -70,9 +91,12 @@ class VoiceAgent:
             conversation_history: Optional list of previous messages
             mood: The customer's emotional state (neutral, happy, curious, frustrated, confused, impatient)
             is_scenario_prompt: If True, treat message as scenario trigger (AI initiates conversation)
+            generation: Optional handle used to cancel the model call (barge-in / disconnect)
+            max_tokens: Reply length cap (defaults to AGENT_MAX_TOKENS; lowered by token budgets)
             
         Returns:
-            Dictionary containing the response and metadata
+            Dictionary containing the response and metadata.
+            If the generation was cancelled, "success" is False and "cancelled" is True.
         """
         # Create a trace span for this operation if tracing is enabled
         if tracer:
@@ -80,13 +104,18 @@ class VoiceAgent:
                 span.set_attribute("cora.mood", mood)
                 span.set_attribute("cora.is_scenario_prompt", is_scenario_prompt)
                 span.set_attribute("cora.message_length", len(user_message))
-                span.set_attribute("cora.model", self.config.AZURE_AI_MODEL_NAME)
-                return await self._process_message_internal(user_message, conversation_history, mood, is_scenario_prompt)
+                span.set_attribute("cora.model", self.routes[CONVERSATION].deployment)
+                return await self._process_message_internal(user_message, conversation_history, mood, is_scenario_prompt, generation, max_tokens)
         else:
-            return await self._process_message_internal(user_message, conversation_history, mood, is_scenario_prompt)
+            return await self._process_message_internal(user_message, conversation_history, mood, is_scenario_prompt, generation, max_tokens)
     
-    async def _process_message_internal(self, user_message: str, conversation_history: List[Dict] = None, mood: str = "neutral", is_scenario_prompt: bool = False) -> Dict:
+    async def _process_message_internal(self, user_message: str, conversation_history: List[Union[Message, Dict]] = None, mood: str = "neutral", is_scenario_prompt: bool = False, generation: Optional[GenerationHandle] = None, max_tokens: Optional[int] = None) -> Dict:
         """Internal implementation of message processing"""
+        labels = {"route": metrics.ROUTE_SEND_MESSAGE, "mood": metrics.mood_label(mood)}
+        route = self.routes[CONVERSATION]
+        assembly_started = time.perf_counter()
+        # Prompt tokens billed once the request is sent (estimate until usage arrives)
+        prompt_estimate = 0
         try:
             # Define mood-specific behavior instructions
             mood_contexts = {
@@ -112,33 +141,76 @@ class VoiceAgent:
             # Add conversation history (skip system messages from history)
             if conversation_history:
                 for msg in conversation_history:
-                    if msg.get("role") != "system":
-                        messages.append({"role": msg["role"], "content": msg["content"]})
+                    msg = Message.coerce(msg)
+                    if msg.role != "system":
+                        messages.append({"role": msg.role, "content": msg.content})
             
             # Add current user message
             messages.append({"role": "user", "content": user_message})
+            metrics.PROMPT_ASSEMBLY_SECONDS.labels(**labels).observe(time.perf_counter() - assembly_started)
             
             # Call Azure OpenAI with stored completions enabled
-            response = self.client.chat.completions.create(
-                model=self.config.AZURE_AI_MODEL_NAME,
+            # Streaming lets a barge-in or disconnect close the response early,
+            # which stops the model from generating (and billing) more tokens
+            call_started = time.perf_counter()
+            prompt_estimate = sum(len(m["content"]) for m in messages) // 4
+            stream = self.client.chat.completions.create(
                 messages=messages,
-                temperature=0.7,
-                max_tokens=800,
-                store=True  # Enable stored completions for data loss prevention
+                **route.request_options(max_tokens=max_tokens),
+                store=True,  # Enable stored completions for data loss prevention
+                stream=True,
+                stream_options={"include_usage": True}
             )
+            if generation:
+                generation.attach_stream(stream)
+            
+            parts = []
+            usage = None
+            first_token_at = None
+            try:
+                for chunk in stream:
+                    if generation and generation.cancelled:
+                        break
+                    if getattr(chunk, "usage", None):
+                        usage = chunk.usage
+                    if chunk.choices:
+                        delta = chunk.choices[0].delta.content
+                        if delta:
+                            if first_token_at is None:
+                                first_token_at = time.perf_counter()
+                                metrics.MODEL_TTFT_SECONDS.labels(**labels).observe(first_token_at - call_started)
+                            parts.append(delta)
+                            if generation:
+                                generation.completion_tokens += 1
+            finally:
+                stream.close()
+            
+            if generation and generation.cancelled:
+                return self._cancelled_result(generation, usage.prompt_tokens if usage else prompt_estimate)
+            
+            assistant_message = "".join(parts)
             
-            assistant_message = response.choices[0].message.content
+            # Usage arrives on the final chunk; fall back to the streamed chunk count
+            if usage:
+                prompt_tokens = usage.prompt_tokens
+                completion_tokens = usage.completion_tokens
+            else:
+                prompt_tokens = prompt_estimate
+                completion_tokens = len(parts)
+            if generation:
+                generation.completion_tokens = completion_tokens
+            self._record_call_metrics(labels, call_started, prompt_tokens, completion_tokens, route)
             
             result = {
                 "success": True,
                 "response": assistant_message,
                 "metadata": {
                     "agent_name": self.agent["name"],
-                    "model": self.config.AZURE_AI_MODEL_NAME,
+                    "model": route.deployment,
                     "usage": {
-                        "prompt_tokens": response.usage.prompt_tokens,
-                        "completion_tokens": response.usage.completion_tokens,
-                        "total_tokens": response.usage.total_tokens
+                        "prompt_tokens": prompt_tokens,
+                        "completion_tokens": completion_tokens,
+                        "total_tokens": prompt_tokens + completion_tokens
                     }
                 }
             }
@@ -148,14 +220,19 @@ class VoiceAgent:
                 span = trace.get_current_span()
                 if span:
                     span.set_attribute("cora.response_length", len(assistant_message))
-                    span.set_attribute("cora.prompt_tokens", response.usage.prompt_tokens)
-                    span.set_attribute("cora.completion_tokens", response.usage.completion_tokens)
-                    span.set_attribute("cora.total_tokens", response.usage.total_tokens)
+                    span.set_attribute("cora.prompt_tokens", prompt_tokens)
+                    span.set_attribute("cora.completion_tokens", completion_tokens)
+                    span.set_attribute("cora.total_tokens", prompt_tokens + completion_tokens)
             
             return result
             
         except Exception as e:
-            print(f"Error processing message: {str(e)}")
+            # Closing the stream from another greenlet surfaces as a read error
+            if generation and generation.cancelled:
+                return self._cancelled_result(generation, prompt_estimate)
+            
+            metrics.MODEL_ERRORS_TOTAL.labels(**labels).inc()
+            log.error("process_message_failed", mood=mood, error=str(e))
             
             # Log error to trace if available
             if tracer:
@@ -170,20 +247,140 @@ class VoiceAgent:
                 "response": "I apologize, but I'm having trouble processing your request right now."
             }
     
-    def analyze_interaction(self, conversation: List[Dict]) -> Dict:
+    def _record_call_metrics(self, labels: Dict, call_started: float, prompt_tokens: int, completion_tokens: int,
+                             route: ModelRoute) -> None:
+        """Record latency and token usage for a completed model call, and SLO misses for its route"""
+        latency = time.perf_counter() - call_started
+        metrics.MODEL_LATENCY_SECONDS.labels(**labels).observe(latency)
+        if route.slo_seconds and latency > route.slo_seconds:
+            metrics.MODEL_SLO_MISSES_TOTAL.labels(route=route.name).inc()
+            log.sampled("model_slo_missed", route=route.name, deployment=route.deployment,
+                        latency_seconds=round(latency, 3), slo_seconds=route.slo_seconds)
+        for direction, tokens in (("in", prompt_tokens), ("out", completion_tokens)):
+            metrics.MODEL_TOKENS.labels(direction=direction, **labels).observe(tokens)
+            metrics.MODEL_TOKENS_TOTAL.labels(direction=direction, **labels).inc(tokens)
+    
+    def _cancelled_result(self, generation: GenerationHandle, prompt_tokens: int = 0) -> Dict:
+        """
+        Result returned when a generation was cancelled before completing
+        
+        prompt_tokens: the prompt is billed once the request was sent, even if
+        no reply is used (0 if it was never sent)
+        """
+        if tracer:
+            span = trace.get_current_span()
+            if span:
+                span.set_attribute("cora.cancelled", generation.cancel_reason or "unknown")
+                span.set_attribute("cora.completion_tokens", generation.completion_tokens)
+        return {
+            "success": False,
+            "cancelled": True,
+            "error": f"Generation cancelled ({generation.cancel_reason})",
+            "metadata": {
+                "cancel_reason": generation.cancel_reason,
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens_streamed": generation.completion_tokens
+            }
+        }
+    
+    def analyze_interaction(self, conversation: List[Dict], mood: str = "neutral", prescore=None) -> Dict:
         """
         Analyze a completed conversation using standardized 5-criteria scoring (1-5 each, total 25)
         
+        Transcripts longer than EVAL_CHUNK_THRESHOLD_CHARS are evaluated as
+        overlapping turn windows in parallel, then merged (see _analyze_chunked).
+        
         Args:
             conversation: List of messages in the conversation
+            mood: The conversation's customer mood (used to label metrics)
+            prescore: Optional prescorer.PreScore; its decision can skip the model
+                call ("skip") or switch to the compact rubric ("short")
             
         Returns:
-            Analysis results with standardized scores
+            Analysis results with standardized scores, plus "usage": the tokens of
+            every evaluation call made (summed over windows, failed ones included)
         """
-        analysis_prompt = f"""You are a customer service quality evaluator. Analyze the following conversation between a customer service agent and a customer (Cora).
-
+        mode = prescore.decision if prescore is not None else "full"
+        if mode == "skip":
+            metrics.EVALUATIONS_TOTAL.labels(mode="skipped").inc()
+            log.info("analysis_skipped", reason=prescore.reason, total_score=prescore.total_score)
+            return prescore.to_analysis()
+        
+        labels = {"route": metrics.ROUTE_ANALYZE, "mood": metrics.mood_label(mood)}
+        # (prompt_tokens, completion_tokens) per model call; appended from window threads
+        calls: List[tuple] = []
+        
+        try:
+            assembly_started = time.perf_counter()
+            transcript = self._format_conversation(conversation)
+            threshold = self.config.EVAL_CHUNK_THRESHOLD_CHARS
+            if threshold and len(transcript) > threshold:
+                analysis = self._analyze_chunked(conversation, labels, calls)
+            else:
+                # The short rubric asks for less prose and caps the reply
+                short = mode == "short"
+                analysis_prompt = self._rubric_prompt(transcript, short=short)
+                metrics.PROMPT_ASSEMBLY_SECONDS.labels(**labels).observe(time.perf_counter() - assembly_started)
+                analysis = self._evaluate(analysis_prompt, labels,
+                                          max_tokens=self.config.PRESCORE_SHORT_MAX_TOKENS if short else None,
+                                          calls=calls)
+                analysis["evaluation"] = "short" if short else "full"
+            metrics.EVALUATIONS_TOTAL.labels(mode=analysis["evaluation"]).inc()
+            analysis["usage"] = self._sum_usage(calls)
+            return analysis
+            
+        except Exception as e:
+            metrics.MODEL_ERRORS_TOTAL.labels(**labels).inc()
+            log.error("analysis_failed", error=str(e))
+            # Return default structure if analysis fails
+            return {
+                "scores": {
+                    "professionalism": 3,
+                    "communication": 3,
+                    "problem_resolution": 3,
+                    "empathy": 3,
+                    "efficiency": 3
+                },
+                "total_score": 15,
+                "strengths": ["Unable to analyze - error occurred"],
+                "improvements": ["Please try analyzing again"],
+                "overall_feedback": f"Analysis failed: {str(e)}",
+                "usage": self._sum_usage(calls)
+            }
+    
+    @staticmethod
+    def _sum_usage(calls: List[tuple]) -> Dict:
+        prompt_tokens = sum(prompt for prompt, _ in calls)
+        completion_tokens = sum(completion for _, completion in calls)
+        return {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens
+        }
+    
+    def _rubric_prompt(self, transcript: str, short: bool = False, part: Optional[tuple] = None) -> str:
+        """
+        Build the 5-criteria evaluation prompt for a transcript
+        
+        Args:
+            transcript: Formatted conversation (see _format_conversation)
+            short: Ask for one strength/improvement and a one-sentence summary
+            part: (index, count) when the transcript is one window of a longer conversation
+        """
+        list_size = 1 if short else 3
+        strengths = ", ".join(f'"strength {i}"' for i in range(1, list_size + 1))
+        improvements = ", ".join(f'"improvement {i}"' for i in range(1, list_size + 1))
+        feedback_length = "1 sentence" if short else "2-3 sentences"
+        excerpt_note = ""
+        if part:
+            excerpt_note = (f"\nThis is part {part[0]} of {part[1]} of a longer conversation (consecutive parts "
+                            f"overlap by a few turns). Score only the agent's behavior in this excerpt; for "
+                            f"Problem Resolution, score the progress made toward a resolution so far.\n")
+        
+        return f"""You are a customer service quality evaluator. Analyze the following conversation between a customer service agent and a customer (Cora).
+{excerpt_note}
 CONVERSATION:
-{self._format_conversation(conversation)}
+{transcript}
 
 Evaluate the agent's performance using these 5 criteria. Score each criterion from 1-5 (1=Poor, 2=Below Average, 3=Average, 4=Good, 5=Excellent):
 
@@ -203,50 +400,165 @@ Provide your response in this EXACT JSON format (do not include markdown code bl
         "efficiency": <1-5>
     }},
     "total_score": <sum of all 5 scores>,
-    "strengths": ["strength 1", "strength 2", "strength 3"],
-    "improvements": ["improvement 1", "improvement 2", "improvement 3"],
-    "overall_feedback": "Brief summary of performance (2-3 sentences)"
+    "strengths": [{strengths}],
+    "improvements": [{improvements}],
+    "overall_feedback": "Brief summary of performance ({feedback_length})"
 }}"""
+    
+    def _evaluate(self, analysis_prompt: str, labels: Dict, max_tokens: Optional[int] = None,
+                  calls: Optional[List[tuple]] = None) -> Dict:
+        """
+        Run one rubric prompt through the evaluation-tier model and parse its JSON reply
+        
+        calls: receives the call's (prompt_tokens, completion_tokens) as soon as the
+        response arrives - before parsing, since an unparseable reply is billed too
+        """
+        route = self.routes[EVALUATION]
+        # Use Azure OpenAI to analyze
+        call_started = time.perf_counter()
+        response = self.client.chat.completions.create(
+            messages=[
+                {"role": "system", "content": "You are a customer service quality evaluator. Respond only with valid JSON."},
+                {"role": "user", "content": analysis_prompt}
+            ],
+            **route.request_options(max_tokens=max_tokens)
+        )
+        
+        if response.usage:
+            self._record_call_metrics(labels, call_started, response.usage.prompt_tokens, response.usage.completion_tokens, route)
+            if calls is not None:
+                calls.append((response.usage.prompt_tokens, response.usage.completion_tokens))
+        elif calls is not None:
+            # No usage reported: estimate like the conversation route does
+            calls.append((len(analysis_prompt) // 4, len(response.choices[0].message.content or "") // 4))
+        
+        # Parse response
+        import json
+        result_text = response.choices[0].message.content.strip()
+        # Remove markdown code blocks if present
+        if result_text.startswith('```'):
+            result_text = result_text.split('```')[1]
+            if result_text.startswith('json'):
+                result_text = result_text[4:]
+            result_text = result_text.strip()
+        
+        return json.loads(result_text)
+    
+    def _transcript_windows(self, conversation: List[Dict]) -> List[List[Dict]]:
+        """Split a conversation into windows of EVAL_CHUNK_TURNS messages overlapping by EVAL_CHUNK_OVERLAP"""
+        size = max(self.config.EVAL_CHUNK_TURNS, 2)
+        overlap = min(max(self.config.EVAL_CHUNK_OVERLAP, 0), size - 1)
+        step = size - overlap
+        return [conversation[start:start + size] for start in range(0, max(len(conversation) - overlap, 1), step)]
+    
+    def _analyze_chunked(self, conversation: List[Dict], labels: Dict, calls: Optional[List[tuple]] = None) -> Dict:
+        """
+        Map-reduce evaluation for long transcripts
+        
+        Map: every window is scored with the compact rubric, at most
+        EVAL_CHUNK_CONCURRENCY model calls at a time.
+        Reduce: merged locally, without another model call (see _merge_windows).
+        """
+        assembly_started = time.perf_counter()
+        windows = self._transcript_windows(conversation)
+        prompts = [
+            self._rubric_prompt(self._format_conversation(window), short=True, part=(i + 1, len(windows)))
+            for i, window in enumerate(windows)
+        ]
+        metrics.PROMPT_ASSEMBLY_SECONDS.labels(**labels).observe(time.perf_counter() - assembly_started)
         
+        def evaluate_window(prompt: str) -> Optional[Dict]:
+            try:
+                return self._evaluate(prompt, labels, max_tokens=self.config.EVAL_CHUNK_MAX_TOKENS, calls=calls)
+            except Exception as e:
+                metrics.MODEL_ERRORS_TOTAL.labels(**labels).inc()
+                log.warning("analysis_window_failed", error=str(e))
+                return None
+        
+        # Threads are green threads under eventlet, so the window calls overlap on the network
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=max(1, min(self.config.EVAL_CHUNK_CONCURRENCY, len(prompts)))) as pool:
+            results = list(pool.map(evaluate_window, prompts))
+        
+        # Windows with more agent replies carry more weight
+        weights = [max(sum(1 for m in window if m.get("role") == "user"), 1) for window in windows]
+        parts = [(result, weight) for result, weight in zip(results, weights) if result]
+        if not parts:
+            raise RuntimeError(f"all {len(windows)} transcript windows failed to evaluate")
+        
+        log.info("analysis_chunked", windows=len(windows), failed=len(windows) - len(parts),
+                 messages=len(conversation))
+        analysis = self._merge_windows(parts)
+        analysis["windows"] = len(windows)
+        return analysis
+    
+    @staticmethod
+    def _score_value(value, default: Optional[int] = None) -> Optional[int]:
+        """
+        A model-reported 1-5 score as an int, or default if it can't be read
+        
+        Models sometimes answer null, "4/5", "4.5" or prose instead of a number.
+        """
+        if isinstance(value, str):
+            value = value.split("/")[0].strip()
+        if isinstance(value, bool) or value is None:
+            return default
         try:
-            # Use Azure OpenAI to analyze
-            response = self.client.chat.completions.create(
-                model=self.config.AZURE_AI_MODEL_NAME,
-                messages=[
-                    {"role": "system", "content": "You are a customer service quality evaluator. Respond only with valid JSON."},
-                    {"role": "user", "content": analysis_prompt}
-                ]
-            )
-            
-            # Parse response
-            import json
-            result_text = response.choices[0].message.content.strip()
-            # Remove markdown code blocks if present
-            if result_text.startswith('```'):
-                result_text = result_text.split('```')[1]
-                if result_text.startswith('json'):
-                    result_text = result_text[4:]
-                result_text = result_text.strip()
-            
-            analysis = json.loads(result_text)
-            return analysis
-            
-        except Exception as e:
-            print(f"Error analyzing conversation: {e}")
-            # Return default structure if analysis fails
-            return {
-                "scores": {
-                    "professionalism": 3,
-                    "communication": 3,
-                    "problem_resolution": 3,
-                    "empathy": 3,
-                    "efficiency": 3
-                },
-                "total_score": 15,
-                "strengths": ["Unable to analyze - error occurred"],
-                "improvements": ["Please try analyzing again"],
-                "overall_feedback": f"Analysis failed: {str(e)}"
-            }
+            number = float(value)
+        except (TypeError, ValueError):
+            return default
+        if not math.isfinite(number):
+            return default
+        return min(5, max(1, int(number + 0.5)))
+    
+    @staticmethod
+    def _merge_windows(parts: List[tuple]) -> Dict:
+        """
+        Reduce per-window analyses into one
+        
+        - Criterion scores: weighted mean of the windows, rounded half up
+        - Problem Resolution: never below the last window's score, since the
+          resolution happens at the end of the conversation
+        - Strengths/improvements: taken round-robin across windows, deduplicated
+        - Feedback: the window summaries in conversation order (at most 3)
+        """
+        def window_scores(result: Dict) -> Dict:
+            return result.get("scores") if isinstance(result.get("scores"), dict) else {}
+        
+        total_weight = sum(weight for _, weight in parts)
+        scores = {}
+        for criterion in EVALUATION_CRITERIA:
+            # A missing or unparsable score counts as 3 for that window only
+            mean = sum(VoiceAgent._score_value(window_scores(result).get(criterion), 3) * weight
+                       for result, weight in parts) / total_weight
+            scores[criterion] = min(5, max(1, int(mean + 0.5)))
+        last_resolution = VoiceAgent._score_value(window_scores(parts[-1][0]).get("problem_resolution"))
+        if last_resolution:
+            scores["problem_resolution"] = max(scores["problem_resolution"], last_resolution)
+        
+        def merge(key: str, limit: int = 3) -> List[str]:
+            lists = [list(result.get(key) or []) for result, _ in parts]
+            merged, seen = [], set()
+            for rank in range(max(len(items) for items in lists)):
+                for items in lists:
+                    key_text = str(items[rank]).strip().lower() if rank < len(items) else ""
+                    if key_text and key_text not in seen:
+                        seen.add(key_text)
+                        merged.append(str(items[rank]).strip())
+            return merged[:limit]
+        
+        # First, middle and last window summaries for long conversations
+        picks = sorted({0, len(parts) // 2, len(parts) - 1}) if len(parts) > 3 else range(len(parts))
+        feedback = " ".join(str(parts[i][0].get("overall_feedback", "")).strip() for i in picks).strip()
+        
+        return {
+            "scores": scores,
+            "total_score": sum(scores.values()),
+            "strengths": merge("strengths"),
+            "improvements": merge("improvements"),
+            "overall_feedback": feedback,
+            "evaluation": "chunked"
+        }
     
     def _format_conversation(self, conversation: List[Dict]) -> str:
         """Format conversation for analysis"""
@@ -262,6 +574,7 @@ Provide your response in this EXACT JSON format (do not include markdown code bl
         return {
             "name": self.config.AGENT_NAME,
             "description": self.config.AGENT_DESCRIPTION,
-            "model": self.config.AZURE_AI_MODEL_NAME,
+            "model": self.routes[CONVERSATION].deployment,
+            "routes": {name: route.to_dict() for name, route in self.routes.items()},
             "status": "active" if self.agent else "inactive"
         }
@@ -1,55 +1,126 @@
 """
 Flask application for Voice Agent Simulator
+
+The app is built by create_app(). External clients (voice agent, storage) are
+lazy and warmed up concurrently in the background, so the server binds its
+port and answers /healthz immediately; /readyz turns green once they are warm.
 """
+# Eventlet must patch the standard library (sockets, threading, time) before
+# anything else imports it. Without this, a blocking model call stalls every
+# other socket on the worker and in-flight turns cannot be interrupted.
+try:
+    import eventlet
+    eventlet.monkey_patch()
+except ImportError:
+    pass
+
+import atexit
 import os
+import time
 import asyncio
 import json
-import random
-from flask import Flask, render_template, request, jsonify, session, redirect, url_for
-from flask_socketio import SocketIO, emit
+from flask import (Blueprint, Flask, Response, g, render_template, request, jsonify, session, redirect,
+                   stream_with_context, url_for)
+from flask_socketio import SocketIO, emit, join_room
 from flask_cors import CORS
 from config import Config
 from agent import VoiceAgent
 from storage_service import StorageService
+from generation_tracker import GenerationTracker
+from warmup import LazyService, WarmupCoordinator
+from static_assets import assets
+from conversation_store import create_conversation_store
+from usage_ledger import UsageLedger
+from admission import AdmissionController, AdmissionRejected
+from traffic_recorder import ANALYZE, NEW_CONVERSATION, SEND_MESSAGE, TrafficRecorder
+from memory_profiler import GROUP_BY, MemoryProfiler
+from shutdown import ANALYSIS, TURN, ShutdownCoordinator
+import metrics
+import demo_data
+import score_export
+import score_events
+import socket_codec
 import uuid
 from datetime import datetime, timedelta
 from functools import wraps
+from log_service import ROOT_LOGGER_NAME, get_logger
 
-# Configure Azure Monitor OpenTelemetry BEFORE importing Flask
-# This enables automatic instrumentation of Flask, requests, and other libraries
-try:
-    from azure.monitor.opentelemetry import configure_azure_monitor
-    from opentelemetry import trace
+log = get_logger("app")
+socket_log = get_logger("socket")
+
+def configure_telemetry():
+    """
+    Configure Azure Monitor OpenTelemetry BEFORE the Flask app is created
     
+    This enables automatic instrumentation of Flask, requests, and other libraries.
+    The (heavy) Azure Monitor SDK is only imported when a connection string is set.
+    """
     app_insights_conn_str = os.getenv('APPLICATIONINSIGHTS_CONNECTION_STRING')
-    if app_insights_conn_str:
-        configure_azure_monitor(
-            connection_string=app_insights_conn_str,
-            enable_live_metrics=True,
-            logger_name="cora.voice.agent"
-        )
-        print("✓ Azure Monitor OpenTelemetry configured")
-        tracer = trace.get_tracer(__name__)
-    else:
-        print("⚠ APPLICATIONINSIGHTS_CONNECTION_STRING not set - monitoring disabled")
-        tracer = None
-except ImportError:
-    print("⚠ azure-monitor-opentelemetry not installed - monitoring disabled")
-    tracer = None
+    if not app_insights_conn_str:
+        log.warning("telemetry_disabled", reason="APPLICATIONINSIGHTS_CONNECTION_STRING not set")
+        return
+    try:
+        from azure.monitor.opentelemetry import configure_azure_monitor
+    except ImportError:
+        log.warning("telemetry_disabled", reason="azure-monitor-opentelemetry not installed")
+        return
+    configure_azure_monitor(
+        connection_string=app_insights_conn_str,
+        enable_live_metrics=True,
+        logger_name=ROOT_LOGGER_NAME  # Ship structured logs to App Insights too
+    )
+    log.info("telemetry_configured", exporter="azure_monitor")
+
+# Routes are registered on a blueprint and attached to the app in create_app()
+main = Blueprint('main', __name__)
+
+# SocketIO is bound to the app in create_app()
+socketio = SocketIO()
+
+# Binary codec negotiated by each socket (sid -> SessionCodec); absent = JSON events
+socket_codecs = {}
+
+def emit_messages(event, payload):
+    """Emit an event carrying messages, packed for sockets that negotiated a codec"""
+    codec = socket_codecs.get(request.sid)
+    emit(event, codec.encode_event(payload) if codec else payload)
 
-# Initialize Flask app
-app = Flask(__name__)
-app.config.from_object(Config)
-CORS(app)
+def unpack_payload(data):
+    """Decode a packed client payload (a socket that negotiated a codec may send bytes)"""
+    if isinstance(data, (bytes, bytearray)):
+        codec = socket_codecs.get(request.sid)
+        if codec is None:
+            raise ValueError("Binary payload sent before negotiate")
+        return codec.decode(bytes(data))
+    return data
 
-# Initialize SocketIO for real-time communication
-socketio = SocketIO(app, cors_allowed_origins="*", async_mode='eventlet')
+# Voice agent and storage service are created lazily and warmed up concurrently
+voice_agent = LazyService('voice_agent', VoiceAgent)
 
-# Initialize voice agent
-voice_agent = VoiceAgent()
+def publish_score(user_identity, entity):
+    """Push a saved score to the owner's open dashboards (see score_events.py)"""
+    socketio.emit(score_events.EVENT, score_events.score_delta(entity), to=score_events.score_room(user_identity))
 
-# Initialize storage service for conversation scores
-storage_service = StorageService()
+# Storage is optional: the app is ready even if score storage is unavailable
+storage_service = LazyService('storage_service', lambda: StorageService(on_score_saved=publish_score),
+                              required=False)
+
+def _create_prescorer():
+    # Imported lazily: NumPy is only loaded when pre-scoring is used (or warmed up)
+    from prescorer import PreScorer
+    return PreScorer(
+        min_agent_turns=Config.PRESCORE_MIN_AGENT_TURNS,
+        min_agent_words=Config.PRESCORE_MIN_AGENT_WORDS,
+        short_max_agent_turns=Config.PRESCORE_SHORT_MAX_AGENT_TURNS
+    )
+
+# Heuristic pre-scorer: instant provisional scores and triage of model evaluations
+prescorer = LazyService('prescorer', _create_prescorer, required=False)
+
+warmup = WarmupCoordinator(
+    [voice_agent, storage_service] + ([prescorer] if Config.PRESCORE_ENABLED else []),
+    retry_interval=Config.WARMUP_RETRY_SECONDS
+)
 
 # Easy Auth helper functions
 def get_easy_auth_user():
@@ -72,6 +143,19 @@ def is_authenticated():
     local_user = session.get('local_user')
     return entra_user or local_user
 
+def resolve_user_identity():
+    """
+    Resolve the caller's identity and how they authenticated
+    
+    Returns:
+        (user_identity, auth_method) - identity falls back to 'anonymous'
+    """
+    principal_name = request.headers.get('X-MS-CLIENT-PRINCIPAL-NAME')
+    local_user = session.get('local_user')
+    user_identity = principal_name or local_user or 'anonymous'
+    auth_method = 'Azure AD' if principal_name else ('Local' if local_user else 'Anonymous')
+    return user_identity, auth_method
+
 def login_required(f):
     """Decorator to require authentication (Entra ID or local)"""
     @wraps(f)
@@ -81,8 +165,180 @@ def login_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
-# Store active conversations
-conversations = {}
+def is_admin():
+    """Local 'admin' account, or an Entra ID principal listed in ADMIN_USERS"""
+    principal_name = request.headers.get('X-MS-CLIENT-PRINCIPAL-NAME')
+    if principal_name:
+        return principal_name.lower() in Config.ADMIN_USERS
+    return session.get('local_user') == 'admin'
+
+def admin_required(f):
+    """Decorator to require an admin identity"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if not is_authenticated():
+            return jsonify({"error": "Authentication required"}), 401
+        if not is_admin():
+            return jsonify({"error": "Admin access required"}), 403
+        return f(*args, **kwargs)
+    return decorated_function
+
+# Store active conversations (process-local, or shared across replicas via Redis)
+conversation_store = create_conversation_store(
+    Config.CONVERSATION_STORE_URL,
+    ttl_seconds=Config.CONVERSATION_TTL_SECONDS,
+    journal_dir=Config.CONVERSATION_JOURNAL_DIR,
+    fsync=Config.CONVERSATION_JOURNAL_FSYNC,
+    snapshot_every=Config.CONVERSATION_JOURNAL_SNAPSHOT_EVERY
+)
+
+# Track in-flight model calls so barge-in and disconnects can cancel them
+generation_tracker = GenerationTracker()
+
+# Bounded concurrency, per-conversation serialization and load shedding for turns
+admission = AdmissionController(
+    max_concurrent=Config.ADMISSION_MAX_CONCURRENT,
+    max_queue=Config.ADMISSION_MAX_QUEUE,
+    per_connection=Config.ADMISSION_PER_CONNECTION,
+    queue_slo_seconds=Config.ADMISSION_QUEUE_SLO_SECONDS
+)
+
+# Anonymized interaction traces for record-and-replay load tests (off unless TRAFFIC_RECORD_DIR is set)
+traffic_recorder = TrafficRecorder(
+    Config.TRAFFIC_RECORD_DIR,
+    sample_rate=Config.TRAFFIC_RECORD_SAMPLE_RATE,
+    salt=Config.TRAFFIC_RECORD_SALT
+)
+
+# Token usage per user / conversation, with soft and hard budgets
+usage_ledger = UsageLedger(
+    storage=storage_service,
+    user_daily_soft=Config.TOKEN_BUDGET_USER_DAILY_SOFT,
+    user_daily_hard=Config.TOKEN_BUDGET_USER_DAILY_HARD,
+    conversation_soft=Config.TOKEN_BUDGET_CONVERSATION_SOFT,
+    conversation_hard=Config.TOKEN_BUDGET_CONVERSATION_HARD,
+    degraded_max_tokens=Config.TOKEN_BUDGET_DEGRADED_MAX_TOKENS,
+    flush_interval=Config.USAGE_FLUSH_SECONDS,
+    conversation_idle=Config.CONVERSATION_TTL_SECONDS
+)
+
+def socketio_sessions():
+    """Connected Engine.IO sockets and their queued outbound packets"""
+    sockets = dict(getattr(getattr(socketio.server, 'eio', None), 'sockets', None) or {})
+    return {
+        "sessions": len(sockets),
+        "queued_packets": sum(s.queue.qsize() for s in sockets.values() if hasattr(s, 'queue'))
+    }
+
+# Heap profiling for /debug/memory (tracemalloc stays off unless asked for)
+memory_profiler = MemoryProfiler(
+    conversation_store,
+    socket_sessions=socketio_sessions,
+    max_snapshots=Config.MEMORY_PROFILE_MAX_SNAPSHOTS,
+    sample_seconds=Config.MEMORY_PROFILE_SAMPLE_SECONDS,
+    sample_interval=Config.MEMORY_PROFILE_INTERVAL_SECONDS
+)
+
+def notify_draining():
+    """Ask every connected client to reconnect (to another replica)"""
+    socketio.emit('server_draining', {"reason": "shutdown"})
+
+# Drains in-flight turns and analyses on SIGTERM (see shutdown.py)
+shutdown = ShutdownCoordinator(Config.SHUTDOWN_DRAIN_SECONDS, notify_clients=notify_draining)
+
+# Computed on scrape so the gauge is always in sync with the store
+metrics.ACTIVE_CONVERSATIONS.set_callback(conversation_store.count)
+
+@main.before_app_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@main.after_app_request
+def record_request_metrics(response):
+    """Record HTTP latency labelled by route template (never the raw path)"""
+    started = g.pop('request_started', None)
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        metrics.HTTP_REQUEST_SECONDS.labels(
+            route=route, method=request.method, status=response.status_code
+        ).observe(time.perf_counter() - started)
+    return response
+
+@main.route('/metrics')
+def metrics_endpoint():
+    """Prometheus text-format metrics (optionally protected by METRICS_TOKEN)"""
+    if Config.METRICS_TOKEN and request.headers.get('Authorization') != f"Bearer {Config.METRICS_TOKEN}":
+        return jsonify({"error": "Authentication required"}), 401
+    return Response(metrics.registry.render(), mimetype=metrics.MetricsRegistry.CONTENT_TYPE)
+
+# Memory profiling (admin only)
+
+def _profile_args():
+    group_by = request.args.get('group_by', 'lineno')
+    return min(max(1, request.args.get('top', 20, type=int)), 200), (group_by if group_by in GROUP_BY else 'lineno')
+
+@main.route('/debug/memory', methods=['GET'])
+@admin_required
+def debug_memory():
+    """
+    Where this replica's memory is going
+    
+    ?top=N&group_by=lineno|filename|traceback for the latest snapshot's allocation
+    sites, ?types=1 for a live-object census by type (walks the whole heap)
+    """
+    top, group_by = _profile_args()
+    census = request.args.get('types', 'false').lower() in ('1', 'true')
+    return jsonify(memory_profiler.report(top=top, group_by=group_by, census=census))
+
+@main.route('/debug/memory/tracing', methods=['POST'])
+@admin_required
+def debug_memory_tracing():
+    """Start or stop tracemalloc: {"action": "start", "frames": 10} / {"action": "stop"}"""
+    data = request.get_json(silent=True) or {}
+    if data.get('action') == 'start':
+        return jsonify(memory_profiler.start_tracing(int(data.get('frames', 1))))
+    if data.get('action') == 'stop':
+        return jsonify(memory_profiler.stop_tracing())
+    return jsonify({"error": "action must be 'start' or 'stop'"}), 400
+
+@main.route('/debug/memory/snapshots', methods=['POST'])
+@admin_required
+def debug_memory_snapshot():
+    """Snapshot the current traces; returns the snapshot id and its top allocation sites"""
+    top, group_by = _profile_args()
+    try:
+        snapshot = memory_profiler.take_snapshot()
+    except RuntimeError as e:
+        return jsonify({"error": str(e)}), 409
+    return jsonify(dict(snapshot, top_allocations=memory_profiler.top(snapshot["id"], top, group_by)))
+
+@main.route('/debug/memory/diff', methods=['GET'])
+@admin_required
+def debug_memory_diff():
+    """What grew between two snapshots: ?from=<id>&to=<id> (to defaults to the latest)"""
+    top, group_by = _profile_args()
+    older = request.args.get('from')
+    if not older:
+        return jsonify({"error": "from=<snapshot id> is required"}), 400
+    try:
+        return jsonify(memory_profiler.diff(older, request.args.get('to'), top, group_by))
+    except KeyError as e:
+        return jsonify({"error": f"unknown snapshot: {e.args[0]}"}), 404
+
+# Health probes (Container Apps liveness / readiness)
+
+@main.route('/healthz')
+def healthz():
+    """Liveness: the process is up and serving requests (never waits on Azure)"""
+    return jsonify({"status": "ok"})
+
+@main.route('/readyz')
+def readyz():
+    """Readiness: 200 once required services are warm, 503 while warming, failed or draining"""
+    report = warmup.readiness()
+    if shutdown.draining:
+        report.update(ready=False, draining=True, in_flight=shutdown.in_flight())
+    return jsonify(report), (200 if report["ready"] else 503)
 
 # Local user credentials (stored in environment variables for security)
 LOCAL_USERS = {
@@ -92,12 +348,12 @@ LOCAL_USERS = {
 
 # Authentication Routes
 
-@app.route('/landing')
+@main.route('/landing')
 def landing():
     """Landing page with authentication options"""
     return render_template('landing.html')
 
-@app.route('/login/local', methods=['GET', 'POST'])
+@main.route('/login/local', methods=['GET', 'POST'])
 def local_login():
     """Local username/password login"""
     if request.method == 'POST':
@@ -107,29 +363,29 @@ def local_login():
         if username in LOCAL_USERS and LOCAL_USERS[username] == password:
             session['local_user'] = username
             session['auth_method'] = 'local'
-            return redirect(url_for('index'))
+            return redirect(url_for('main.index'))
         else:
             return render_template('landing.html', error='Invalid username or password')
     
     return render_template('landing.html')
 
-@app.route('/login/entra')
+@main.route('/login/entra')
 def entra_login():
     """Redirect to Entra ID login via Easy Auth"""
     # Add post_login_redirect_uri to automatically return to app after login
     return redirect('/.auth/login/aad?post_login_redirect_uri=/')
 
-@app.route('/logout')
+@main.route('/logout')
 def logout():
     """Logout user"""
     if 'local_user' in session:
         session.clear()
-        return redirect(url_for('landing'))
+        return redirect(url_for('main.landing'))
     else:
         # Entra ID logout
         return redirect('/.auth/logout')
 
-@app.route('/api/auth/status')
+@main.route('/api/auth/status')
 def auth_status():
     """Check authentication status from Easy Auth headers"""
     user = get_easy_auth_user()
@@ -141,7 +397,7 @@ def auth_status():
 
 # Application Routes
 
-@app.route('/')
+@main.route('/')
 def index():
     """Render the main application page"""
     # Check if user is authenticated (either Entra ID or local)
@@ -149,11 +405,11 @@ def index():
     local_user = session.get('local_user')
     
     if not entra_user and not local_user:
-        return redirect(url_for('landing'))
+        return redirect(url_for('main.landing'))
     
     return render_template('index.html', user=session.get('user'))
 
-@app.route('/api/agent/info', methods=['GET'])
+@main.route('/api/agent/info', methods=['GET'])
 @login_required
 def get_agent_info():
     """Get information about the voice agent"""
@@ -163,7 +419,7 @@ def get_agent_info():
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
 
-@app.route('/api/user/identity', methods=['GET'])
+@main.route('/api/user/identity', methods=['GET'])
 def get_user_identity():
     """Get current user identity information from Easy Auth headers or local session"""
     try:
@@ -211,22 +467,27 @@ def get_user_identity():
             "auth_method": "Local (No Authentication)"
         })
 
-@app.route('/api/conversation/new', methods=['POST'])
+@main.route('/api/conversation/new', methods=['POST'])
 @login_required
 def new_conversation():
     """Start a new conversation"""
+    if shutdown.draining:
+        # Shutting down: the client should start it on another replica
+        return jsonify({"success": False, "error": "Server is restarting - please retry"}), 503, {"Retry-After": "2"}
     try:
         data = request.get_json() or {}
         mood = data.get('mood', 'neutral')
         
         conversation_id = str(uuid.uuid4())
-        conversations[conversation_id] = {
+        conversation_store.create({
             "id": conversation_id,
             "messages": [],
             "mood": mood,
             "created_at": datetime.utcnow().isoformat(),
+            "last_activity": time.time(),
             "status": "active"
-        }
+        })
+        traffic_recorder.record(NEW_CONVERSATION, conversation_id, resolve_user_identity()[0], mood=mood)
         return jsonify({
             "success": True,
             "conversation_id": conversation_id,
@@ -235,54 +496,49 @@ def new_conversation():
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
 
-@app.route('/api/conversation/<conversation_id>/messages', methods=['GET'])
+@main.route('/api/conversation/<conversation_id>/messages', methods=['GET'])
 @login_required
 def get_conversation_messages(conversation_id):
-    """Get all messages from a conversation"""
-    if conversation_id not in conversations:
+    """
+    Get a conversation's messages, optionally only those after a cursor
+    
+    ?since=<seq> returns the messages with a higher sequence number. The ETag
+    is the newest seq, so a client that is up to date gets a bodyless 304.
+    """
+    if not conversation_store.exists(conversation_id):
         return jsonify({"success": False, "error": "Conversation not found"}), 404
     
-    return jsonify({
-        "success": True,
-        "messages": conversations[conversation_id]["messages"]
-    })
+    since = max(0, request.args.get('since', 0, type=int))
+    last_seq = conversation_store.last_seq(conversation_id)
+    etag = f"{conversation_id}:{last_seq}"
+    if etag in request.if_none_match:
+        response = Response(status=304)
+    else:
+        messages = conversation_store.get_messages(conversation_id, since) if since < last_seq else []
+        if messages:
+            # A turn may have been appended since last_seq was read
+            last_seq = max(last_seq, messages[-1]["seq"])
+            etag = f"{conversation_id}:{last_seq}"
+        response = jsonify({"success": True, "messages": messages, "last_seq": last_seq})
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
 
-@app.route('/api/user/scores', methods=['GET'])
+@main.route('/api/user/scores', methods=['GET'])
 def get_user_scores():
     """Get conversation scores for the current user"""
     try:
-        # Get user identity - check all possible headers
-        principal_name = request.headers.get('X-MS-CLIENT-PRINCIPAL-NAME')
-        principal_id = request.headers.get('X-MS-CLIENT-PRINCIPAL-ID')
-        local_user = session.get('local_user')
-        
-        # Debug: print all relevant headers and ALL request headers
-        print(f"📊 === Fetching User Scores ===")
-        print(f"   All Headers:")
-        for header, value in request.headers:
-            if 'MS-CLIENT' in header or 'PRINCIPAL' in header or 'AUTH' in header:
-                print(f"     {header}: {value}")
-        print(f"   Easy Auth Headers:")
-        print(f"     X-MS-CLIENT-PRINCIPAL-NAME: {principal_name}")
-        print(f"     X-MS-CLIENT-PRINCIPAL-ID: {principal_id}")
-        print(f"   Session:")
-        print(f"     local_user: {local_user}")
-        
-        user_identity = principal_name or local_user or 'anonymous'
-        print(f"   Using Identity (original): '{user_identity}'")
-        print(f"   Using Identity (normalized): '{user_identity.lower()}'")
+        user_identity, auth_method = resolve_user_identity()
         
         # Get limit from query params (default 10)
         limit = request.args.get('limit', 10, type=int)
         
         # Fetch scores from storage (storage service will normalize to lowercase)
-        scores = storage_service.get_user_scores(user_identity, limit)
+        scores = storage_service.get_user_scores(user_identity, limit,
+                                                 labels={"route": metrics.ROUTE_USER_SCORES, "mood": metrics.NO_MOOD})
         
-        print(f"   Query returned {len(scores)} scores")
-        if len(scores) == 0:
-            print(f"   ⚠ No scores found - verifying table has data for '{user_identity.lower()}'")
-        else:
-            print(f"   ✓ Successfully retrieved {len(scores)} scores for '{user_identity.lower()}'")
+        # Identity and headers are deliberately not logged
+        log.sampled("user_scores_fetched", auth_method=auth_method, count=len(scores), limit=limit)
         
         return jsonify({
             "success": True,
@@ -290,29 +546,123 @@ def get_user_scores():
             "user_identity": user_identity
         })
     except Exception as e:
-        print(f"⚠ Error fetching user scores: {e}")
+        log.error("user_scores_failed", error=str(e))
         return jsonify({"success": False, "error": str(e)}), 500
 
-@app.route('/api/conversation/<conversation_id>/analyze', methods=['POST'])
+@main.route('/api/admin/scores/export', methods=['GET'])
+@admin_required
+def export_scores():
+    """
+    Stream every score (or a filtered range) as NDJSON or CSV
+    
+    Query params: format=ndjson|csv, user=<identity>, since=<ISO date>, until=<ISO date>
+    (created_at in [since, until)). Gzipped on the fly when the client accepts gzip.
+    Memory stays constant: one Table page is held at a time (see score_export.py).
+    """
+    fmt = request.args.get('format', 'ndjson').lower()
+    if fmt not in score_export.FORMATS:
+        return jsonify({"error": f"format must be one of {', '.join(score_export.FORMATS)}"}), 400
+    since, until = request.args.get('since'), request.args.get('until')
+    for value in (since, until):
+        if value:
+            try:
+                datetime.fromisoformat(value)
+            except ValueError:
+                return jsonify({"error": f"invalid date: {value}"}), 400
+    if not storage_service.table_client:
+        return jsonify({"error": "Score storage is unavailable"}), 503
+    
+    query_filter = score_export.build_filter(request.args.get('user'), since, until)
+    compress = 'gzip' in request.accept_encodings
+    
+    def generate():
+        started, rows = time.perf_counter(), 0
+        
+        def counted(pages):
+            nonlocal rows
+            for page, _ in pages:
+                rows += len(page)
+                yield page
+        
+        pages = storage_service.iter_score_pages(query_filter, select=score_export.SELECT_FIELDS,
+                                                 labels={"route": metrics.ROUTE_SCORE_EXPORT, "mood": metrics.NO_MOOD})
+        chunks = score_export.encode(score_export.export_rows(counted(pages), decode_lists=(fmt == 'ndjson')), fmt)
+        if compress:
+            chunks = score_export.gzip_chunks(chunks)
+        yield from chunks
+        log.info("scores_exported", format=fmt, rows=rows, filtered=bool(query_filter), gzip=compress,
+                 elapsed_seconds=round(time.perf_counter() - started, 2))
+    
+    filename = f"scores-{datetime.utcnow():%Y%m%dT%H%M%S}.{fmt}"
+    response = Response(stream_with_context(generate()), mimetype=score_export.FORMATS[fmt])
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    if compress:
+        response.headers['Content-Encoding'] = 'gzip'
+        response.headers['Vary'] = 'Accept-Encoding'
+    return response
+
+def prescore_messages(messages):
+    """Provisional score for a transcript, or None if pre-scoring is off or unavailable"""
+    if not Config.PRESCORE_ENABLED:
+        return None
+    try:
+        return prescorer.score(messages)
+    except Exception as e:
+        log.sampled("prescore_failed", error=str(e))
+        return None
+
+@main.route('/api/conversation/<conversation_id>/prescore', methods=['GET'])
+@login_required
+def prescore_conversation(conversation_id):
+    """Instant heuristic score, shown while the model evaluation runs"""
+    history = conversation_store.get_history(conversation_id)
+    if not history and not conversation_store.exists(conversation_id):
+        return jsonify({"success": False, "error": "Conversation not found"}), 404
+    
+    prescore = prescore_messages(history)
+    if prescore is None:
+        return jsonify({"success": False, "error": "Pre-scoring is unavailable"}), 503
+    return jsonify({"success": True, "prescore": prescore.to_dict()})
+
+@main.route('/api/conversation/<conversation_id>/analyze', methods=['POST'])
+@shutdown.tracked(ANALYSIS)
 def analyze_conversation(conversation_id):
     """Analyze a conversation for quality and improvement with standardized scoring"""
-    print(f"Analyzing conversation: {conversation_id}")
+    log.info("analysis_requested", conversation_id=conversation_id)
+    arrived, started = time.time(), time.perf_counter()
     
-    if conversation_id not in conversations:
-        print(f"Conversation {conversation_id} not found. Available: {list(conversations.keys())}")
+    if not conversation_store.exists(conversation_id):
+        log.warning("conversation_not_found", conversation_id=conversation_id, route="analyze")
         return jsonify({"success": False, "error": "Conversation not found"}), 404
     
+    # Get user identity
+    user_identity, auth_method = resolve_user_identity()
+    
     try:
-        # Get analysis from AI
-        analysis = voice_agent.analyze_interaction(
-            conversations[conversation_id]["messages"]
-        )
+        conversation = conversation_store.get(conversation_id) or {}
+        messages = conversation_store.get_messages(conversation_id)
         
-        # Get user identity
-        principal_name = request.headers.get('X-MS-CLIENT-PRINCIPAL-NAME')
-        local_user = session.get('local_user')
-        user_identity = principal_name or local_user or 'anonymous'
-        auth_method = 'Azure AD' if principal_name else ('Local' if local_user else 'Anonymous')
+        # Get analysis from AI (skipped or shortened when the pre-scorer says so)
+        prescore = prescore_messages(messages)
+        
+        # Evaluation spends tokens like a turn does: same budgets (a skipped one costs nothing)
+        if prescore is None or prescore.decision != "skip":
+            budget = usage_ledger.check(user_identity, conversation_id, Config.AGENT_MAX_TOKENS)
+            if not budget.allowed:
+                log.sampled("budget_exceeded", key=budget.reason, conversation_id=conversation_id,
+                            reason=budget.reason, route="analyze")
+                traffic_recorder.record(ANALYZE, conversation_id, user_identity, at=arrived, outcome="budget",
+                                        latency_ms=round((time.perf_counter() - started) * 1000, 1))
+                headers = {"Retry-After": str(budget.retry_after)} if budget.retry_after else {}
+                return jsonify({"success": False, "error": "Token budget exhausted - please try again later",
+                                "budget": budget.to_dict()}), 429, headers
+        
+        analysis = voice_agent.analyze_interaction(messages, mood=conversation.get("mood", "neutral"),
+                                                   prescore=prescore)
+        usage = analysis.get("usage")
+        if usage:
+            usage_ledger.record(user_identity, conversation_id,
+                                usage["prompt_tokens"], usage["completion_tokens"])
         
         # Store score in Azure Table Storage
         storage_service.save_conversation_score(
@@ -320,12 +670,20 @@ def analyze_conversation(conversation_id):
             user_identity=user_identity,
             auth_method=auth_method,
             analysis=analysis,
-            message_count=len(conversations[conversation_id]["messages"])
+            message_count=len(messages),
+            labels={"route": metrics.ROUTE_ANALYZE, "mood": metrics.mood_label(conversation.get("mood"))}
         )
         
+        traffic_recorder.record(ANALYZE, conversation_id, user_identity, at=arrived,
+                                mood=conversation.get("mood", "neutral"), messages=len(messages),
+                                in_chars=sum(len(m.get("content", "")) for m in messages),
+                                evaluation=analysis.get("evaluation"), outcome="ok",
+                                latency_ms=round((time.perf_counter() - started) * 1000, 1))
         return jsonify({"success": True, "analysis": analysis})
     except Exception as e:
-        print(f"Error analyzing conversation: {e}")
+        log.exception("analysis_failed", conversation_id=conversation_id)
+        traffic_recorder.record(ANALYZE, conversation_id, user_identity, at=arrived, outcome="error",
+                                latency_ms=round((time.perf_counter() - started) * 1000, 1))
         return jsonify({"success": False, "error": str(e)}), 500
 
 # WebSocket Events for real-time communication
@@ -333,15 +691,89 @@ def analyze_conversation(conversation_id):
 @socketio.on('connect')
 def handle_connect():
     """Handle client connection"""
-    print(f"Client connected: {request.sid}")
+    socket_log.sampled("client_connected", sid=request.sid)
+    metrics.SOCKETIO_SESSIONS.inc()
+    
+    # Score updates for this user's dashboards are pushed to their room
+    if is_authenticated():
+        join_room(score_events.score_room(resolve_user_identity()[0]))
     emit('connected', {'message': 'Connected to Voice Agent Simulator'})
 
+@socketio.on('negotiate')
+def handle_negotiate(offer):
+    """
+    Choose a binary encoding for this socket's message events (see socket_codec.py)
+    Expected data: {"codecs": ["msgpack", "json"], "compression": ["deflate"]}
+    
+    The choice is returned as the ack; {"codec": null} keeps JSON events.
+    """
+    codec = None
+    if Config.SOCKET_BINARY_CODECS and isinstance(offer, dict):
+        codec = socket_codec.negotiate(offer, threshold=Config.SOCKET_COMPRESS_THRESHOLD)
+    if codec is None:
+        socket_codecs.pop(request.sid, None)
+        return {"codec": None}
+    socket_codecs[request.sid] = codec
+    return codec.describe()
+
 @socketio.on('disconnect')
 def handle_disconnect():
-    """Handle client disconnection"""
-    print(f"Client disconnected: {request.sid}")
+    """Handle client disconnection - cancel its generations and release its conversations"""
+    sid = request.sid
+    socket_log.sampled("client_disconnected", sid=sid)
+    metrics.SOCKETIO_SESSIONS.dec()
+    socket_codecs.pop(sid, None)
+    
+    # Nobody is listening any more: drop queued turns and stop the upstream requests
+    admission.cancel_sid(sid)
+    cancelled = generation_tracker.cancel_sid(sid, "disconnect")
+    if cancelled:
+        socket_log.info("generations_cancelled", sid=sid, count=len(cancelled), reason="disconnect")
+    
+    # Release the conversations after a grace period so a reload can resume them
+    disconnected_at = time.time()
+    for conversation_id in generation_tracker.unbind_sid(sid):
+        socketio.start_background_task(_release_conversation_later, conversation_id, disconnected_at)
+
+def _release_conversation_later(conversation_id, disconnected_at):
+    """Drop a conversation that nobody reconnected to within the grace period"""
+    socketio.sleep(Config.CONVERSATION_RELEASE_GRACE_SECONDS)
+    conversation = conversation_store.get(conversation_id)
+    if conversation is None or generation_tracker.is_bound(conversation_id):
+        return
+    # Resumed since the disconnect (possibly on another replica)
+    if conversation.get("last_activity", 0) > disconnected_at:
+        return
+    generation_tracker.cancel_conversation(conversation_id, "released")
+    conversation_store.delete(conversation_id)
+    socket_log.info("conversation_released", conversation_id=conversation_id)
+
+@main.route('/api/generations/stats', methods=['GET'])
+@login_required
+def get_generation_stats():
+    """Report in-flight generations and the tokens saved by cancelling them"""
+    return jsonify({
+        "success": True,
+        "stats": generation_tracker.get_stats(),
+        "admission": admission.get_stats(),
+        "traffic_recording": traffic_recorder.get_stats()
+    })
+
+@main.route('/api/usage', methods=['GET'])
+@login_required
+def get_usage():
+    """Today's token usage and remaining budget for the current user"""
+    user_identity, _ = resolve_user_identity()
+    return jsonify({"success": True, "usage": usage_ledger.report(user_identity)})
+
+@main.route('/api/admin/usage', methods=['GET'])
+@admin_required
+def get_usage_report():
+    """Today's token usage for every user and conversation seen by this replica"""
+    return jsonify({"success": True, "usage": usage_ledger.report()})
 
 @socketio.on('send_message')
+@shutdown.tracked(TURN)
 def handle_message(data):
     """
     Handle incoming message from user
@@ -350,8 +782,12 @@ def handle_message(data):
         "message": str,
         "is_scenario_prompt": bool (optional)
     }
+    or the same packed with the socket's negotiated codec (bytes)
     """
+    received_at = time.perf_counter()
+    arrived = time.time()
     try:
+        data = unpack_payload(data)
         conversation_id = data.get('conversation_id')
         user_message = data.get('message')
         is_scenario_prompt = data.get('is_scenario_prompt', False)
@@ -360,57 +796,192 @@ def handle_message(data):
             emit('error', {'message': 'Missing conversation_id or message'})
             return
         
-        if conversation_id not in conversations:
+        conversation = conversation_store.get(conversation_id)
+        if conversation is None:
             emit('error', {'message': 'Conversation not found'})
             return
         
-        # For scenario prompts, don't add to conversation history - just use to trigger AI
-        if not is_scenario_prompt:
-            # Add user message to conversation
-            conversations[conversation_id]["messages"].append({
-                "role": "user",
-                "content": user_message,
-                "timestamp": datetime.utcnow().isoformat()
+        # Enforce token budgets before any work is done for this turn
+        user_identity, _ = resolve_user_identity()
+        
+        def record_turn(outcome, **fields):
+            # Sizes and timings only - see traffic_recorder.py
+            traffic_recorder.record(SEND_MESSAGE, conversation_id, user_identity, at=arrived,
+                                    mood=conversation.get("mood", "neutral"), in_chars=len(user_message),
+                                    scenario=True if is_scenario_prompt else None, outcome=outcome,
+                                    latency_ms=round((time.perf_counter() - received_at) * 1000, 1), **fields)
+        
+        budget = usage_ledger.check(user_identity, conversation_id, Config.AGENT_MAX_TOKENS)
+        if not budget.allowed:
+            socket_log.sampled("budget_exceeded", key=budget.reason,
+                               conversation_id=conversation_id, reason=budget.reason)
+            emit('budget_exceeded', dict(budget.to_dict(), conversation_id=conversation_id))
+            emit('error', {'message': 'Token budget exhausted - please try again later'})
+            record_turn("budget")
+            return
+        
+        # Shutting down: in-flight turns finish here, new ones go to another replica
+        if shutdown.draining:
+            emit('server_draining', {"reason": "shutdown", "conversation_id": conversation_id})
+            record_turn("draining")
+            return
+        
+        # Reserve a turn slot; sheds load instead of queueing past the SLO
+        try:
+            ticket = admission.enqueue(request.sid, conversation_id)
+        except AdmissionRejected as e:
+            socket_log.sampled("turn_rejected", key=e.reason, conversation_id=conversation_id,
+                               reason=e.reason, retry_after=e.retry_after)
+            emit('overloaded', {
+                "conversation_id": conversation_id,
+                "reason": e.reason,
+                "retry_after": e.retry_after
             })
+            record_turn("overloaded")
+            return
+        
+        try:
+            generation_tracker.bind(request.sid, conversation_id)
+        
+            # A new turn supersedes any reply still being generated (barge-in)
+            generation_tracker.cancel_conversation(conversation_id, "barge_in")
+        
+            # For scenario prompts, don't add to conversation history - just use to trigger AI
+            if not is_scenario_prompt:
+                # Add user message to conversation
+                seq = conversation_store.append_message(conversation_id, {
+                    "role": "user",
+                    "content": user_message,
+                    "timestamp": datetime.utcnow().isoformat()
+                })
+                # The client already shows the message; it only needs the cursor
+                emit('message_accepted', {"conversation_id": conversation_id, "seq": seq})
+            else:
+                conversation_store.touch(conversation_id)
+        
+            def report_position(position, estimated_wait):
+                emit('queued', {
+                    "conversation_id": conversation_id,
+                    "position": position,
+                    "estimated_wait_seconds": round(estimated_wait, 1)
+                })
         
-        # Get conversation mood
-        mood = conversations[conversation_id].get("mood", "neutral")
-        
-        # Process message with voice agent (run async in sync context)
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        result = loop.run_until_complete(
-            voice_agent.process_message(
-                user_message,
-                conversations[conversation_id]["messages"],
-                mood=mood,
-                is_scenario_prompt=is_scenario_prompt
+            # Wait for this conversation's previous turn and for a free slot
+            if not admission.wait(ticket, on_position=report_position):
+                # Superseded by a newer turn, or the socket disconnected
+                record_turn("superseded")
+                return
+            generation = generation_tracker.start(request.sid, conversation_id)
+        
+            # Get conversation mood
+            mood = conversation.get("mood", "neutral")
+            metrics.QUEUE_WAIT_SECONDS.labels(route=metrics.ROUTE_SEND_MESSAGE, mood=metrics.mood_label(mood)).observe(
+                time.perf_counter() - received_at
             )
-        )
-        loop.close()
-        
-        if result["success"]:
-            # Add agent response to conversation
-            agent_message = {
-                "role": "assistant",
-                "content": result["response"],
-                "timestamp": datetime.utcnow().isoformat(),
-                "metadata": result.get("metadata", {})
-            }
-            conversations[conversation_id]["messages"].append(agent_message)
+        
+            # Process message with voice agent (run async in sync context)
+            loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(loop)
+            try:
+                result = loop.run_until_complete(
+                    voice_agent.process_message(
+                        user_message,
+                        conversation_store.get_history(conversation_id),
+                        mood=mood,
+                        is_scenario_prompt=is_scenario_prompt,
+                        generation=generation,
+                        max_tokens=budget.max_tokens
+                    )
+                )
+            finally:
+                loop.close()
+                generation_tracker.finish(generation)
+        
+            if result.get("cancelled") or generation.cancelled:
+                # The reply is stale (newer turn) or nobody is listening (disconnect);
+                # the prompt was still billed once the request was sent
+                cancelled_meta = result.get("metadata", {})
+                usage_ledger.record(user_identity, conversation_id, cancelled_meta.get("prompt_tokens", 0),
+                                    cancelled_meta.get("completion_tokens_streamed", generation.completion_tokens))
+                saved = generation_tracker.record_cancelled_tokens(generation)
+                metrics.TOKENS_SAVED_TOTAL.inc(saved)
+                socket_log.info("generation_cancelled", conversation_id=conversation_id,
+                                reason=generation.cancel_reason,
+                                tokens_streamed=generation.completion_tokens,
+                                tokens_saved_estimate=saved)
+                record_turn("cancelled", completion_tokens=generation.completion_tokens)
+                if generation.cancel_reason == "barge_in":
+                    emit('generation_cancelled', {
+                        "conversation_id": conversation_id,
+                        "reason": generation.cancel_reason,
+                        "tokens_saved_estimate": saved
+                    })
+                return
+        
+            usage = result.get("metadata", {}).get("usage")
+            if usage:
+                usage_ledger.record(user_identity, conversation_id,
+                                    usage["prompt_tokens"], usage["completion_tokens"])
+        
+            if result["success"]:
+                # Add agent response to conversation
+                agent_message = {
+                    "role": "assistant",
+                    "content": result["response"],
+                    "timestamp": datetime.utcnow().isoformat(),
+                    "metadata": result.get("metadata", {})
+                }
+                agent_message["seq"] = conversation_store.append_message(conversation_id, agent_message)
             
-            # Send response to client
-            emit('message_response', {
-                "conversation_id": conversation_id,
-                "message": agent_message
-            })
-        else:
-            emit('error', {'message': result.get("error", "Failed to process message")})
+                # Send response to client
+                emit_messages('message_response', {
+                    "conversation_id": conversation_id,
+                    "message": agent_message,
+                    "degraded": budget.degraded
+                })
+                record_turn("ok", out_chars=len(result["response"]),
+                            prompt_tokens=usage and usage["prompt_tokens"],
+                            completion_tokens=usage and usage["completion_tokens"])
+            else:
+                emit('error', {'message': result.get("error", "Failed to process message")})
+                record_turn("error")
+        finally:
+            admission.release(ticket)
             
     except Exception as e:
-        print(f"Error handling message: {str(e)}")
+        socket_log.exception("send_message_failed")
         emit('error', {'message': str(e)})
 
+@socketio.on('resume')
+def handle_resume(data):
+    """
+    Re-attach a reconnected socket to its conversation and replay what it missed
+    Expected data: {"conversation_id": str, "last_seq": int}
+    
+    Only messages after last_seq are sent, so a resync costs O(new messages).
+    """
+    conversation_id = (data or {}).get('conversation_id')
+    if not conversation_id or not conversation_store.exists(conversation_id):
+        emit('error', {'message': 'Conversation not found'})
+        return
+    try:
+        last_seq = max(0, int(data.get('last_seq') or 0))
+    except (TypeError, ValueError):
+        last_seq = 0
+    
+    # Bound again, the conversation survives the release grace period of the old socket
+    generation_tracker.bind(request.sid, conversation_id)
+    conversation_store.touch(conversation_id)
+    
+    messages = conversation_store.get_messages(conversation_id, last_seq)
+    socket_log.sampled("conversation_resumed", conversation_id=conversation_id,
+                       last_seq=last_seq, replayed=len(messages))
+    emit_messages('messages_sync', {
+        "conversation_id": conversation_id,
+        "messages": messages,
+        "last_seq": messages[-1]["seq"] if messages else last_seq
+    })
+
 @socketio.on('audio_data')
 def handle_audio(data):
     """
@@ -420,7 +991,7 @@ def handle_audio(data):
     # TODO: Implement audio processing with Azure Speech Services
     emit('audio_processing', {'status': 'Audio processing not yet implemented'})
 
-@app.route('/api/admin/seed-demo-data', methods=['POST'])
+@main.route('/api/admin/seed-demo-data', methods=['POST'])
 def seed_demo_data():
     """
     Seed demo analytics data for testing
@@ -431,6 +1002,8 @@ def seed_demo_data():
     1. Secure this endpoint (require admin role)
     2. Use actual user identities from your organization
     3. Or remove it entirely for production
+    
+    For load testing at scale use the CLI instead: python demo_data.py --help
     """
     # Example users - replace with your own test accounts
     users = [
@@ -438,73 +1011,78 @@ def seed_demo_data():
         'testuser2@example.com'
     ]
     
-    base_scores = {
-        'professionalism': 15,
-        'communication': 14,
-        'problem_resolution': 13,
-        'empathy': 14,
-        'efficiency': 13
-    }
-    
-    results = []
-    
-    for user in users:
-        for i in range(5):
-            conversation_id = str(uuid.uuid4())
-            improvement = i * 1.5
-            variance = random.uniform(-1, 2)
-            
-            scores = {
-                'professionalism': min(25, base_scores['professionalism'] + improvement + variance),
-                'communication': min(25, base_scores['communication'] + improvement + variance),
-                'problem_resolution': min(25, base_scores['problem_resolution'] + improvement + variance),
-                'empathy': min(25, base_scores['empathy'] + improvement + variance),
-                'efficiency': min(25, base_scores['efficiency'] + improvement + variance)
-            }
-            
-            scores = {k: round(v, 1) for k, v in scores.items()}
-            total = round(sum(scores.values()), 1)
-            
-            analysis = {
-                'scores': scores,
-                'total_score': total,
-                'strengths': ['Good performance', 'Steady improvement'],
-                'improvements': ['Continue practicing' if total < 90 else 'Excellent work'],
-                'overall_feedback': f"Score: {total}/125"
-            }
-            
-            message_count = random.randint(8, 25)
-            
-            success = storage_service.save_conversation_score(
-                conversation_id=conversation_id,
-                user_identity=user,
-                auth_method="Azure AD (Entra ID)",
-                analysis=analysis,
-                message_count=message_count
-            )
-            
-            results.append({
-                'user': user,
-                'conversation': i + 1,
-                'total': total,
-                'success': success
-            })
+    # Same generator as the CLI: learning-curve scores, written as one batch per user
+    summary = demo_data.seed_users(storage_service, users, sessions=5,
+                                   auth_method="Azure AD (Entra ID)")
     
     return jsonify({
         'status': 'completed',
-        'results': results
+        'summary': summary
     })
 
+def create_app(config_object=Config):
+    """
+    Build the Flask application
+    
+    Network clients are NOT created here: warm-up runs in background threads
+    while telemetry and Flask are set up, so the port binds without waiting
+    for Entra ID tokens or Table Storage.
+    """
+    if config_object.WARMUP_ON_START:
+        warmup.start()
+    usage_ledger.start()
+    atexit.register(usage_ledger.stop)
+    traffic_recorder.start()
+    atexit.register(traffic_recorder.stop)
+    # Flushed in this order after a SIGTERM drain (atexit does not run then)
+    shutdown.add_flusher('usage_ledger', usage_ledger.stop)
+    shutdown.add_flusher('traffic_recorder', traffic_recorder.stop)
+    if config_object.MEMORY_PROFILE_SAMPLING:
+        memory_profiler.start_sampling()
+    
+    configure_telemetry()
+    
+    flask_app = Flask(__name__)
+    flask_app.config.from_object(config_object)
+    CORS(flask_app)
+    flask_app.register_blueprint(main)
+    flask_app.register_blueprint(assets)
+    
+    # Initialize SocketIO for real-time communication
+    # With a message queue (Redis), any replica can emit to any client, so the app
+    # can run several replicas/workers without sticky sessions
+    socketio.init_app(
+        flask_app,
+        cors_allowed_origins="*",
+        async_mode='eventlet',
+        message_queue=config_object.SOCKETIO_MESSAGE_QUEUE
+    )
+    
+    # Restore conversations journaled before the last restart / deploy; clients
+    # that reconnect within the grace period continue where they left off
+    if hasattr(conversation_store, 'recover'):
+        restored_at = time.time()
+        try:
+            restored = conversation_store.recover()
+        except Exception as e:
+            log.error("journal_recovery_failed", error=str(e), impact="conversations are not journaled")
+            restored = []
+        else:
+            atexit.register(conversation_store.close)
+            shutdown.add_flusher('conversation_journal', conversation_store.close)
+        for conversation_id in restored:
+            socketio.start_background_task(_release_conversation_later, conversation_id, restored_at)
+    return flask_app
+
+app = create_app()
+
 if __name__ == '__main__':
     try:
         Config.validate_config()
-        print("\n" + "="*60)
-        print("Voice Agent Simulator Starting...")
-        print("="*60)
-        print(f"Environment: {Config.ENV}")
-        print(f"Port: {Config.PORT}")
-        print(f"Agent: {Config.AGENT_NAME}")
-        print("="*60 + "\n")
+        log.info("server_starting", environment=Config.ENV, port=Config.PORT, agent=Config.AGENT_NAME)
+        
+        # SIGTERM (scale-in, new revision) drains in-flight work before exiting
+        shutdown.install()
         
         socketio.run(
             app,
@@ -512,6 +1090,5 @@ if __name__ == '__main__':
             port=Config.PORT,
             debug=Config.DEBUG
         )
-    except Exception as e:
-        print(f"\n✗ Failed to start application: {str(e)}")
-        print("Please check your configuration in .env file\n")
+    except Exception:
+        log.exception("server_start_failed", hint="check your configuration in the .env file")
@@ -0,0 +1,144 @@
+"""
+Evaluation latency benchmark: single-shot rubric vs chunked map-reduce
+
+Evaluates synthetic transcripts of increasing length twice - once as one
+prompt (EVAL_CHUNK_THRESHOLD_CHARS=0) and once as overlapping windows scored
+in parallel - and reports the end-to-end latency of analyze_interaction().
+
+By default the model is called for real (uses your .env, costs tokens).
+With --simulate a latency model stands in for the endpoint: a fixed
+round trip, plus prefill time per prompt token, plus decode time per reply
+token. Tune it to your deployment with --rtt/--prefill-ms/--decode-ms.
+
+Usage (from the src/ folder):
+    python benchmarks/chunked_eval_benchmark.py --turns 20,80,200 --runs 3
+    python benchmarks/chunked_eval_benchmark.py --simulate --turns 20,80,200,400
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from types import SimpleNamespace
+
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SRC_DIR)
+
+from agent import VoiceAgent  # noqa: E402
+from config import Config  # noqa: E402
+from model_routing import build_routes  # noqa: E402
+
+CUSTOMER_LINES = [
+    "I ordered a replacement router three weeks ago, it still hasn't arrived, and my internet keeps "
+    "dropping every evening when I need it for work. I've already restarted it more times than I can count.",
+    "That's what the last person told me too. I was promised a callback on Tuesday and nobody called, "
+    "so I'm honestly not sure why I should believe it this time.",
+    "Okay, I can check that. The light on the front is blinking orange and the one next to it is off.",
+]
+AGENT_LINES = [
+    "I'm really sorry about the trouble, I understand how frustrating it is when your connection drops "
+    "during work. Could you confirm the order number so I can look into the replacement?",
+    "Thank you. I can see the replacement was held at the depot. I'll escalate it now and arrange "
+    "next-day delivery, and you'll get a tracking number by email within the hour.",
+    "While we wait, could you tell me what the lights on the front of the router are showing? That helps "
+    "me check whether we can stabilize the current one in the meantime.",
+]
+
+
+def make_transcript(turns: int, seed: int):
+    rng = random.Random(seed)
+    messages = []
+    for i in range(turns):
+        role, lines = ("assistant", CUSTOMER_LINES) if i % 2 == 0 else ("user", AGENT_LINES)
+        messages.append({"role": role, "content": rng.choice(lines), "timestamp": f"2025-01-01T00:{i // 60 % 60:02d}:{i % 60:02d}"})
+    return messages
+
+
+class SimulatedCompletions:
+    """Stand-in for client.chat.completions: sleeps like a model would, returns a valid rubric"""
+
+    def __init__(self, rtt: float, prefill_ms: float, decode_ms: float, reply_tokens: int):
+        self.rtt = rtt
+        self.prefill = prefill_ms / 1000
+        self.decode = decode_ms / 1000
+        self.reply_tokens = reply_tokens
+
+    def create(self, model, messages, max_tokens=None, **kwargs):
+        prompt_tokens = sum(len(m["content"]) for m in messages) // 4
+        # The compact rubric (one strength, one improvement, one sentence) replies in about half the tokens
+        compact = "(1 sentence)" in messages[-1]["content"]
+        completion_tokens = self.reply_tokens // 2 if compact else self.reply_tokens
+        completion_tokens = min(completion_tokens, max_tokens or completion_tokens)
+        time.sleep(self.rtt + prompt_tokens * self.prefill + completion_tokens * self.decode)
+        content = json.dumps({
+            "scores": {"professionalism": 4, "communication": 4, "problem_resolution": 3, "empathy": 5, "efficiency": 4},
+            "total_score": 20,
+            "strengths": ["Acknowledged the customer's frustration"],
+            "improvements": ["Confirm the next step before closing"],
+            "overall_feedback": "Empathetic and clear, with a concrete escalation.",
+        })
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=content))],
+            usage=SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens))
+
+
+def build_agent(args) -> VoiceAgent:
+    if not args.simulate:
+        return VoiceAgent()
+    agent = VoiceAgent.__new__(VoiceAgent)
+    agent.config = Config()
+    agent.routes = build_routes(agent.config)
+    agent.agent = None
+    agent.client = SimpleNamespace(chat=SimpleNamespace(completions=SimulatedCompletions(
+        args.rtt, args.prefill_ms, args.decode_ms, args.reply_tokens)))
+    return agent
+
+
+def timed(agent: VoiceAgent, transcript, threshold: int, runs: int):
+    agent.config.EVAL_CHUNK_THRESHOLD_CHARS = threshold
+    latencies, analysis = [], None
+    for _ in range(runs):
+        started = time.perf_counter()
+        analysis = agent.analyze_interaction(transcript)
+        latencies.append(time.perf_counter() - started)
+    return statistics.median(latencies), analysis
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare single-shot and chunked evaluation latency")
+    parser.add_argument("--turns", default="20,80,200", help="Comma-separated transcript lengths (messages)")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--simulate", action="store_true", help="Use a latency model instead of the endpoint")
+    parser.add_argument("--rtt", type=float, default=0.3, help="Simulated round trip, seconds")
+    parser.add_argument("--prefill-ms", type=float, default=0.05, help="Simulated ms per prompt token")
+    parser.add_argument("--decode-ms", type=float, default=20.0, help="Simulated ms per reply token")
+    parser.add_argument("--reply-tokens", type=int, default=250, help="Simulated full rubric reply length")
+    parser.add_argument("--window-turns", type=int, help="Override EVAL_CHUNK_TURNS")
+    parser.add_argument("--concurrency", type=int, help="Override EVAL_CHUNK_CONCURRENCY")
+    args = parser.parse_args(argv)
+
+    agent = build_agent(args)
+    if args.window_turns:
+        agent.config.EVAL_CHUNK_TURNS = args.window_turns
+    if args.concurrency:
+        agent.config.EVAL_CHUNK_CONCURRENCY = args.concurrency
+    chunk_threshold = 1  # force the chunked path for every length
+    print(f"windows of {agent.config.EVAL_CHUNK_TURNS} messages, overlap {agent.config.EVAL_CHUNK_OVERLAP}, "
+          f"concurrency {agent.config.EVAL_CHUNK_CONCURRENCY}{' (simulated model)' if args.simulate else ''}")
+    print(f"{'messages':>8}{'chars':>9}{'windows':>9}{'single s':>10}{'chunked s':>11}{'speedup':>9}"
+          f"{'single':>8}{'chunked':>9}")
+    for turns in (int(t) for t in args.turns.split(",")):
+        transcript = make_transcript(turns, seed=turns)
+        chars = len(agent._format_conversation(transcript))
+        windows = len(agent._transcript_windows(transcript))
+        single, single_analysis = timed(agent, transcript, 0, args.runs)
+        chunked, chunked_analysis = timed(agent, transcript, chunk_threshold, args.runs)
+        print(f"{turns:>8}{chars:>9}{windows:>9}{single:>10.2f}{chunked:>11.2f}{single / chunked:>8.1f}x"
+              f"{single_analysis['total_score']:>8}{chunked_analysis['total_score']:>9}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,106 @@
+"""
+Memory benchmark: bytes per conversation turn, dict vs compact Message
+
+Builds the same synthetic conversations twice - once as the dicts the store
+used to hold, once as messages.Message objects - and measures the memory
+each representation keeps alive with tracemalloc.
+
+Usage (from the src/ folder):
+    python benchmarks/message_memory_benchmark.py --conversations 2000 --turns 20
+"""
+import argparse
+import gc
+import os
+import sys
+import tracemalloc
+from datetime import datetime, timedelta
+
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SRC_DIR)
+
+from messages import Message  # noqa: E402
+
+USER_TEXT = "Hi, I was charged twice for my order {n} and I need a refund as soon as possible."
+ASSISTANT_TEXT = ("I'm still waiting on that refund for order {n}. I called last week and was told it "
+                  "would take three days, but nothing has arrived. Can you check what happened?")
+
+
+def make_turn(conversation: int, turn: int, started: datetime) -> dict:
+    """One turn in the dict shape handle_message produces"""
+    timestamp = (started + timedelta(seconds=turn * 7, microseconds=turn)).isoformat()
+    if turn % 2 == 0:
+        return {"role": "user", "content": USER_TEXT.format(n=conversation * 1000 + turn),
+                "timestamp": timestamp}
+    return {
+        "role": "assistant",
+        "content": ASSISTANT_TEXT.format(n=conversation * 1000 + turn),
+        "timestamp": timestamp,
+        "metadata": {
+            "agent_name": "CORA - Customer Service Simulator",
+            "model": "gpt-4o",
+            "usage": {"prompt_tokens": 400 + turn * 60, "completion_tokens": 55,
+                      "total_tokens": 455 + turn * 60},
+        },
+    }
+
+
+def measure(build, conversations: int, turns: int) -> int:
+    """Bytes still allocated after building every conversation with `build`"""
+    gc.collect()
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    store = build(conversations, turns)
+    gc.collect()
+    retained = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+    del store
+    return retained
+
+
+def build_dicts(conversations: int, turns: int):
+    started = datetime(2025, 1, 1)
+    return [[make_turn(c, t, started) for t in range(turns)] for c in range(conversations)]
+
+
+def build_messages(conversations: int, turns: int):
+    started = datetime(2025, 1, 1)
+    return [[Message.from_dict(make_turn(c, t, started)) for t in range(turns)] for c in range(conversations)]
+
+
+def content_bytes(conversations: int, turns: int) -> int:
+    """Bytes of the message text itself (identical in both representations)"""
+    started = datetime(2025, 1, 1)
+    return sum(sys.getsizeof(make_turn(c, t, started)["content"])
+               for c in range(conversations) for t in range(turns))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare memory per turn: dict vs Message")
+    parser.add_argument("--conversations", type=int, default=2000)
+    parser.add_argument("--turns", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    total_turns = args.conversations * args.turns
+    text = content_bytes(args.conversations, args.turns)
+
+    # Correctness first: the API shape must round-trip unchanged
+    sample = make_turn(1, 3, datetime(2025, 1, 1))
+    assert Message.from_dict(sample).to_dict() == sample, "Message does not round-trip"
+
+    print(f"{args.conversations} conversations x {args.turns} turns = {total_turns} turns")
+    print(f"{'representation':<16}{'total MB':>10}{'B/turn':>10}{'overhead B/turn':>18}")
+    results = {}
+    for name, build in (("dict", build_dicts), ("Message", build_messages)):
+        retained = measure(build, args.conversations, args.turns)
+        results[name] = retained
+        print(f"{name:<16}{retained / 1e6:>10.1f}{retained / total_turns:>10.0f}"
+              f"{(retained - text) / total_turns:>18.0f}")
+
+    saved = 1 - results["Message"] / results["dict"]
+    print(f"Message uses {saved:.0%} less memory per turn "
+          f"({(results['dict'] - results['Message']) / total_turns:.0f} B/turn saved)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
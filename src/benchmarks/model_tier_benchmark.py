@@ -0,0 +1,104 @@
+"""
+Model tier benchmark: latency of each workload on each deployment
+
+Sends the same customer-turn and evaluation requests the app sends to the
+conversation-tier and evaluation-tier deployments (see model_routing.py) and
+reports time to first token and total latency per tier, against each route's
+SLO.
+
+Uses your .env (AZURE_AI_FOUNDRY_ENDPOINT, CONVERSATION_MODEL_NAME,
+EVALUATION_MODEL_NAME, ...) and makes real, billed model calls.
+
+Usage (from the src/ folder):
+    python benchmarks/model_tier_benchmark.py --runs 10
+    python benchmarks/model_tier_benchmark.py --deployments gpt-4o-mini,gpt-4o --workloads conversation
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from dataclasses import replace
+
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SRC_DIR)
+
+from agent import VoiceAgent  # noqa: E402
+from model_routing import CONVERSATION, EVALUATION  # noqa: E402
+
+CUSTOMER_TURN = [
+    {"role": "assistant", "content": "Hi, I was charged twice for my order last week and I'd like the extra charge refunded."},
+    {"role": "user", "content": "I'm sorry about that. Could you give me the order number so I can take a look?"},
+]
+AGENT_REPLY = "Thanks. I can see both charges. I'll refund the duplicate today - you should see it in 3-5 business days."
+
+
+def percentile(values, q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def conversation_call(agent: VoiceAgent, route):
+    """One streamed customer turn, as process_message sends it; returns (ttft, total)"""
+    messages = [{"role": "system", "content": agent.config.AGENT_SYSTEM_PROMPT}] + CUSTOMER_TURN + [
+        {"role": "user", "content": AGENT_REPLY}]
+    started = time.perf_counter()
+    first = None
+    stream = agent.client.chat.completions.create(messages=messages, stream=True, **route.request_options())
+    try:
+        for chunk in stream:
+            if first is None and chunk.choices and chunk.choices[0].delta.content:
+                first = time.perf_counter()
+    finally:
+        stream.close()
+    total = time.perf_counter() - started
+    return (first - started) if first else total, total
+
+
+def evaluation_call(agent: VoiceAgent, route):
+    """One rubric evaluation, as analyze_interaction sends it; returns (ttft, total)"""
+    prompt = agent._rubric_prompt(agent._format_conversation(CUSTOMER_TURN + [
+        {"role": "user", "content": AGENT_REPLY},
+        {"role": "assistant", "content": "Okay, thank you. That's all I needed."}]))
+    started = time.perf_counter()
+    agent.client.chat.completions.create(
+        messages=[{"role": "system", "content": "You are a customer service quality evaluator. Respond only with valid JSON."},
+                  {"role": "user", "content": prompt}],
+        **route.request_options())
+    total = time.perf_counter() - started
+    return total, total
+
+
+WORKLOADS = {CONVERSATION: conversation_call, EVALUATION: evaluation_call}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare model latency per tier and workload")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--deployments", help="Comma-separated deployments (default: both route deployments)")
+    parser.add_argument("--workloads", default=f"{CONVERSATION},{EVALUATION}")
+    args = parser.parse_args(argv)
+
+    agent = VoiceAgent()
+    deployments = (args.deployments.split(",") if args.deployments
+                   else list(dict.fromkeys(r.deployment for r in agent.routes.values())))
+
+    print(f"{'workload':<14}{'deployment':<24}{'ttft p50':>9}{'ttft p95':>9}{'p50 s':>8}{'p95 s':>8}"
+          f"{'slo s':>7}{'misses':>8}")
+    for workload in args.workloads.split(","):
+        route = agent.routes[workload]
+        for deployment in deployments:
+            tiered = replace(route, deployment=deployment)
+            WORKLOADS[workload](agent, tiered)  # warm the connection
+            samples = [WORKLOADS[workload](agent, tiered) for _ in range(args.runs)]
+            ttfts = [s[0] for s in samples]
+            totals = [s[1] for s in samples]
+            misses = sum(1 for t in totals if route.slo_seconds and t > route.slo_seconds)
+            print(f"{workload:<14}{deployment:<24}{statistics.median(ttfts):>9.2f}{percentile(ttfts, 0.95):>9.2f}"
+                  f"{statistics.median(totals):>8.2f}{percentile(totals, 0.95):>8.2f}"
+                  f"{route.slo_seconds:>7.1f}{misses:>5}/{len(totals)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,136 @@
+"""
+Pre-scorer benchmark: throughput and triage on a transcript corpus
+
+Scores a corpus of conversations with prescorer.PreScorer at several batch
+sizes and reports conversations/s, how many model evaluations would be
+skipped or shortened, and the estimated evaluation tokens that saves.
+
+The corpus is either a JSONL file (one conversation per line: a list of
+messages, or {"messages": [...]}) or a synthetic one with a realistic mix of
+abandoned, short and full role-plays.
+
+Usage (from the src/ folder):
+    python benchmarks/prescorer_benchmark.py --conversations 20000
+    python benchmarks/prescorer_benchmark.py --corpus transcripts.jsonl
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SRC_DIR)
+
+import numpy as np  # noqa: E402
+
+from prescorer import FEATURES, PreScorer, extract_features  # noqa: E402
+
+CUSTOMER_LINES = [
+    "Hi, I was charged twice for my last order and I need this fixed.",
+    "I've been waiting two weeks for a refund. What is going on?",
+    "The device you sent me stopped working after three days.",
+    "Okay. How long will that take?",
+    "That's not good enough, I already called twice.",
+    "Thanks, that helps.",
+]
+AGENT_LINES = [
+    "I'm so sorry to hear that. I understand how frustrating that must be.",
+    "Could you please give me your order number?",
+    "Let me check that for you right now.",
+    "I will process a refund for the duplicate charge today, and you'll get a confirmation email.",
+    "ok",
+    "I can arrange a replacement to ship tomorrow. Is the address on file still correct?",
+    "Thank you for your patience. Is there anything else I can help you with?",
+]
+
+# Rough cost of one full evaluation: rubric prompt plus a ~250-token JSON reply
+RUBRIC_PROMPT_TOKENS = 350
+FULL_REPLY_TOKENS = 250
+SHORT_REPLY_TOKENS = 120
+
+
+def synthetic_corpus(conversations: int, seed: int):
+    """Conversations as message dicts; ~15% abandoned, ~30% short, the rest full"""
+    rng = random.Random(seed)
+    started = datetime(2025, 1, 1)
+    corpus = []
+    for _ in range(conversations):
+        kind = rng.random()
+        agent_turns = 0 if kind < 0.08 else 1 if kind < 0.15 else rng.randint(2, 4) if kind < 0.45 else rng.randint(5, 12)
+        clock = started + timedelta(seconds=rng.randint(0, 86400 * 30))
+        messages = [{"role": "assistant", "content": rng.choice(CUSTOMER_LINES), "timestamp": clock.isoformat()}]
+        for _ in range(agent_turns):
+            clock += timedelta(seconds=rng.uniform(4, 120))
+            messages.append({"role": "user", "content": rng.choice(AGENT_LINES), "timestamp": clock.isoformat()})
+            clock += timedelta(seconds=rng.uniform(1, 5))
+            messages.append({"role": "assistant", "content": rng.choice(CUSTOMER_LINES), "timestamp": clock.isoformat()})
+        corpus.append(messages)
+    return corpus
+
+
+def load_corpus(path: str):
+    corpus = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                corpus.append(record["messages"] if isinstance(record, dict) else record)
+    return corpus
+
+
+def evaluation_tokens(conversation, decision: str) -> int:
+    """Estimated model tokens to evaluate one conversation (~4 characters per token)"""
+    if decision == "skip":
+        return 0
+    transcript = sum(len(m["content"]) for m in conversation) // 4
+    reply = SHORT_REPLY_TOKENS if decision == "short" else FULL_REPLY_TOKENS
+    return RUBRIC_PROMPT_TOKENS + transcript + reply
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the heuristic pre-scorer")
+    parser.add_argument("--conversations", type=int, default=20000, help="Synthetic corpus size")
+    parser.add_argument("--corpus", help="JSONL transcript corpus (overrides --conversations)")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--batch-sizes", default="1,64,1024,8192")
+    args = parser.parse_args(argv)
+
+    corpus = load_corpus(args.corpus) if args.corpus else synthetic_corpus(args.conversations, args.seed)
+    scorer = PreScorer()
+    print(f"{len(corpus)} conversations, {sum(len(c) for c in corpus)} messages")
+
+    # Correctness first: batching must not change any conversation's features
+    sample = corpus[:200]
+    batched = extract_features(sample)
+    single = np.vstack([extract_features([c]) for c in sample])
+    assert np.allclose(batched, single), "batched features differ from per-conversation features"
+
+    print(f"{'batch size':>10}{'seconds':>10}{'conv/s':>12}{'us/conv':>10}")
+    for batch_size in (int(b) for b in args.batch_sizes.split(",")):
+        started = time.perf_counter()
+        results = []
+        for i in range(0, len(corpus), batch_size):
+            results.extend(scorer.score_batch(corpus[i:i + batch_size]))
+        elapsed = time.perf_counter() - started
+        print(f"{batch_size:>10}{elapsed:>10.2f}{len(corpus) / elapsed:>12.0f}{elapsed / len(corpus) * 1e6:>10.1f}")
+
+    decisions = Counter(r.decision for r in results)
+    print("triage: " + ", ".join(f"{d}={decisions.get(d, 0)} ({decisions.get(d, 0) / len(corpus):.0%})"
+                                 for d in ("skip", "short", "full")))
+
+    baseline = sum(evaluation_tokens(c, "full") for c in corpus)
+    triaged = sum(evaluation_tokens(c, r.decision) for c, r in zip(corpus, results))
+    print(f"estimated evaluation tokens: {baseline} -> {triaged} ({1 - triaged / baseline:.0%} saved)")
+
+    totals = np.array([r.total_score for r in results])
+    print(f"provisional total score: mean {totals.mean():.1f}, p10 {np.percentile(totals, 10):.0f}, "
+          f"p90 {np.percentile(totals, 90):.0f} ({len(FEATURES)} features)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,153 @@
+"""
+Socket.IO payload benchmark: bytes and CPU per event, JSON vs negotiated codecs
+
+Encodes the events of a synthetic session - one message_response per agent
+reply, plus a messages_sync resync after a reconnect - the way app.py sends
+them to a plain JSON client and to clients that negotiated a binary codec
+(socket_codec.py), and reports per event:
+
+- wire bytes: the Socket.IO packet(s) as sent over the WebSocket, including
+  the placeholder text frame that precedes every binary attachment
+- server CPU to encode, and CPU to decode (a stand-in for the client's work)
+
+Usage (from the src/ folder):
+    python benchmarks/socket_codec_benchmark.py --turns 20
+    python benchmarks/socket_codec_benchmark.py --reply-chars 3000 --threshold 512
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SRC_DIR)
+
+import socket_codec  # noqa: E402
+
+# Replies are shuffled from these words: repeating one sentence would flatter deflate
+REPLY_WORDS = ("I'm still waiting on that refund for order 48213. I called last week and was told it "
+               "would take three days, but nothing has arrived. Can you check what happened? The "
+               "charge shows twice on my statement, my card was billed again yesterday, and nobody "
+               "answered my email. Honestly this is frustrating, I just want my money back or a "
+               "replacement shipped today. Which account number do you need from me?").split()
+
+
+def json_packet(event: str, payload) -> bytes:
+    """A Socket.IO EVENT packet as python-socketio serializes it for JSON clients"""
+    return ("42" + json.dumps([event, payload], separators=(",", ":"))).encode("utf-8")
+
+
+def binary_packets(event: str, attachment: bytes) -> int:
+    """Wire bytes of a BINARY_EVENT: placeholder text frame + the attachment frame"""
+    header = "451-" + json.dumps([event, {"_placeholder": True, "num": 0}], separators=(",", ":"))
+    return len(header.encode("utf-8")) + len(attachment)
+
+
+def agent_message(turn: int, reply_chars: int, started: datetime) -> dict:
+    """An agent message in the shape handle_message emits"""
+    rng = random.Random(turn)
+    words = []
+    while sum(len(w) + 1 for w in words) < reply_chars:
+        words.append(rng.choice(REPLY_WORDS))
+    content = " ".join(words)[:reply_chars]
+    return {
+        "role": "assistant",
+        "content": content,
+        "timestamp": (started + timedelta(seconds=turn * 9, microseconds=turn)).isoformat(),
+        "metadata": {
+            "agent_name": "CORA - Customer Service Simulator",
+            "model": "gpt-4o-mini",
+            "usage": {"prompt_tokens": 400 + turn * 60, "completion_tokens": 55,
+                      "total_tokens": 455 + turn * 60},
+        },
+        "seq": turn * 2,
+    }
+
+
+def session_events(turns: int, reply_chars: int):
+    """(event, payload) pairs: one message_response per turn, then a full resync"""
+    started = datetime(2025, 1, 1)
+    conversation_id = "7f1d2a9c-4b0e-4c6a-9f51-2d7c8e3b6a10"
+    messages = []
+    events = []
+    for turn in range(1, turns + 1):
+        messages.append({"role": "user", "content": "Let me look into that order for you.",
+                         "timestamp": started.isoformat(), "seq": turn * 2 - 1})
+        message = agent_message(turn, reply_chars, started)
+        messages.append(message)
+        events.append(("message_response", {"conversation_id": conversation_id, "message": message,
+                                            "degraded": False}))
+    events.append(("messages_sync", {"conversation_id": conversation_id, "messages": messages,
+                                     "last_seq": messages[-1]["seq"]}))
+    return events
+
+
+def measure(events, make_codec, repeat: int):
+    """Total wire bytes and per-event encode/decode seconds for one client type"""
+    wire = {"message_response": 0, "messages_sync": 0}
+    encode_seconds = decode_seconds = 0.0
+    for _ in range(repeat):
+        codec = make_codec()  # One session: static metadata is sent once
+        for event, payload in events:
+            started = time.perf_counter()
+            if codec is None:
+                packet = json_packet(event, payload)
+                encode_seconds += time.perf_counter() - started
+                size = len(packet)
+                started = time.perf_counter()
+                json.loads(packet[2:])
+            else:
+                attachment = codec.encode_event(payload)
+                encode_seconds += time.perf_counter() - started
+                size = binary_packets(event, attachment)
+                started = time.perf_counter()
+                codec.decode(attachment)
+            decode_seconds += time.perf_counter() - started
+            wire[event] += size
+    count = len(events) * repeat
+    return {event: total / repeat for event, total in wire.items()}, encode_seconds / count, decode_seconds / count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare Socket.IO payload size and CPU per event")
+    parser.add_argument("--turns", type=int, default=20, help="Agent replies per session")
+    parser.add_argument("--reply-chars", type=int, default=400, help="Characters per agent reply")
+    parser.add_argument("--threshold", type=int, default=1024, help="Deflate payloads of at least this many bytes")
+    parser.add_argument("--repeat", type=int, default=200, help="Sessions encoded per client type")
+    args = parser.parse_args(argv)
+
+    events = session_events(args.turns, args.reply_chars)
+    clients = [("json (legacy)", lambda: None),
+               ("json binary", lambda: socket_codec.SessionCodec(socket_codec.CODEC_JSON)),
+               ("json+deflate", lambda: socket_codec.SessionCodec(socket_codec.CODEC_JSON, True, args.threshold))]
+    if socket_codec.msgpack is not None:
+        clients += [("msgpack", lambda: socket_codec.SessionCodec(socket_codec.CODEC_MSGPACK)),
+                    ("msgpack+deflate",
+                     lambda: socket_codec.SessionCodec(socket_codec.CODEC_MSGPACK, True, args.threshold))]
+    else:
+        print("⚠ msgpack not installed - only JSON codecs are compared")
+
+    # Correctness first: a packed event must decode to the same payload, minus repeated metadata
+    codec = socket_codec.SessionCodec(socket_codec.supported_codecs()[0], True, args.threshold)
+    for event, payload in events[:2]:
+        decoded = codec.decode(codec.encode_event(payload))
+        assert decoded["message"]["content"] == payload["message"]["content"], "codec does not round-trip"
+
+    print(f"{args.turns} replies of {args.reply_chars} chars + 1 resync of {args.turns * 2} messages, "
+          f"deflate threshold {args.threshold} B")
+    print(f"{'client':<18}{'B/reply':>10}{'B/resync':>11}{'vs json':>9}{'encode us':>11}{'decode us':>11}")
+    baseline = None
+    for name, make_codec in clients:
+        wire, encode, decode = measure(events, make_codec, args.repeat)
+        total = wire["message_response"] + wire["messages_sync"]
+        baseline = baseline or total
+        print(f"{name:<18}{wire['message_response'] / args.turns:>10.0f}{wire['messages_sync']:>11.0f}"
+              f"{total / baseline:>9.0%}{encode * 1e6:>11.1f}{decode * 1e6:>11.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
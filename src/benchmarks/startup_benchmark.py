@@ -0,0 +1,113 @@
+"""
+Cold-start benchmark: time from process start to first served request
+
+Measures, over several runs of a fresh `python app.py` process:
+  - import time of app.py (warm-up disabled, so no network is involved)
+  - time until /healthz answers (the port is bound and serving)
+  - time until /readyz answers 200 (external clients warm), if it does
+
+Usage (from the src/ folder):
+    python benchmarks/startup_benchmark.py --runs 5
+
+The benchmark uses your .env / environment. To measure the app server alone
+without Azure, set AZURE_AI_FOUNDRY_API_KEY to any value: the OpenAI client is
+then created without fetching a token, and no storage account is contacted.
+"""
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _status(url: str) -> int:
+    try:
+        with urllib.request.urlopen(url, timeout=1) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+    except OSError:
+        return 0
+
+
+def measure_import(env: dict) -> float:
+    """Seconds to import app.py with warm-up disabled"""
+    env = dict(env, WARMUP_ON_START="false")
+    code = "import time; t = time.perf_counter(); import app; print(time.perf_counter() - t)"
+    out = subprocess.run([sys.executable, "-c", code], cwd=SRC_DIR, env=env,
+                         capture_output=True, text=True, check=True)
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def measure_startup(env: dict, timeout: float):
+    """Return (seconds to /healthz 200, seconds to /readyz 200 or None)"""
+    port = _free_port()
+    env = dict(env, FLASK_PORT=str(port), FLASK_ENV="production")
+    base = f"http://127.0.0.1:{port}"
+    started = time.perf_counter()
+    process = subprocess.Popen([sys.executable, "app.py"], cwd=SRC_DIR, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    live = ready = None
+    try:
+        while time.perf_counter() - started < timeout:
+            if live is None and _status(f"{base}/healthz") == 200:
+                live = time.perf_counter() - started
+            if live is not None and _status(f"{base}/readyz") == 200:
+                ready = time.perf_counter() - started
+                break
+            if process.poll() is not None:
+                break
+            time.sleep(0.01)
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+    return live, ready
+
+
+def _summary(name: str, values) -> str:
+    values = [v for v in values if v is not None]
+    if not values:
+        return f"{name:<26} n/a"
+    return (f"{name:<26} median {statistics.median(values) * 1000:8.1f} ms   "
+            f"min {min(values) * 1000:8.1f} ms   max {max(values) * 1000:8.1f} ms   (n={len(values)})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--timeout", type=float, default=60.0, help="seconds to wait for readiness per run")
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    env.setdefault("AZURE_AI_FOUNDRY_ENDPOINT", "https://example.cognitiveservices.azure.com/")
+
+    imports, lives, readies = [], [], []
+    for run in range(1, args.runs + 1):
+        imports.append(measure_import(env))
+        live, ready = measure_startup(env, args.timeout)
+        lives.append(live)
+        readies.append(ready)
+        print(f"run {run}: import {imports[-1] * 1000:.1f} ms, "
+              f"healthz {'-' if live is None else f'{live * 1000:.1f} ms'}, "
+              f"readyz {'-' if ready is None else f'{ready * 1000:.1f} ms'}")
+
+    print()
+    print(_summary("import app.py", imports))
+    print(_summary("first served request", lives))
+    print(_summary("ready (/readyz 200)", readies))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Build fingerprinted, precompressed static assets
+
+LEARNING NOTES:
+===============
+Browsers can only cache a file "forever" if its URL changes whenever its
+content changes. This script:
+
+1. Copies every file in static/ to static/dist/ with a content hash in the name
+   (js/app.js -> js/app.3f2a9c81d4e0.js)
+2. Writes gzip (.gz) and, if the Brotli package is installed, Brotli (.br)
+   variants of text assets at maximum compression - done once at build time,
+   never per request
+3. Writes static/dist/manifest.json mapping logical names to hashed names,
+   which the templates use through asset_url()
+
+Run it after changing anything in static/ (the Dockerfile runs it on build):
+    python build_assets.py
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import sys
+import time
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+STATIC_DIR = os.path.join(SRC_DIR, "static")
+DIST_DIRNAME = "dist"
+MANIFEST_NAME = "manifest.json"
+
+# Text formats worth precompressing (images are already compressed)
+COMPRESSIBLE_EXTENSIONS = {".js", ".css", ".svg", ".json", ".html", ".txt", ".map"}
+
+# Files smaller than this are not worth a compressed variant
+MIN_COMPRESS_BYTES = 512
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def _content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()[:12]
+
+
+def _hashed_name(relative_path: str, digest: str) -> str:
+    root, ext = os.path.splitext(relative_path)
+    return f"{root}.{digest}{ext}"
+
+
+def _iter_static_files(static_dir: str):
+    dist_dir = os.path.join(static_dir, DIST_DIRNAME)
+    for directory, dirnames, filenames in os.walk(static_dir):
+        if os.path.abspath(directory).startswith(os.path.abspath(dist_dir)):
+            continue
+        dirnames.sort()
+        for filename in sorted(filenames):
+            path = os.path.join(directory, filename)
+            yield os.path.relpath(path, static_dir).replace(os.sep, "/"), path
+
+
+def build(static_dir: str = STATIC_DIR, verbose: bool = True) -> dict:
+    """Build static/dist and return the manifest"""
+    dist_dir = os.path.join(static_dir, DIST_DIRNAME)
+    if os.path.isdir(dist_dir):
+        shutil.rmtree(dist_dir)
+    os.makedirs(dist_dir)
+
+    manifest = {}
+    totals = {"files": 0, "bytes": 0, "gzip_bytes": 0, "brotli_bytes": 0}
+    started = time.perf_counter()
+
+    for logical_name, source_path in _iter_static_files(static_dir):
+        with open(source_path, "rb") as f:
+            data = f.read()
+        hashed = _hashed_name(logical_name, _content_hash(data))
+        target = os.path.join(dist_dir, hashed)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(target, "wb") as f:
+            f.write(data)
+        manifest[logical_name] = hashed
+        totals["files"] += 1
+        totals["bytes"] += len(data)
+
+        ext = os.path.splitext(logical_name)[1].lower()
+        if ext not in COMPRESSIBLE_EXTENSIONS or len(data) < MIN_COMPRESS_BYTES:
+            continue
+
+        # mtime=0 keeps the .gz byte-identical across builds
+        gz = gzip.compress(data, compresslevel=9, mtime=0)
+        with open(target + ".gz", "wb") as f:
+            f.write(gz)
+        totals["gzip_bytes"] += len(gz)
+        line = f"  {logical_name} -> {hashed}  {len(data):>8} B  gzip {len(gz):>7} B"
+
+        if brotli is not None:
+            br = brotli.compress(data, quality=11)
+            with open(target + ".br", "wb") as f:
+                f.write(br)
+            totals["brotli_bytes"] += len(br)
+            line += f"  br {len(br):>7} B"
+        if verbose:
+            print(line)
+
+    with open(os.path.join(dist_dir, MANIFEST_NAME), "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+
+    if verbose:
+        print(f"✓ Built {totals['files']} assets ({totals['bytes']} B) in "
+              f"{(time.perf_counter() - started) * 1000:.0f} ms -> {dist_dir}")
+        if brotli is None:
+            print("⚠ Brotli not installed - only gzip variants were written")
+    return manifest
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build fingerprinted, precompressed static assets")
+    parser.add_argument("--static-dir", default=STATIC_DIR)
+    parser.add_argument("--quiet", action="store_true")
+    args = parser.parse_args(argv)
+    build(args.static_dir, verbose=not args.quiet)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
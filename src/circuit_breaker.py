@@ -0,0 +1,152 @@
+"""
+Circuit breaker for calls to a dependency that can be slow or down
+
+LEARNING NOTES:
+===============
+When Table Storage has an outage, every score save and dashboard read used to
+wait out the SDK's timeouts and retries on the request path - one slow
+dependency made every request slow. A circuit breaker remembers recent
+failures and stops calling the dependency for a while:
+
+    CLOSED ──(N consecutive failures)──> OPEN ──(reset timeout)──> HALF_OPEN
+      ^                                   ^                           │
+      └──────────(probe succeeds)─────────┼───────────────────────────┤
+                                          └──────(probe fails)────────┘
+
+- **CLOSED**: calls go through; failures are counted
+- **OPEN**: calls fail immediately (CircuitOpen) - callers fall back to a
+  cache or a spool instead of waiting
+- **HALF_OPEN**: after the reset timeout ONE probe call is let through; its
+  outcome closes or re-opens the breaker
+
+KEY CONCEPTS:
+- A call slower than slow_call_seconds counts as a failure even if it
+  succeeded: "slow" is how most storage outages start
+- State changes are reported through on_state_change (metrics, logs, and
+  replaying the storage spool when the breaker closes)
+"""
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+CLOSED = "closed"
+HALF_OPEN = "half_open"
+OPEN = "open"
+
+# Numeric encoding for the state gauge
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitOpen(Exception):
+    """Raised instead of calling a dependency while its breaker is open"""
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker
+
+    Args:
+        name: Dependency name (logs and metrics)
+        failure_threshold: Consecutive failures that open the breaker
+        reset_timeout: Seconds the breaker stays open before a probe
+        slow_call_seconds: Successful calls slower than this count as failures (0 = off)
+        on_state_change: Called with (old_state, new_state) outside the lock
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0,
+                 slow_call_seconds: float = 0.0,
+                 on_state_change: Optional[Callable[[str, str], None]] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self.slow_call_seconds = slow_call_seconds
+        self.on_state_change = on_state_change
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._stats = {"rejected": 0, "failures": 0, "opened": 0}
+
+    @property
+    def state(self) -> str:
+        return self._state
+
+    @property
+    def rejecting(self) -> bool:
+        """True while OPEN and before the reset timeout (allow() would refuse without probing)"""
+        return self._state == OPEN and self._clock() - self._opened_at < self.reset_timeout
+
+    def allow(self) -> bool:
+        """True if a call may go ahead now (an OPEN breaker lets one probe through after the timeout)"""
+        changed = None
+        with self._lock:
+            if self._state == CLOSED:
+                return True
+            if self._state == OPEN and self._clock() - self._opened_at >= self.reset_timeout:
+                changed = self._transition(HALF_OPEN)
+            if self._state == HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                allowed = True
+            else:
+                self._stats["rejected"] += 1
+                allowed = False
+        self._notify(changed)
+        return allowed
+
+    def record_success(self) -> None:
+        changed = None
+        with self._lock:
+            self._failures = 0
+            self._probe_in_flight = False
+            if self._state != CLOSED:
+                changed = self._transition(CLOSED)
+        self._notify(changed)
+
+    def record_failure(self) -> None:
+        changed = None
+        with self._lock:
+            self._failures += 1
+            self._stats["failures"] += 1
+            self._probe_in_flight = False
+            if self._state == HALF_OPEN or (self._state == CLOSED and self._failures >= self.failure_threshold):
+                self._opened_at = self._clock()
+                self._stats["opened"] += 1
+                changed = self._transition(OPEN)
+        self._notify(changed)
+
+    def record_result(self, duration: float) -> None:
+        """Record a call that returned, treating a slow one as a failure"""
+        if self.slow_call_seconds and duration > self.slow_call_seconds:
+            self.record_failure()
+        else:
+            self.record_success()
+
+    def call(self, fn: Callable, *args, **kwargs):
+        """Run fn through the breaker; raises CircuitOpen without calling it when open"""
+        if not self.allow():
+            raise CircuitOpen(self.name)
+        started = self._clock()
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException:
+            # Including interruptions (timeouts, GreenletExit): a probe must never stay claimed
+            self.record_failure()
+            raise
+        self.record_result(self._clock() - started)
+        return result
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return dict(self._stats, state=self._state, consecutive_failures=self._failures)
+
+    def _transition(self, state: str):
+        """Change state (caller holds the lock); returns the change to report"""
+        old, self._state = self._state, state
+        return (old, state) if old != state else None
+
+    def _notify(self, changed) -> None:
+        if changed and self.on_state_change is not None:
+            self.on_state_change(*changed)
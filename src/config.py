@@ -54,6 +54,29 @@ class Config:
     # This is the name you chose when deploying the model in AI Foundry
     AZURE_AI_MODEL_NAME = os.getenv('AZURE_AI_MODEL_NAME', 'gpt-4o')
     
+    # ============================================================================
+    # Model Tiering (per-workload routing, see model_routing.py)
+    # ============================================================================
+    # Live customer turns: a small, fast deployment (e.g. gpt-4o-mini)
+    # Empty = AZURE_AI_MODEL_NAME
+    CONVERSATION_MODEL_NAME = os.getenv('CONVERSATION_MODEL_NAME', '')
+    CONVERSATION_TEMPERATURE = float(os.getenv('CONVERSATION_TEMPERATURE', 0.7))
+    CONVERSATION_TIMEOUT_SECONDS = float(os.getenv('CONVERSATION_TIMEOUT_SECONDS', 20))
+    # A reply slower than this counts as an SLO miss (cora_model_slo_misses_total)
+    CONVERSATION_SLO_SECONDS = float(os.getenv('CONVERSATION_SLO_SECONDS', 3))
+    
+    # Conversation scoring: a stronger deployment (e.g. gpt-4o)
+    # Empty = AZURE_AI_MODEL_NAME
+    EVALUATION_MODEL_NAME = os.getenv('EVALUATION_MODEL_NAME', '')
+    # Low temperature keeps scores consistent between runs of the same transcript
+    EVALUATION_TEMPERATURE = float(os.getenv('EVALUATION_TEMPERATURE', 0.2))
+    EVALUATION_TIMEOUT_SECONDS = float(os.getenv('EVALUATION_TIMEOUT_SECONDS', 90))
+    EVALUATION_SLO_SECONDS = float(os.getenv('EVALUATION_SLO_SECONDS', 20))
+    
+    # API_VERSION: Azure OpenAI data-plane API version
+    # Needs 2024-10-01-preview or later for streamed usage (stream_options) and stored completions
+    AZURE_OPENAI_API_VERSION = os.getenv('AZURE_OPENAI_API_VERSION', '2024-10-01-preview')
+    
     # DEPLOYMENT_NAME: Alias for model name (some SDKs use different terminology)
     AZURE_OPENAI_DEPLOYMENT_NAME = os.getenv('AZURE_OPENAI_DEPLOYMENT_NAME')
     
@@ -81,6 +104,215 @@ class Config:
     AGENT_DESCRIPTION = os.getenv('AGENT_DESCRIPTION', 
                                    'AI voice agent for training customer service representatives')
     
+    # ============================================================================
+    # Conversation Lifecycle
+    # ============================================================================
+    # How long a conversation is kept after its socket disconnects before its
+    # resources are released. The grace period lets a page reload or a brief
+    # network drop reconnect and continue the same role-play.
+    CONVERSATION_RELEASE_GRACE_SECONDS = float(os.getenv('CONVERSATION_RELEASE_GRACE_SECONDS', 120))
+    
+    # ============================================================================
+    # Scale-Out Configuration
+    # ============================================================================
+    # CONVERSATION_STORE_URL: Where active conversations live
+    #   (empty)            -> in-process memory (single replica, local development)
+    #   redis://host:6379  -> shared Redis, any replica can serve any conversation
+    #   rediss://...       -> TLS Redis (Azure Cache for Redis uses port 6380)
+    CONVERSATION_STORE_URL = os.getenv('CONVERSATION_STORE_URL')
+    
+    # Conversations inactive for this long expire from the shared store
+    CONVERSATION_TTL_SECONDS = int(os.getenv('CONVERSATION_TTL_SECONDS', 86400))
+    
+    # SOCKETIO_MESSAGE_QUEUE: Redis URL used to fan out Socket.IO events across replicas
+    # Defaults to the conversation store when that is Redis
+    SOCKETIO_MESSAGE_QUEUE = os.getenv('SOCKETIO_MESSAGE_QUEUE') or (
+        CONVERSATION_STORE_URL if CONVERSATION_STORE_URL and CONVERSATION_STORE_URL.startswith(('redis://', 'rediss://')) else None
+    )
+    
+    # CONVERSATION_JOURNAL_DIR: Journal in-process conversations here so they
+    # survive restarts and rolling deploys (use a persistent mount, e.g. Azure Files).
+    # Empty disables the journal; ignored when CONVERSATION_STORE_URL is Redis.
+    CONVERSATION_JOURNAL_DIR = os.getenv('CONVERSATION_JOURNAL_DIR')
+    
+    # fsync every group commit (false = survive process restarts but not host crashes)
+    CONVERSATION_JOURNAL_FSYNC = os.getenv('CONVERSATION_JOURNAL_FSYNC', 'true').lower() == 'true'
+    
+    # Journal records between compacted snapshots (bounds restore time)
+    CONVERSATION_JOURNAL_SNAPSHOT_EVERY = int(os.getenv('CONVERSATION_JOURNAL_SNAPSHOT_EVERY', 5000))
+    
+    # ============================================================================
+    # Socket.IO Payloads
+    # ============================================================================
+    # Clients that negotiate it receive message events as one binary msgpack
+    # payload (socket_codec.py); static metadata is sent once per session.
+    # false = every client gets JSON events.
+    SOCKET_BINARY_CODECS = os.getenv('SOCKET_BINARY_CODECS', 'true').lower() == 'true'
+
+    # Binary payloads of at least this many bytes are deflated (when it helps)
+    SOCKET_COMPRESS_THRESHOLD = int(os.getenv('SOCKET_COMPRESS_THRESHOLD', 1024))
+
+    # ============================================================================
+    # Admission Control / Backpressure
+    # ============================================================================
+    # Turns (model calls) allowed to run at once on one replica
+    ADMISSION_MAX_CONCURRENT = int(os.getenv('ADMISSION_MAX_CONCURRENT', 16))
+    
+    # Turns allowed to wait for a slot; further turns are rejected with retry_after
+    ADMISSION_MAX_QUEUE = int(os.getenv('ADMISSION_MAX_QUEUE', 64))
+    
+    # Turns (running + waiting) a single Socket.IO connection may hold (0 = unlimited)
+    ADMISSION_PER_CONNECTION = int(os.getenv('ADMISSION_PER_CONNECTION', 2))
+    
+    # Shed a turn when its estimated queue wait exceeds this SLO (0 = never shed)
+    ADMISSION_QUEUE_SLO_SECONDS = float(os.getenv('ADMISSION_QUEUE_SLO_SECONDS', 10))
+    
+    # ============================================================================
+    # Evaluation Pre-Scoring
+    # ============================================================================
+    # A local heuristic scores each conversation before the model rubric runs
+    # (prescorer.py). It returns an instant provisional score and triages the
+    # model evaluation: skipped, short rubric, or full rubric.
+    PRESCORE_ENABLED = os.getenv('PRESCORE_ENABLED', 'true').lower() == 'true'
+    
+    # Skip the model evaluation below this many agent replies / agent words in total
+    PRESCORE_MIN_AGENT_TURNS = int(os.getenv('PRESCORE_MIN_AGENT_TURNS', 2))
+    PRESCORE_MIN_AGENT_WORDS = int(os.getenv('PRESCORE_MIN_AGENT_WORDS', 8))
+    
+    # Use the short rubric up to this many agent replies (0 = always the full rubric)
+    PRESCORE_SHORT_MAX_AGENT_TURNS = int(os.getenv('PRESCORE_SHORT_MAX_AGENT_TURNS', 4))
+    
+    # Reply budget for the short rubric
+    PRESCORE_SHORT_MAX_TOKENS = int(os.getenv('PRESCORE_SHORT_MAX_TOKENS', 300))
+    
+    # ============================================================================
+    # Long Transcript Evaluation
+    # ============================================================================
+    # Transcripts longer than this (formatted characters) are evaluated as
+    # overlapping turn windows in parallel and merged (0 = always single-shot)
+    EVAL_CHUNK_THRESHOLD_CHARS = int(os.getenv('EVAL_CHUNK_THRESHOLD_CHARS', 24000))
+    
+    # Messages per window, and messages shared by consecutive windows
+    EVAL_CHUNK_TURNS = int(os.getenv('EVAL_CHUNK_TURNS', 40))
+    EVAL_CHUNK_OVERLAP = int(os.getenv('EVAL_CHUNK_OVERLAP', 4))
+    
+    # Window evaluations running at once per analysis, and the reply budget of each
+    EVAL_CHUNK_CONCURRENCY = int(os.getenv('EVAL_CHUNK_CONCURRENCY', 6))
+    EVAL_CHUNK_MAX_TOKENS = int(os.getenv('EVAL_CHUNK_MAX_TOKENS', 300))
+    
+    # ============================================================================
+    # Startup / Warm-Up
+    # ============================================================================
+    # WARMUP_ON_START: Start warming external clients (OpenAI, Table Storage) in the
+    # background as soon as the app is created. Set to false in tests so importing
+    # app.py never touches the network; services are then created on first use.
+    WARMUP_ON_START = os.getenv('WARMUP_ON_START', 'true').lower() == 'true'
+    
+    # How long /readyz waits before retrying a required service that failed to warm up
+    WARMUP_RETRY_SECONDS = float(os.getenv('WARMUP_RETRY_SECONDS', 30))
+    
+    # ============================================================================
+    # Graceful Shutdown
+    # ============================================================================
+    # On SIGTERM the replica turns not-ready, refuses new conversations and turns,
+    # and gives in-flight turns and analyses this long to finish before flushing
+    # buffers and exiting. Keep it below the platform's termination grace period
+    # (30s on Container Apps by default) to leave time for the flushes.
+    SHUTDOWN_DRAIN_SECONDS = float(os.getenv('SHUTDOWN_DRAIN_SECONDS', 25))
+    
+    # ============================================================================
+    # Observability
+    # ============================================================================
+    # METRICS_TOKEN: Optional bearer token required to scrape /metrics
+    # Leave empty to expose metrics without authentication (e.g. internal ingress only)
+    METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+    
+    # LOG_LEVEL: Default level for all log categories (DEBUG, INFO, WARNING, ERROR)
+    LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+    
+    # LOG_LEVELS: Per-category overrides, e.g. "socket=WARNING,storage=DEBUG"
+    # Categories: app, socket, agent, storage
+    LOG_LEVELS = os.getenv('LOG_LEVELS', '')
+    
+    # LOG_RATE_LIMIT_PER_MINUTE: Cap for repetitive (sampled) events per event type
+    LOG_RATE_LIMIT_PER_MINUTE = int(os.getenv('LOG_RATE_LIMIT_PER_MINUTE', 60))
+
+    # ============================================================================
+    # Memory Profiling (/debug/memory, admin only)
+    # ============================================================================
+    # tracemalloc is only started on demand from /debug/memory/tracing, or by the
+    # sampler below. MEMORY_PROFILE_SAMPLING traces for a short window at a fixed
+    # interval (1 frame deep) and keeps the snapshots: overhead is bounded by
+    # window/interval, so it is safe to leave on in production
+    MEMORY_PROFILE_SAMPLING = os.getenv('MEMORY_PROFILE_SAMPLING', 'false').lower() == 'true'
+    MEMORY_PROFILE_SAMPLE_SECONDS = float(os.getenv('MEMORY_PROFILE_SAMPLE_SECONDS', 10))
+    MEMORY_PROFILE_INTERVAL_SECONDS = float(os.getenv('MEMORY_PROFILE_INTERVAL_SECONDS', 600))
+    
+    # Snapshots kept for /debug/memory/diff (each holds every trace of its window)
+    MEMORY_PROFILE_MAX_SNAPSHOTS = int(os.getenv('MEMORY_PROFILE_MAX_SNAPSHOTS', 4))
+
+    # ============================================================================
+    # Traffic Recording (record-and-replay load tests)
+    # ============================================================================
+    # TRAFFIC_RECORD_DIR: Write anonymized interaction traces here (sizes, timings,
+    # moods, token counts - never message text). Empty = recording off.
+    # Replay them with: python replay_traffic.py <trace files>
+    TRAFFIC_RECORD_DIR = os.getenv('TRAFFIC_RECORD_DIR', '')
+    
+    # Fraction of conversations recorded (whole conversations are sampled)
+    TRAFFIC_RECORD_SAMPLE_RATE = float(os.getenv('TRAFFIC_RECORD_SAMPLE_RATE', 1.0))
+    
+    # Key for the anonymized ids; set the same value on every replica to correlate
+    # a conversation across replicas (empty = random per process)
+    TRAFFIC_RECORD_SALT = os.getenv('TRAFFIC_RECORD_SALT', '')
+
+    # ============================================================================
+    # Storage Resilience (circuit breaker + local spool)
+    # ============================================================================
+    # After STORAGE_BREAKER_FAILURES consecutive failed (or slower than
+    # STORAGE_SLOW_CALL_SECONDS) Table Storage calls the breaker opens: calls fail
+    # fast for STORAGE_BREAKER_RESET_SECONDS, then one probe decides whether it closes.
+    STORAGE_BREAKER_FAILURES = int(os.getenv('STORAGE_BREAKER_FAILURES', 5))
+    STORAGE_BREAKER_RESET_SECONDS = float(os.getenv('STORAGE_BREAKER_RESET_SECONDS', 30))
+    STORAGE_SLOW_CALL_SECONDS = float(os.getenv('STORAGE_SLOW_CALL_SECONDS', 5))
+
+    # Per-request SDK timeout, so a hung connection counts as a failure quickly
+    STORAGE_TIMEOUT_SECONDS = float(os.getenv('STORAGE_TIMEOUT_SECONDS', 10))
+
+    # STORAGE_SPOOL_DIR: Score writes that fail are appended here and replayed once
+    # storage is back (use a persistent mount, e.g. Azure Files). Empty disables the spool.
+    STORAGE_SPOOL_DIR = os.getenv('STORAGE_SPOOL_DIR', '')
+    STORAGE_SPOOL_FSYNC = os.getenv('STORAGE_SPOOL_FSYNC', 'true').lower() == 'true'
+
+    # How often a non-empty spool is checked for replay (it is also replayed as
+    # soon as the breaker closes)
+    STORAGE_SPOOL_REPLAY_SECONDS = float(os.getenv('STORAGE_SPOOL_REPLAY_SECONDS', 15))
+
+    # Users whose recent scores are cached for stale reads while storage is down
+    STORAGE_READ_CACHE_USERS = int(os.getenv('STORAGE_READ_CACHE_USERS', 1000))
+
+    # ============================================================================
+    # Token Budgets / Usage Ledger
+    # ============================================================================
+    # Budgets are in total tokens (prompt + completion); 0 disables a budget.
+    # Over a SOFT budget replies are shortened to TOKEN_BUDGET_DEGRADED_MAX_TOKENS;
+    # at a HARD budget new turns are refused.
+    TOKEN_BUDGET_USER_DAILY_SOFT = int(os.getenv('TOKEN_BUDGET_USER_DAILY_SOFT', 0))
+    TOKEN_BUDGET_USER_DAILY_HARD = int(os.getenv('TOKEN_BUDGET_USER_DAILY_HARD', 0))
+    TOKEN_BUDGET_CONVERSATION_SOFT = int(os.getenv('TOKEN_BUDGET_CONVERSATION_SOFT', 0))
+    TOKEN_BUDGET_CONVERSATION_HARD = int(os.getenv('TOKEN_BUDGET_CONVERSATION_HARD', 0))
+
+    # Default reply length and the reduced length used once a soft budget is exceeded
+    AGENT_MAX_TOKENS = int(os.getenv('AGENT_MAX_TOKENS', 800))
+    TOKEN_BUDGET_DEGRADED_MAX_TOKENS = int(os.getenv('TOKEN_BUDGET_DEGRADED_MAX_TOKENS', 200))
+
+    # How often aggregated usage is written to the "tokenusage" table
+    USAGE_FLUSH_SECONDS = float(os.getenv('USAGE_FLUSH_SECONDS', 60))
+
+    # ADMIN_USERS: Comma-separated user principals allowed to view the full usage report
+    # (the local 'admin' account is always an admin)
+    ADMIN_USERS = [u.strip().lower() for u in os.getenv('ADMIN_USERS', '').split(',') if u.strip()]
+
     # ============================================================================
     # System Prompt - The Agent's Core Instructions
     # ============================================================================
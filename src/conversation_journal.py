@@ -0,0 +1,525 @@
+"""
+Conversation journal: checkpoint and restore in-process conversations
+
+LEARNING NOTES:
+===============
+With the in-process conversation store, a deploy or scale-in event used to
+destroy every in-progress role-play. The journal makes them durable:
+
+1. **Append-only log**: every create / append / delete is written as a
+   length-prefixed, checksummed record (see framing.py) to the current
+   segment file - sequential writes only, never rewrites
+2. **Group commit**: a writer thread writes every record that arrived while
+   the previous fsync was running in ONE write + fsync, so durability costs
+   one disk flush per batch of turns, not per turn
+3. **Snapshots**: every SNAPSHOT_EVERY records the live state is written as a
+   compacted snapshot and older segments are deleted, so replay time is
+   bounded by the number of live conversations, not by history
+4. **Parallel restore**: snapshots are split into zlib-compressed shards that
+   are read and decompressed concurrently; the short tail of segments written
+   after the snapshot is then replayed in order
+
+DIRECTORY LAYOUT (CONVERSATION_JOURNAL_DIR):
+    journal.lock                   held by the process that owns the journal
+    segment-00000012.log           records written after snapshot 12
+    snapshot-00000012/shard-N.bin  state just before segment 12
+    snapshot-00000012/COMPLETE     written last; incomplete snapshots are ignored
+
+KEY CONCEPTS:
+- Mutations and their journal records are ordered by one lock, so a snapshot
+  taken between two segments is exactly the state at that boundary
+- Point the directory at persistent storage (e.g. an Azure Files mount) to
+  survive container replacement; the lock file keeps an old and a new
+  revision from writing the same journal during a rolling deploy
+- Only used with the in-process store: Redis is already shared and durable
+"""
+import json
+import os
+import queue
+import shutil
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from conversation_store import ConversationStore, MessageLike
+from framing import decode_frames, encode_frame, iter_frames_with_offset
+from messages import Message
+from log_service import get_logger
+
+log = get_logger("journal")
+
+try:
+    import fcntl
+except ImportError:  # Windows development machines: no cross-process lock
+    fcntl = None
+
+OP_CREATE = "create"
+OP_APPEND = "append"
+OP_TOUCH = "touch"
+OP_DELETE = "delete"
+
+_ROTATE = object()
+_STOP = object()
+
+
+def _eventlet_tpool():
+    """eventlet's pool of real OS threads, if eventlet has patched threading"""
+    try:
+        from eventlet import patcher, tpool
+    except ImportError:
+        return None
+    return tpool if patcher.is_monkey_patched("thread") else None
+
+
+def _blocking(fn, *args):
+    """
+    Run a blocking call (fsync, file reads, zlib) without stalling the server
+
+    Under eventlet, "threads" are green and cooperative: an fsync would freeze
+    every socket. tpool runs the call on a real OS thread instead.
+    """
+    tpool = _eventlet_tpool()
+    return tpool.execute(fn, *args) if tpool else fn(*args)
+
+
+def _parallel_map(fn, items: list, workers: int) -> list:
+    """Map over items on real OS threads (zlib and file reads release the GIL)"""
+    if _eventlet_tpool():
+        import eventlet
+        pool = eventlet.GreenPool(workers)
+        return list(pool.imap(lambda item: _blocking(fn, item), items))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="journal-restore") as pool:
+        return list(pool.map(fn, items))
+
+
+class _Commit:
+    """Completion signal for one batch of records, and whether it reached disk"""
+
+    __slots__ = ("_event", "ok")
+
+    def __init__(self):
+        self._event = threading.Event()
+        self.ok = False
+
+    def done(self, ok: bool = True) -> None:
+        # The first outcome sticks: a later failure in the same batch doesn't undo a commit
+        if not self._event.is_set():
+            self.ok = ok
+            self._event.set()
+
+    @property
+    def completed(self) -> bool:
+        return self._event.is_set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """True once the commit completed successfully; False if it failed or timed out"""
+        return self._event.wait(timeout) and self.ok
+
+
+class ConversationJournal:
+    """Segmented append-only journal with group commit and sharded snapshots"""
+
+    def __init__(self, directory: str, fsync: bool = True, snapshot_every: int = 5000,
+                 commit_interval: float = 0.005, shards: int = 4, replay_workers: int = 4):
+        """
+        Args:
+            directory: Journal directory (created if missing)
+            fsync: fsync each group commit (False = survive process restarts only)
+            snapshot_every: Records between snapshots
+            commit_interval: Seconds a commit waits for more records to batch
+            shards: Snapshot shard files (restored in parallel)
+            replay_workers: Threads reading snapshot shards on restore
+        """
+        self.directory = directory
+        self.fsync = fsync
+        self.snapshot_every = snapshot_every
+        self.commit_interval = commit_interval
+        self.shards = max(1, shards)
+        self.replay_workers = max(1, replay_workers)
+
+        # Orders store mutations with their journal records
+        self.lock = threading.RLock()
+        self._queue: "queue.Queue" = queue.Queue()
+        self._segment = None
+        self._segment_seq = 0
+        self._records_since_snapshot = 0
+        self._writer: Optional[threading.Thread] = None
+        self._lock_file = None
+        self._snapshotting = False
+        self.stats = {"records": 0, "commits": 0, "snapshots": 0, "failed_commits": 0, "replayed_records": 0,
+                      "restored_conversations": 0, "restore_seconds": 0.0}
+
+    # ------------------------------------------------------------------
+    # Restore
+    # ------------------------------------------------------------------
+    def open(self, store: ConversationStore, lock_timeout: float = 30.0) -> List[str]:
+        """
+        Restore the journal into `store` and start journaling
+
+        Returns:
+            Ids of the conversations that were restored
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        self._acquire_lock(lock_timeout)
+        started = time.perf_counter()
+
+        snapshot_seq = self._latest_snapshot()
+        conversations: Dict[str, Dict] = {}
+        if snapshot_seq is not None:
+            conversations = self._load_snapshot(snapshot_seq)
+        segments = [seq for seq in self._segment_seqs() if snapshot_seq is None or seq >= snapshot_seq]
+        replayed = 0
+        for seq in segments:
+            replayed += self._replay_segment(seq, conversations)
+
+        for conversation in conversations.values():
+            store.create(conversation)
+
+        self.stats["replayed_records"] = replayed
+        self.stats["restored_conversations"] = len(conversations)
+        self.stats["restore_seconds"] = round(time.perf_counter() - started, 3)
+        log.info("journal_restored", conversations=len(conversations), snapshot=snapshot_seq,
+                 segments=len(segments), records=replayed,
+                 duration_ms=round(self.stats["restore_seconds"] * 1000, 1))
+
+        # Never append after a possibly torn tail: always start a fresh segment
+        self._segment_seq = max([snapshot_seq or 0] + segments) + 1
+        self._open_segment()
+        self._writer = threading.Thread(target=self._run, name="conversation-journal", daemon=True)
+        self._writer.start()
+
+        # Compact right away so the next restart replays a snapshot, not this history
+        if replayed:
+            self.checkpoint(store)
+        return list(conversations)
+
+    def _acquire_lock(self, timeout: float) -> None:
+        if fcntl is None:
+            return
+        self._lock_file = open(os.path.join(self.directory, "journal.lock"), "w")
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return
+            except OSError:
+                if time.monotonic() >= deadline:
+                    self._lock_file.close()
+                    self._lock_file = None
+                    raise TimeoutError(f"journal {self.directory} is locked by another process")
+                # The previous revision is still draining during a rolling deploy
+                time.sleep(0.5)
+
+    def _segment_path(self, seq: int) -> str:
+        return os.path.join(self.directory, f"segment-{seq:08d}.log")
+
+    def _snapshot_path(self, seq: int) -> str:
+        return os.path.join(self.directory, f"snapshot-{seq:08d}")
+
+    def _segment_seqs(self) -> List[int]:
+        seqs = []
+        for name in os.listdir(self.directory):
+            if name.startswith("segment-") and name.endswith(".log"):
+                seqs.append(int(name[len("segment-"):-len(".log")]))
+        return sorted(seqs)
+
+    def _latest_snapshot(self) -> Optional[int]:
+        seqs = []
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if (name.startswith("snapshot-") and not name.endswith(".tmp")
+                    and os.path.exists(os.path.join(path, "COMPLETE"))):
+                seqs.append(int(name[len("snapshot-"):]))
+        return max(seqs) if seqs else None
+
+    def _load_snapshot(self, seq: int) -> Dict[str, Dict]:
+        """Read and decompress the snapshot's shards concurrently"""
+        path = self._snapshot_path(seq)
+        shard_files = sorted(os.path.join(path, name) for name in os.listdir(path) if name.endswith(".bin"))
+
+        def load_shard(shard_path):
+            with open(shard_path, "rb") as f:
+                data = zlib.decompress(f.read())
+            return [json.loads(payload) for payload in decode_frames(data)]
+
+        conversations = {}
+        for shard in _parallel_map(load_shard, shard_files, self.replay_workers):
+            for conversation in shard:
+                conversations[conversation["id"]] = conversation
+        return conversations
+
+    def _replay_segment(self, seq: int, conversations: Dict[str, Dict]) -> int:
+        """Apply one segment's records; stops at a torn tail"""
+        path = self._segment_path(seq)
+        applied = 0
+        valid_bytes = 0
+        with open(path, "rb") as f:
+            for payload, valid_bytes in iter_frames_with_offset(f):
+                self._apply(json.loads(payload), conversations)
+                applied += 1
+        size = os.path.getsize(path)
+        if valid_bytes < size:
+            log.warning("journal_tail_discarded", segment=seq, bytes=size - valid_bytes)
+        return applied
+
+    @staticmethod
+    def _apply(record: Dict, conversations: Dict[str, Dict]) -> None:
+        op = record.get("op")
+        if op == OP_CREATE:
+            conversation = dict(record["conversation"])
+            conversation.setdefault("messages", [])
+            conversations[conversation["id"]] = conversation
+        elif op == OP_APPEND:
+            conversation = conversations.get(record["id"])
+            if conversation is not None:
+                conversation["messages"].append(record["message"])
+                conversation["last_activity"] = record.get("at", time.time())
+        elif op == OP_TOUCH:
+            conversation = conversations.get(record["id"])
+            if conversation is not None:
+                conversation["last_activity"] = record.get("at", time.time())
+        elif op == OP_DELETE:
+            conversations.pop(record["id"], None)
+
+    # ------------------------------------------------------------------
+    # Writing (group commit)
+    # ------------------------------------------------------------------
+    def record(self, entry: Dict) -> _Commit:
+        """
+        Queue a record; the returned commit completes once it is on disk
+
+        Call while holding self.lock so records are queued in mutation order.
+        """
+        commit = _Commit()
+        self._queue.put((encode_frame(json.dumps(entry, separators=(",", ":")).encode("utf-8")), commit))
+        self._records_since_snapshot += 1
+        return commit
+
+    def wants_snapshot(self) -> bool:
+        return (self.snapshot_every and not self._snapshotting
+                and self._records_since_snapshot >= self.snapshot_every)
+
+    def _open_segment(self) -> None:
+        self._segment = open(self._segment_path(self._segment_seq), "ab")
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            batch = [item]
+            # Gather everything that arrives within the commit window
+            deadline = time.monotonic() + self.commit_interval
+            while item is not _STOP:
+                remaining = deadline - time.monotonic()
+                try:
+                    item = self._queue.get(timeout=max(0.0, remaining)) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                batch.append(item)
+            try:
+                self._write_batch(batch)
+            except Exception as e:
+                log.error("journal_write_failed", error=str(e), records=len(batch))
+                for entry in batch:
+                    if isinstance(entry, tuple):
+                        entry[1].done(ok=False)
+            if batch[-1] is _STOP:
+                return
+
+    def _write_batch(self, batch: list) -> None:
+        pending = []
+        for entry in batch:
+            if entry is _STOP:
+                break
+            if isinstance(entry, tuple) and entry[0] is _ROTATE:
+                # Everything before the marker belongs to the old segment
+                self._commit(pending)
+                pending = []
+                # Open the next segment before closing this one: a failed open leaves
+                # the journal writing to the current segment, not to a closed file
+                old_segment = self._segment
+                self._segment_seq += 1
+                try:
+                    self._open_segment()
+                except Exception:
+                    self._segment_seq -= 1
+                    raise
+                old_segment.close()
+                entry[1].done()
+                continue
+            pending.append(entry)
+        self._commit(pending)
+
+    def _commit(self, pending: list) -> None:
+        if not pending:
+            return
+        self._segment.write(b"".join(frame for frame, _ in pending))
+        self._segment.flush()
+        if self.fsync:
+            _blocking(os.fsync, self._segment.fileno())
+        self.stats["records"] += len(pending)
+        self.stats["commits"] += 1
+        for _, commit in pending:
+            commit.done()
+
+    # ------------------------------------------------------------------
+    # Snapshots / compaction
+    # ------------------------------------------------------------------
+    def checkpoint(self, store: ConversationStore) -> None:
+        """Rotate to a new segment and write a snapshot of `store` in the background"""
+        with self.lock:
+            if self._snapshotting:
+                return
+            self._snapshotting = True
+            self._records_since_snapshot = 0
+            rotated = _Commit()
+            self._queue.put((_ROTATE, rotated))
+            seq = self._segment_seq + 1
+            # Captured under the lock: exactly the state at the segment boundary
+            state = [
+                dict(store.get(cid) or {}, messages=[m.to_dict() for m in store.get_history(cid)])
+                for cid in store.ids()
+            ]
+        threading.Thread(target=self._write_snapshot, args=(seq, state, rotated),
+                         name="journal-snapshot", daemon=True).start()
+
+    def _write_snapshot(self, seq: int, state: List[Dict], rotated: _Commit) -> None:
+        try:
+            if not rotated.wait():
+                # Segment seq - 1 was never closed and keeps receiving records written
+                # after this state: a snapshot would make restore skip them
+                log.error("journal_snapshot_skipped", seq=seq, reason="segment rotation failed")
+                return
+            started = time.perf_counter()
+            final_path = self._snapshot_path(seq)
+            tmp_path = final_path + ".tmp"
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            os.makedirs(tmp_path)
+
+            shards = [[] for _ in range(self.shards)]
+            for conversation in state:
+                shards[zlib.crc32(conversation["id"].encode()) % self.shards].append(
+                    encode_frame(json.dumps(conversation, separators=(",", ":")).encode("utf-8"))
+                )
+            for index, frames in enumerate(shards):
+                with open(os.path.join(tmp_path, f"shard-{index}.bin"), "wb") as f:
+                    f.write(zlib.compress(b"".join(frames), 1))
+                    f.flush()
+                    _blocking(os.fsync, f.fileno())
+            with open(os.path.join(tmp_path, "COMPLETE"), "w") as f:
+                f.write(str(len(state)))
+            os.replace(tmp_path, final_path)
+
+            self._prune_before(seq)
+            self.stats["snapshots"] += 1
+            log.info("journal_snapshot_written", seq=seq, conversations=len(state),
+                     duration_ms=round((time.perf_counter() - started) * 1000, 1))
+        except Exception as e:
+            log.error("journal_snapshot_failed", seq=seq, error=str(e))
+        finally:
+            self._snapshotting = False
+
+    def _prune_before(self, seq: int) -> None:
+        """Delete segments and snapshots superseded by snapshot `seq`"""
+        for old in self._segment_seqs():
+            if old < seq:
+                os.remove(self._segment_path(old))
+        for name in os.listdir(self.directory):
+            if name.startswith("snapshot-") and name != os.path.basename(self._snapshot_path(seq)):
+                shutil.rmtree(os.path.join(self.directory, name), ignore_errors=True)
+
+    def close(self) -> None:
+        """Flush pending records and release the journal"""
+        if self._writer is not None:
+            self._queue.put(_STOP)
+            self._writer.join(timeout=10)
+            self._writer = None
+        if self._segment is not None:
+            self._segment.close()
+            self._segment = None
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+
+
+class JournaledConversationStore(ConversationStore):
+    """Wraps a store so every mutation is also journaled (and survives restarts)"""
+
+    def __init__(self, inner: ConversationStore, journal: ConversationJournal, durable: bool = True):
+        """
+        Args:
+            inner: The store holding live state (normally InMemoryConversationStore)
+            journal: Journal to record mutations in
+            durable: Wait for the group commit before returning from create/append
+        """
+        self.inner = inner
+        self.journal = journal
+        self.durable = durable
+        self._opened = False
+
+    def recover(self, lock_timeout: float = 30.0) -> List[str]:
+        """Restore journaled conversations into the inner store; returns their ids"""
+        if self._opened:
+            return []
+        restored = self.journal.open(self.inner, lock_timeout=lock_timeout)
+        self._opened = True
+        return restored
+
+    def _journal(self, entry: Dict, mutate, wait: bool):
+        with self.journal.lock:
+            result = mutate()
+            commit = self.journal.record(entry) if self._opened else None
+        if commit is not None:
+            if self.journal.wants_snapshot():
+                self.journal.checkpoint(self.inner)
+            if wait and self.durable and not commit.wait(timeout=5.0):
+                # The mutation is live in memory, but would not survive a restart
+                self.journal.stats["failed_commits"] += 1
+                log.error("journal_commit_failed", op=entry["op"],
+                          reason="write_failed" if commit.completed else "timeout")
+        return result
+
+    def create(self, conversation: Dict) -> None:
+        record = dict(conversation)
+        record["messages"] = [Message.coerce(m).to_dict() for m in conversation.get("messages", [])]
+        self._journal({"op": OP_CREATE, "conversation": record},
+                      lambda: self.inner.create(conversation), wait=True)
+
+    def append_message(self, conversation_id: str, message: MessageLike) -> int:
+        message = Message.coerce(message)
+        return self._journal({"op": OP_APPEND, "id": conversation_id, "message": message.to_dict(), "at": time.time()},
+                      lambda: self.inner.append_message(conversation_id, message), wait=True)
+
+    def touch(self, conversation_id: str) -> None:
+        # Activity time only matters for release timing: don't wait for the disk
+        self._journal({"op": OP_TOUCH, "id": conversation_id, "at": time.time()},
+                      lambda: self.inner.touch(conversation_id), wait=False)
+
+    def delete(self, conversation_id: str) -> bool:
+        return self._journal({"op": OP_DELETE, "id": conversation_id},
+                             lambda: self.inner.delete(conversation_id), wait=False)
+
+    def get(self, conversation_id: str) -> Optional[Dict]:
+        return self.inner.get(conversation_id)
+
+    def exists(self, conversation_id: str) -> bool:
+        return self.inner.exists(conversation_id)
+
+    def get_messages(self, conversation_id: str, since: int = 0) -> List[Dict]:
+        return self.inner.get_messages(conversation_id, since)
+
+    def get_history(self, conversation_id: str) -> List[Message]:
+        return self.inner.get_history(conversation_id)
+
+    def last_seq(self, conversation_id: str) -> int:
+        return self.inner.last_seq(conversation_id)
+
+    def count(self) -> int:
+        return self.inner.count()
+
+    def ids(self) -> List[str]:
+        return self.inner.ids()
+
+    def close(self) -> None:
+        self.journal.close()
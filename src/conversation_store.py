@@ -0,0 +1,281 @@
+"""
+Conversation state storage for single and multi-replica deployments
+
+LEARNING NOTES:
+===============
+Active role-play conversations used to live in a process-local dict. That only
+works with ONE worker on ONE replica: a second replica would not see the
+conversation, and a scale-in event would drop it.
+
+This module puts conversation state behind a small interface with two backends:
+
+1. **InMemoryConversationStore**: process-local, zero dependencies. Used for
+   local development and as the stand-in backend in tests.
+2. **RedisConversationStore**: shared state over the Redis protocol (Azure
+   Cache for Redis, or any Redis-compatible server). Any replica can serve any
+   turn of any conversation.
+
+KEY CONCEPTS:
+- Conversation metadata (mood, status, timestamps) is a Redis HASH
+- Messages are a Redis LIST, so appending a turn is a single O(1) RPUSH
+- Keys expire after CONVERSATION_TTL_SECONDS of inactivity, so abandoned
+  conversations don't accumulate forever
+- The backend is picked from CONVERSATION_STORE_URL (empty = in-process)
+- The in-process backend keeps compact Message objects (see messages.py);
+  get_messages() returns the JSON shape, get_history() the objects themselves
+- Every message has a sequence number: its 1-based position in the
+  conversation. Messages are only ever appended, so the number is monotonic
+  and get_messages(since=n) returns just the messages a client hasn't seen
+"""
+import json
+import threading
+import time
+from typing import Dict, List, Optional, Union
+
+from messages import Message
+
+MessageLike = Union[Message, Dict]
+
+
+class ConversationStore:
+    """Interface shared by all conversation state backends"""
+
+    def create(self, conversation: Dict) -> None:
+        """Store a new conversation (metadata plus an optional "messages" list)"""
+        raise NotImplementedError
+
+    def get(self, conversation_id: str) -> Optional[Dict]:
+        """Return conversation metadata (without messages), or None"""
+        raise NotImplementedError
+
+    def exists(self, conversation_id: str) -> bool:
+        return self.get(conversation_id) is not None
+
+    def get_messages(self, conversation_id: str, since: int = 0) -> List[Dict]:
+        """
+        Return the conversation's messages in order, as dicts ([] if unknown)
+
+        Each dict carries its "seq"; only messages with seq > since are returned.
+        """
+        raise NotImplementedError
+
+    def get_history(self, conversation_id: str) -> List[Message]:
+        """Return the conversation's messages in order, as Message objects"""
+        return [Message.from_dict(m) for m in self.get_messages(conversation_id)]
+
+    def last_seq(self, conversation_id: str) -> int:
+        """Sequence number of the newest message (0 if none or unknown)"""
+        return len(self.get_history(conversation_id))
+
+    def append_message(self, conversation_id: str, message: MessageLike) -> int:
+        """Append one message (Message or dict), refresh the activity time; returns its seq"""
+        raise NotImplementedError
+
+    def touch(self, conversation_id: str) -> None:
+        """Refresh the conversation's activity time without adding a message"""
+        raise NotImplementedError
+
+    def delete(self, conversation_id: str) -> bool:
+        """Remove a conversation; returns True if it existed"""
+        raise NotImplementedError
+
+    def count(self) -> int:
+        """Number of stored conversations"""
+        raise NotImplementedError
+
+    def ids(self) -> List[str]:
+        """Identifiers of all stored conversations"""
+        raise NotImplementedError
+
+
+class InMemoryConversationStore(ConversationStore):
+    """Process-local backend (single replica, local development, tests)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._conversations: Dict[str, Dict] = {}
+
+    def create(self, conversation: Dict) -> None:
+        record = dict(conversation)
+        record["messages"] = [Message.coerce(m) for m in conversation.get("messages", [])]
+        record.setdefault("last_activity", time.time())
+        with self._lock:
+            self._conversations[record["id"]] = record
+
+    def get(self, conversation_id: str) -> Optional[Dict]:
+        with self._lock:
+            record = self._conversations.get(conversation_id)
+            if record is None:
+                return None
+            return {k: v for k, v in record.items() if k != "messages"}
+
+    def exists(self, conversation_id: str) -> bool:
+        with self._lock:
+            return conversation_id in self._conversations
+
+    def get_messages(self, conversation_id: str, since: int = 0) -> List[Dict]:
+        since = max(0, since)
+        with self._lock:
+            record = self._conversations.get(conversation_id)
+            messages = record["messages"][since:] if record else []
+        return [dict(m.to_dict(), seq=seq) for seq, m in enumerate(messages, start=since + 1)]
+
+    def get_history(self, conversation_id: str) -> List[Message]:
+        with self._lock:
+            record = self._conversations.get(conversation_id)
+            return list(record["messages"]) if record else []
+
+    def last_seq(self, conversation_id: str) -> int:
+        with self._lock:
+            record = self._conversations.get(conversation_id)
+            return len(record["messages"]) if record else 0
+
+    def append_message(self, conversation_id: str, message: MessageLike) -> int:
+        message = Message.coerce(message)
+        with self._lock:
+            record = self._conversations.get(conversation_id)
+            if record is None:
+                raise KeyError(conversation_id)
+            record["messages"].append(message)
+            record["last_activity"] = time.time()
+            return len(record["messages"])
+
+    def touch(self, conversation_id: str) -> None:
+        with self._lock:
+            record = self._conversations.get(conversation_id)
+            if record is not None:
+                record["last_activity"] = time.time()
+
+    def delete(self, conversation_id: str) -> bool:
+        with self._lock:
+            return self._conversations.pop(conversation_id, None) is not None
+
+    def count(self) -> int:
+        with self._lock:
+            return len(self._conversations)
+
+    def ids(self) -> List[str]:
+        with self._lock:
+            return list(self._conversations)
+
+
+class RedisConversationStore(ConversationStore):
+    """
+    Shared backend over the Redis protocol
+
+    Layout (prefix defaults to "cora"):
+        {prefix}:conversations            ZSET of conversation ids scored by last activity
+        {prefix}:conv:{id}                HASH of metadata (JSON-encoded values)
+        {prefix}:conv:{id}:messages       LIST of JSON-encoded messages
+    """
+
+    def __init__(self, url: str, ttl_seconds: int = 86400, prefix: str = "cora"):
+        # Imported lazily: redis is only required when this backend is selected
+        import redis
+
+        self.redis = redis.Redis.from_url(url)
+        self.ttl_seconds = ttl_seconds
+        self.prefix = prefix
+        self._index_key = f"{prefix}:conversations"
+
+    def _meta_key(self, conversation_id: str) -> str:
+        return f"{self.prefix}:conv:{conversation_id}"
+
+    def _messages_key(self, conversation_id: str) -> str:
+        return f"{self.prefix}:conv:{conversation_id}:messages"
+
+    def create(self, conversation: Dict) -> None:
+        conversation_id = conversation["id"]
+        meta = {k: v for k, v in conversation.items() if k != "messages"}
+        meta.setdefault("last_activity", time.time())
+        messages = conversation.get("messages", [])
+
+        pipe = self.redis.pipeline()
+        pipe.delete(self._meta_key(conversation_id), self._messages_key(conversation_id))
+        pipe.hset(self._meta_key(conversation_id), mapping={k: json.dumps(v) for k, v in meta.items()})
+        if messages:
+            pipe.rpush(self._messages_key(conversation_id), *[self._dumps(m) for m in messages])
+        self._expire(pipe, conversation_id)
+        pipe.execute()
+
+    def get(self, conversation_id: str) -> Optional[Dict]:
+        raw = self.redis.hgetall(self._meta_key(conversation_id))
+        if not raw:
+            return None
+        return {k.decode(): json.loads(v) for k, v in raw.items()}
+
+    def exists(self, conversation_id: str) -> bool:
+        return bool(self.redis.exists(self._meta_key(conversation_id)))
+
+    def get_messages(self, conversation_id: str, since: int = 0) -> List[Dict]:
+        since = max(0, since)
+        raw = self.redis.lrange(self._messages_key(conversation_id), since, -1)
+        return [dict(json.loads(m), seq=seq) for seq, m in enumerate(raw, start=since + 1)]
+
+    def last_seq(self, conversation_id: str) -> int:
+        return self.redis.llen(self._messages_key(conversation_id))
+
+    def append_message(self, conversation_id: str, message: MessageLike) -> int:
+        if not self.exists(conversation_id):
+            raise KeyError(conversation_id)
+        pipe = self.redis.pipeline()
+        pipe.rpush(self._messages_key(conversation_id), self._dumps(message))
+        pipe.hset(self._meta_key(conversation_id), "last_activity", json.dumps(time.time()))
+        self._expire(pipe, conversation_id)
+        # RPUSH returns the new list length, i.e. the appended message's seq
+        return pipe.execute()[0]
+
+    def touch(self, conversation_id: str) -> None:
+        if not self.exists(conversation_id):
+            return
+        pipe = self.redis.pipeline()
+        pipe.hset(self._meta_key(conversation_id), "last_activity", json.dumps(time.time()))
+        self._expire(pipe, conversation_id)
+        pipe.execute()
+
+    def delete(self, conversation_id: str) -> bool:
+        pipe = self.redis.pipeline()
+        pipe.delete(self._meta_key(conversation_id), self._messages_key(conversation_id))
+        pipe.zrem(self._index_key, conversation_id)
+        deleted, _ = pipe.execute()
+        return deleted > 0
+
+    def count(self) -> int:
+        self._prune_index()
+        return self.redis.zcard(self._index_key)
+
+    def ids(self) -> List[str]:
+        self._prune_index()
+        return [m.decode() for m in self.redis.zrange(self._index_key, 0, -1)]
+
+    @staticmethod
+    def _dumps(message: MessageLike) -> str:
+        return json.dumps(message.to_dict() if isinstance(message, Message) else message)
+
+    def _expire(self, pipe, conversation_id: str) -> None:
+        """Refresh the inactivity TTL and the conversation's index entry"""
+        pipe.expire(self._meta_key(conversation_id), self.ttl_seconds)
+        pipe.expire(self._messages_key(conversation_id), self.ttl_seconds)
+        pipe.zadd(self._index_key, {conversation_id: time.time()})
+
+    def _prune_index(self) -> None:
+        """Drop index entries whose conversation keys have already expired"""
+        self.redis.zremrangebyscore(self._index_key, "-inf", time.time() - self.ttl_seconds)
+
+
+def create_conversation_store(url: Optional[str], ttl_seconds: int = 86400,
+                              journal_dir: Optional[str] = None, **journal_options) -> ConversationStore:
+    """
+    Pick a conversation store backend from a URL
+
+    redis:// or rediss:// -> RedisConversationStore
+    empty / "memory://"   -> InMemoryConversationStore, journaled to journal_dir
+                             when one is given (call recover() before serving)
+    """
+    if url and url.startswith(("redis://", "rediss://")):
+        return RedisConversationStore(url, ttl_seconds=ttl_seconds)
+    if journal_dir:
+        from conversation_journal import ConversationJournal, JournaledConversationStore
+        return JournaledConversationStore(InMemoryConversationStore(),
+                                          ConversationJournal(journal_dir, **journal_options))
+    return InMemoryConversationStore()
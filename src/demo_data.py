@@ -0,0 +1,303 @@
+"""
+Synthetic analytics dataset generator
+
+LEARNING NOTES:
+===============
+The analytics dashboard only ever saw a handful of demo rows, so nobody knew
+how `get_user_scores` behaves once a partition holds hundreds of sessions or
+the table holds millions of rows. This script generates realistic data at
+that scale:
+
+1. **Realistic distributions**: every user has a starting skill, a ceiling
+   and a learning rate; scores follow a learning curve
+   (skill = ceiling - (ceiling - start) * e^(-rate * session)) plus per-criterion
+   strengths/weaknesses, noise and the occasional bad day
+2. **Reproducible**: each user's data comes from its own Random seeded with
+   "<seed>:<user index>", so the same seed produces the same rows no matter
+   how many workers run or in which order they finish
+3. **Batched writes**: a user is one partition, so their sessions are written
+   as entity group transactions of up to 100 rows (one round trip each)
+4. **Bounded parallelism**: a fixed pool of workers writes partitions
+   concurrently; users are generated just in time so memory stays flat
+   even for millions of rows
+5. **Throughput report**: rows/s and per-transaction latency percentiles
+
+USAGE (from the src/ folder, with storage configured in .env):
+    python demo_data.py --users 1000 --sessions 50 --seed 42
+    python demo_data.py --users 20000 --sessions 100 --workers 32
+    python demo_data.py --users 1000 --sessions 50 --dry-run   # generate only
+"""
+import argparse
+import math
+import random
+import statistics
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional, Tuple
+
+CRITERIA = ("professionalism", "communication", "problem_resolution", "empathy", "efficiency")
+
+_STRENGTHS = {
+    "professionalism": "Maintained a courteous, professional tone",
+    "communication": "Explained next steps clearly",
+    "problem_resolution": "Resolved the customer's issue",
+    "empathy": "Acknowledged the customer's frustration",
+    "efficiency": "Kept the conversation focused",
+}
+_IMPROVEMENTS = {
+    "professionalism": "Avoid informal language",
+    "communication": "Check the customer understood the solution",
+    "problem_resolution": "Confirm the issue is fully resolved before closing",
+    "empathy": "Acknowledge the customer's feelings before problem-solving",
+    "efficiency": "Ask targeted questions to reach the root cause sooner",
+}
+
+# One generated session: (conversation_id, analysis, message_count, created_at)
+Session = Tuple[str, Dict, int, str]
+
+
+def _clamp(value: float, low: float, high: float) -> float:
+    return max(low, min(high, value))
+
+
+def user_identity(index: int, prefix: str = "loadtest-user", domain: str = "example.com") -> str:
+    return f"{prefix}{index:07d}@{domain}"
+
+
+def generate_sessions(rng: random.Random, sessions: int, start: datetime, end: datetime) -> List[Session]:
+    """
+    Generate one trainee's sessions along a learning curve
+
+    Scores are integers 1-5 per criterion (total 5-25), matching analyze_interaction.
+    """
+    baseline = _clamp(rng.gauss(2.6, 0.5), 1.5, 3.8)
+    ceiling = _clamp(baseline + rng.uniform(0.6, 1.8), baseline, 4.9)
+    rate = rng.uniform(0.08, 0.35)
+    offsets = {criterion: rng.gauss(0, 0.35) for criterion in CRITERIA}
+
+    # Sessions are spread over the period, in order
+    span = (end - start).total_seconds()
+    offsets_in_time = sorted(rng.uniform(0, span) for _ in range(sessions))
+
+    generated = []
+    for k in range(sessions):
+        skill = ceiling - (ceiling - baseline) * math.exp(-rate * k)
+        if rng.random() < 0.08:
+            skill -= 0.8  # A bad day
+        scores = {
+            criterion: int(_clamp(round(rng.gauss(skill + offsets[criterion], 0.6)), 1, 5))
+            for criterion in CRITERIA
+        }
+        total = sum(scores.values())
+        best = max(CRITERIA, key=lambda c: scores[c])
+        worst = min(CRITERIA, key=lambda c: scores[c])
+        analysis = {
+            "scores": scores,
+            "total_score": total,
+            "strengths": [_STRENGTHS[best]],
+            "improvements": [_IMPROVEMENTS[worst]] if scores[worst] < 5 else [],
+            "overall_feedback": f"Score: {total}/25",
+        }
+        message_count = int(_clamp(round(rng.gauss(16 - 2 * skill, 4)), 4, 40))
+        created_at = (start + timedelta(seconds=offsets_in_time[k])).isoformat()
+        conversation_id = str(uuid.UUID(int=rng.getrandbits(128), version=4))
+        generated.append((conversation_id, analysis, message_count, created_at))
+    return generated
+
+
+def generate_user(seed: int, index: int, sessions: int, start: datetime, end: datetime,
+                  prefix: str = "loadtest-user", domain: str = "example.com") -> Tuple[str, List[Session]]:
+    """Deterministic sessions for user number `index`"""
+    rng = random.Random(f"{seed}:{index}")
+    return user_identity(index, prefix, domain), generate_sessions(rng, sessions, start, end)
+
+
+class LoadReport:
+    """Thread-safe counters and transaction latencies for a load run"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = time.perf_counter()
+        self.users = 0
+        self.rows_generated = 0
+        self.rows_written = 0
+        self.transactions = 0
+        self.failed_transactions = 0
+        self.failed_users = 0
+        self.first_error: Optional[str] = None
+        self.latencies: List[float] = []
+
+    def add(self, generated: int, written: int, latencies: List[float], failed: int) -> None:
+        with self._lock:
+            self.users += 1
+            self.rows_generated += generated
+            self.rows_written += written
+            self.transactions += len(latencies)
+            self.failed_transactions += failed
+            self.latencies.extend(latencies)
+
+    def add_failure(self, identity: str, error: BaseException) -> None:
+        """A user whose rows could not be built or written at all"""
+        with self._lock:
+            self.failed_users += 1
+            if self.first_error is None:
+                self.first_error = f"{identity}: {type(error).__name__}: {error}"
+
+    def summary(self) -> Dict:
+        with self._lock:
+            elapsed = time.perf_counter() - self.started
+            latencies = sorted(self.latencies)
+
+            def percentile(p):
+                return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000, 1) if latencies else None
+
+            return {
+                "users": self.users,
+                "rows_generated": self.rows_generated,
+                "rows_written": self.rows_written,
+                "transactions": self.transactions,
+                "failed_transactions": self.failed_transactions,
+                "failed_users": self.failed_users,
+                "first_error": self.first_error,
+                "elapsed_seconds": round(elapsed, 2),
+                "rows_per_second": round(self.rows_written / elapsed, 1) if elapsed else 0.0,
+                "generated_per_second": round(self.rows_generated / elapsed, 1) if elapsed else 0.0,
+                "transaction_ms": {
+                    "p50": percentile(0.50),
+                    "p95": percentile(0.95),
+                    "p99": percentile(0.99),
+                    "mean": round(statistics.fmean(latencies) * 1000, 1) if latencies else None,
+                },
+            }
+
+
+def _write_user(storage, identity: str, sessions: List[Session], report: LoadReport,
+                auth_method: str) -> None:
+    """Write one user's partition as 100-row transactions"""
+    latencies = []
+    written = failed = 0
+    if storage is not None:
+        entities = [
+            storage.build_score_entity(cid, identity, auth_method, analysis, count, created_at=created_at)
+            for cid, analysis, count, created_at in sessions
+        ]
+        step = storage.MAX_BATCH_OPERATIONS
+        for start in range(0, len(entities), step):
+            chunk = entities[start:start + step]
+            started = time.perf_counter()
+            ok = storage.save_score_batch(chunk)
+            latencies.append(time.perf_counter() - started)
+            written += ok
+            failed += ok < len(chunk)
+    report.add(len(sessions), written, latencies, failed)
+
+
+def load(storage, users: Iterator[Tuple[str, List[Session]]], workers: int = 8,
+         auth_method: str = "Synthetic", progress_every: float = 0.0) -> Dict:
+    """
+    Write generated users through StorageService with bounded parallelism
+
+    Args:
+        storage: StorageService, or None to only generate (dry run)
+        users: Iterator of (user_identity, sessions); consumed lazily
+        workers: Partitions written concurrently
+        progress_every: Seconds between progress lines (0 = silent)
+
+    Returns:
+        LoadReport summary
+    """
+    report = LoadReport()
+    # At most 2x workers users are generated ahead of the writers
+    slots = threading.BoundedSemaphore(max(1, workers) * 2)
+    last_progress = time.perf_counter()
+
+    def task(identity, sessions):
+        try:
+            _write_user(storage, identity, sessions, report, auth_method)
+        except Exception as e:
+            # Counted instead of lost in an unchecked future
+            report.add_failure(identity, e)
+        finally:
+            slots.release()
+
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="demo-data") as pool:
+        for identity, sessions in users:
+            slots.acquire()
+            pool.submit(task, identity, sessions)
+            if progress_every and time.perf_counter() - last_progress >= progress_every:
+                last_progress = time.perf_counter()
+                s = report.summary()
+                print(f"  {s['users']} users, {s['rows_written']} rows, {s['rows_per_second']} rows/s",
+                      flush=True)
+    return report.summary()
+
+
+def seed_users(storage, identities: List[str], sessions: int, seed: Optional[int] = None,
+               days: int = 30, workers: int = 4, auth_method: str = "Synthetic") -> Dict:
+    """Seed a few named users (used by /api/admin/seed-demo-data)"""
+    seed = random.randrange(2 ** 32) if seed is None else seed
+    end = datetime.utcnow()
+    start = end - timedelta(days=days)
+    users = (
+        (identity, generate_sessions(random.Random(f"{seed}:{identity}"), sessions, start, end))
+        for identity in identities
+    )
+    return dict(load(storage, users, workers=workers, auth_method=auth_method), seed=seed)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate synthetic conversation scores for analytics load tests")
+    parser.add_argument("--users", type=int, default=100, help="Number of users (partitions)")
+    parser.add_argument("--sessions", type=int, default=20, help="Scored sessions per user")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed (same seed, same rows)")
+    parser.add_argument("--workers", type=int, default=8, help="Partitions written concurrently")
+    parser.add_argument("--days", type=int, default=90, help="Spread sessions over this many days")
+    parser.add_argument("--end-date", help="Last day of the period, YYYY-MM-DD (default: today)")
+    parser.add_argument("--first-user", type=int, default=0, help="Index of the first user (resume / shard a run)")
+    parser.add_argument("--prefix", default="loadtest-user", help="User name prefix")
+    parser.add_argument("--domain", default="example.com", help="User e-mail domain")
+    parser.add_argument("--dry-run", action="store_true", help="Generate rows without writing them")
+    args = parser.parse_args(argv)
+
+    storage = None
+    if not args.dry_run:
+        from storage_service import StorageService
+        storage = StorageService()
+        if not storage.table_client:
+            print("✗ Table Storage is not configured (see .env.example) - use --dry-run to only generate")
+            return 1
+
+    # Pass the printed --end-date to reproduce a run exactly on another day
+    end = (datetime.strptime(args.end_date, "%Y-%m-%d") if args.end_date
+           else datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0))
+    start = end - timedelta(days=args.days)
+    users = (
+        generate_user(args.seed, index, args.sessions, start, end, args.prefix, args.domain)
+        for index in range(args.first_user, args.first_user + args.users)
+    )
+
+    print(f"Generating {args.users} users x {args.sessions} sessions "
+          f"({args.users * args.sessions} rows), seed={args.seed}, end-date={end:%Y-%m-%d}, "
+          f"workers={args.workers}"
+          f"{' [dry run]' if args.dry_run else ''}")
+    summary = load(storage, users, workers=args.workers, progress_every=5.0)
+
+    print(f"✓ {summary['rows_written']} rows written ({summary['rows_generated']} generated) "
+          f"for {summary['users']} users in {summary['elapsed_seconds']} s")
+    print(f"  throughput: {summary['rows_per_second']} rows/s written, "
+          f"{summary['generated_per_second']} rows/s generated")
+    if summary["transactions"]:
+        latency = summary["transaction_ms"]
+        print(f"  transactions: {summary['transactions']} ({summary['failed_transactions']} failed), "
+              f"p50 {latency['p50']} ms, p95 {latency['p95']} ms, p99 {latency['p99']} ms")
+    if summary["failed_users"]:
+        print(f"✗ {summary['failed_users']} users failed, first error: {summary['first_error']}")
+    return 1 if summary["failed_transactions"] or summary["failed_users"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,100 @@
+"""
+Bulk export of conversation scores (NDJSON or CSV)
+
+LEARNING NOTES:
+===============
+The same streaming pipeline as GET /api/admin/scores/export (see
+score_export.py), run directly against Table Storage so an export of
+millions of rows doesn't tie up a web worker:
+
+1. **Constant memory**: one Table page (<= 1000 rows) is in memory at a time
+2. **Filters pushed down**: --user is a single-partition query; --since and
+   --until are a created_at range evaluated by the service
+3. **Resumable**: rows are written page by page, and after every page the
+   continuation token of the next one is known. If the export fails, the
+   partial page is cut off and the command to resume is printed; --resume
+   appends to the same file. With --gzip every page is its own gzip member,
+   which gunzip and zcat read as one stream
+
+USAGE (from the src/ folder, with storage configured in .env):
+    python export_scores.py --output scores.ndjson.gz --gzip
+    python export_scores.py --format csv --since 2025-01-01 --until 2025-04-01 --output q1.csv
+    python export_scores.py --user alice@contoso.com               # to stdout
+"""
+import argparse
+import json
+import sys
+import time
+from datetime import datetime
+
+import score_export
+
+
+def parse_date(value: str) -> str:
+    datetime.fromisoformat(value)  # validate; the service compares ISO strings
+    return value
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Stream conversation scores to NDJSON or CSV")
+    parser.add_argument("--format", choices=sorted(score_export.FORMATS), default="ndjson")
+    parser.add_argument("--user", help="Only this user's scores")
+    parser.add_argument("--since", type=parse_date, help="created_at >= this ISO date/time")
+    parser.add_argument("--until", type=parse_date, help="created_at < this ISO date/time")
+    parser.add_argument("--output", help="Output file (default: stdout)")
+    parser.add_argument("--gzip", action="store_true", help="Gzip the output")
+    parser.add_argument("--page-size", type=int, default=1000, help="Rows per Table Storage request (max 1000)")
+    parser.add_argument("--resume", help="Continuation token printed by an interrupted export")
+    args = parser.parse_args(argv)
+
+    from storage_service import StorageService
+    storage = StorageService()
+    if not storage.table_client:
+        print("✗ Table Storage is not configured (see .env.example)", file=sys.stderr)
+        return 1
+
+    token = json.loads(args.resume) if args.resume else None
+    query_filter = score_export.build_filter(args.user, args.since, args.until)
+    pages = storage.iter_score_pages(query_filter, select=score_export.SELECT_FIELDS,
+                                     continuation_token=token, page_size=min(args.page_size, 1000))
+
+    # Appending when resuming; a resumed CSV must not repeat its header
+    out = open(args.output, "ab" if args.resume else "wb") if args.output else sys.stdout.buffer
+    committed = out.tell() if args.output else 0
+    rows, header, started = 0, not args.resume, time.monotonic()
+    last_report = started
+    try:
+        for page, next_token in pages:
+            text = "".join(score_export.encode(
+                score_export.export_rows([page], decode_lists=(args.format == "ndjson")), args.format, header=header))
+            header = False
+            # Each page is a complete gzip member, so the file is valid after every page
+            data = b"".join(score_export.gzip_chunks([text])) if args.gzip else text.encode("utf-8")
+            out.write(data)
+            out.flush()
+            committed += len(data)
+            rows += len(page)
+            token = next_token
+            if time.monotonic() - last_report >= 5:
+                last_report = time.monotonic()
+                print(f"  {rows} rows, {rows / (last_report - started):.0f} rows/s", file=sys.stderr)
+    except (Exception, KeyboardInterrupt) as e:
+        if args.output:
+            # Drop a partially written page so --resume continues from a clean boundary
+            out.truncate(committed)
+        print(f"✗ export interrupted after {rows} rows: {e}", file=sys.stderr)
+        if token:
+            print(f"  resume with: --resume '{json.dumps(token)}'", file=sys.stderr)
+        return 1
+    finally:
+        if out is not sys.stdout.buffer:
+            out.close()
+
+    elapsed = time.monotonic() - started
+    print(f"✓ {rows} rows exported in {elapsed:.1f} s ({rows / elapsed if elapsed else 0:.0f} rows/s)",
+          file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,67 @@
+"""
+Length-prefixed, checksummed record framing for append-only files
+
+LEARNING NOTES:
+===============
+An append-only log must survive a crash in the middle of a write. Each record
+is stored as:
+
+    +-----------+-----------+----------------+
+    | length u32| crc32 u32 | payload bytes  |
+    +-----------+-----------+----------------+
+
+- The length lets a reader skip from record to record without parsing JSON
+- The CRC detects a torn or corrupted record; reading stops there, so a
+  half-written tail is ignored instead of crashing recovery
+"""
+import struct
+import zlib
+from typing import BinaryIO, Iterator, Tuple
+
+_HEADER = struct.Struct(">II")
+HEADER_SIZE = _HEADER.size
+
+# Refuse absurd lengths from a corrupted header instead of allocating them
+MAX_RECORD_BYTES = 64 * 1024 * 1024
+
+
+def encode_frame(payload: bytes) -> bytes:
+    """Frame one record"""
+    return _HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+
+
+def iter_frames(stream: BinaryIO) -> Iterator[bytes]:
+    """Yield record payloads until end of file or the first torn/corrupt record"""
+    for payload, _ in iter_frames_with_offset(stream):
+        yield payload
+
+
+def iter_frames_with_offset(stream: BinaryIO) -> Iterator[Tuple[bytes, int]]:
+    """Yield (payload, offset just past the record); stops at the first bad record"""
+    offset = 0
+    while True:
+        header = stream.read(HEADER_SIZE)
+        if len(header) < HEADER_SIZE:
+            return
+        length, crc = _HEADER.unpack(header)
+        if length > MAX_RECORD_BYTES:
+            return
+        payload = stream.read(length)
+        if len(payload) < length or zlib.crc32(payload) != crc:
+            return
+        offset += HEADER_SIZE + length
+        yield payload, offset
+
+
+def decode_frames(data: bytes) -> Iterator[bytes]:
+    """Yield record payloads from an in-memory buffer (stops at the first bad record)"""
+    view = memoryview(data)
+    offset = 0
+    while offset + HEADER_SIZE <= len(view):
+        length, crc = _HEADER.unpack_from(view, offset)
+        start = offset + HEADER_SIZE
+        payload = bytes(view[start:start + length])
+        if length > MAX_RECORD_BYTES or len(payload) < length or zlib.crc32(payload) != crc:
+            return
+        yield payload
+        offset = start + length
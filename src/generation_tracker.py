@@ -0,0 +1,207 @@
+"""
+In-flight generation tracking for barge-in cancellation
+
+LEARNING NOTES:
+===============
+A voice conversation is interruptible: the trainee may start talking again
+(barge-in) or close the tab while Cora is still "thinking". Without tracking,
+the model call runs to completion, its tokens are billed, and the reply is
+emitted to a socket nobody is listening on.
+
+This module keeps a registry of in-flight generations:
+
+1. **Per conversation**: at most one generation runs per conversation. A new
+   user turn cancels the previous one (barge-in).
+2. **Per socket (sid)**: a disconnect cancels every generation the socket owns
+   and hands back the conversations it was bound to so they can be released.
+3. **Savings report**: cancelled generations are counted, together with an
+   estimate of the completion tokens that were never generated.
+
+KEY CONCEPTS:
+- Cancelling a *streamed* completion closes the HTTP response, which makes
+  Azure OpenAI stop generating (and billing) further completion tokens.
+- Prompt tokens are already spent once the request is sent; only completion
+  tokens can be saved, so the estimate is based on completion length.
+"""
+import threading
+import time
+from typing import Dict, List, Optional, Set
+
+import metrics
+
+
+class GenerationHandle:
+    """A single in-flight model call that can be cancelled from another greenlet"""
+
+    def __init__(self, sid: Optional[str], conversation_id: str):
+        self.sid = sid
+        self.conversation_id = conversation_id
+        self.started_at = time.monotonic()
+        self.completion_tokens = 0  # Tokens streamed so far (one per content chunk)
+        self.cancel_reason: Optional[str] = None
+        self._cancelled = threading.Event()
+        self._stream = None
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def attach_stream(self, stream) -> None:
+        """Remember the upstream stream so cancel() can close it"""
+        self._stream = stream
+        if self.cancelled:
+            self._close_stream()
+
+    def cancel(self, reason: str) -> None:
+        """Flag the generation as cancelled and abort the upstream request"""
+        if self.cancelled:
+            return
+        self.cancel_reason = reason
+        self._cancelled.set()
+        self._close_stream()
+
+    def _close_stream(self) -> None:
+        stream = self._stream
+        if stream is None:
+            return
+        try:
+            # Closing the HTTP response stops the model from generating more tokens
+            stream.close()
+        except Exception:
+            # The reading side may already be tearing the response down
+            pass
+
+
+class GenerationTracker:
+    """Registry of in-flight generations keyed by socket and by conversation"""
+
+    # Weight of the newest completion in the running average used for savings estimates
+    EWMA_ALPHA = 0.2
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._by_conversation: Dict[str, GenerationHandle] = {}
+        self._by_sid: Dict[str, Set[GenerationHandle]] = {}
+        self._bindings: Dict[str, Set[str]] = {}  # sid -> conversation ids
+        self._avg_completion_tokens: Optional[float] = None
+        self._stats = {
+            "started": 0,
+            "completed": 0,
+            "cancelled": 0,
+            "cancelled_by_reason": {},
+            "tokens_generated_before_cancel": 0,
+            "tokens_saved_estimate": 0,
+        }
+
+    # ------------------------------------------------------------------
+    # Socket <-> conversation bindings
+    # ------------------------------------------------------------------
+    def bind(self, sid: str, conversation_id: str) -> None:
+        """Record that a socket is driving a conversation"""
+        with self._lock:
+            self._bindings.setdefault(sid, set()).add(conversation_id)
+
+    def unbind_sid(self, sid: str) -> List[str]:
+        """Forget a socket and return the conversations it was bound to"""
+        with self._lock:
+            return list(self._bindings.pop(sid, set()))
+
+    def is_bound(self, conversation_id: str) -> bool:
+        """True if any connected socket is still driving the conversation"""
+        with self._lock:
+            return any(conversation_id in ids for ids in self._bindings.values())
+
+    # ------------------------------------------------------------------
+    # Generation lifecycle
+    # ------------------------------------------------------------------
+    def start(self, sid: Optional[str], conversation_id: str) -> GenerationHandle:
+        """
+        Register a new generation for a conversation
+
+        Any generation already running for the same conversation is cancelled
+        first - this is the barge-in path.
+        """
+        handle = GenerationHandle(sid, conversation_id)
+        with self._lock:
+            previous = self._by_conversation.get(conversation_id)
+            self._by_conversation[conversation_id] = handle
+            if sid:
+                self._by_sid.setdefault(sid, set()).add(handle)
+            self._stats["started"] += 1
+        if previous is not None:
+            self._cancel(previous, "barge_in")
+        return handle
+
+    def finish(self, handle: GenerationHandle) -> None:
+        """Unregister a generation once its model call has returned"""
+        with self._lock:
+            if self._by_conversation.get(handle.conversation_id) is handle:
+                del self._by_conversation[handle.conversation_id]
+            if handle.sid in self._by_sid:
+                self._by_sid[handle.sid].discard(handle)
+                if not self._by_sid[handle.sid]:
+                    del self._by_sid[handle.sid]
+            if not handle.cancelled:
+                self._stats["completed"] += 1
+                if self._avg_completion_tokens is None:
+                    self._avg_completion_tokens = float(handle.completion_tokens)
+                else:
+                    self._avg_completion_tokens += self.EWMA_ALPHA * (
+                        handle.completion_tokens - self._avg_completion_tokens
+                    )
+
+    def cancel_conversation(self, conversation_id: str, reason: str) -> Optional[GenerationHandle]:
+        """Cancel the generation running for a conversation, if any"""
+        with self._lock:
+            handle = self._by_conversation.get(conversation_id)
+        if handle is not None:
+            self._cancel(handle, reason)
+        return handle
+
+    def cancel_sid(self, sid: str, reason: str) -> List[GenerationHandle]:
+        """Cancel every generation owned by a socket"""
+        with self._lock:
+            handles = list(self._by_sid.get(sid, ()))
+        for handle in handles:
+            self._cancel(handle, reason)
+        return handles
+
+    def _cancel(self, handle: GenerationHandle, reason: str) -> None:
+        if handle.cancelled:
+            return
+        handle.cancel(reason)
+        with self._lock:
+            self._stats["cancelled"] += 1
+            by_reason = self._stats["cancelled_by_reason"]
+            by_reason[reason] = by_reason.get(reason, 0) + 1
+        metrics.GENERATIONS_CANCELLED_TOTAL.labels(reason=reason).inc()
+
+    def record_cancelled_tokens(self, handle: GenerationHandle) -> int:
+        """
+        Account for the tokens a cancelled generation produced and saved
+
+        Called by the worker once the stream has actually stopped, so the
+        streamed token count is final. Returns the estimated tokens saved.
+        """
+        with self._lock:
+            expected = self._avg_completion_tokens or 0.0
+            saved = max(0, int(round(expected - handle.completion_tokens)))
+            self._stats["tokens_generated_before_cancel"] += handle.completion_tokens
+            self._stats["tokens_saved_estimate"] += saved
+            return saved
+
+    # ------------------------------------------------------------------
+    # Reporting
+    # ------------------------------------------------------------------
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._by_conversation)
+
+    def get_stats(self) -> Dict:
+        """Snapshot of generation counters and cancellation savings"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["cancelled_by_reason"] = dict(self._stats["cancelled_by_reason"])
+            stats["in_flight"] = len(self._by_conversation)
+            stats["avg_completion_tokens"] = round(self._avg_completion_tokens or 0.0, 1)
+            return stats
@@ -0,0 +1,262 @@
+"""
+Structured, non-blocking logging for the request path
+
+LEARNING NOTES:
+===============
+`print()` on a hot path is synchronous stdout I/O (PYTHONUNBUFFERED=1 makes
+every call a write syscall). Under load that adds latency to every request and
+floods Container Apps log streams with repetitive lines.
+
+This module replaces those prints with:
+
+1. **Structured records**: one JSON object per line, queryable in Log Analytics
+2. **Background writer**: the request thread only enqueues the record; a
+   QueueListener thread formats and writes it (the queue is bounded, and
+   records are dropped and counted rather than blocking when it is full)
+3. **Per-category levels**: e.g. LOG_LEVELS="socket=WARNING,storage=DEBUG"
+4. **Sampling**: repetitive events (connects, dashboard loads) are rate limited
+   per event key; the next emitted record reports how many were suppressed
+5. **Redaction**: secret-looking fields and header dumps never reach the log
+
+USAGE:
+    from log_service import get_logger
+    log = get_logger("storage")
+    log.info("score_saved", conversation_id=cid, duration_ms=12.5)
+    log.sampled("socket_connected", sid=sid)  # rate-limited INFO
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import re
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+from config import Config
+
+ROOT_LOGGER_NAME = "cora"
+
+# Field names whose values are never logged
+# (token counts such as "prompt_tokens" are fine; a bare "token" is not)
+_SECRET_KEY_PATTERN = re.compile(
+    r"(authorization|cookie|passw(or)?d|secret|api[_-]?key|connection[_-]?string|headers|credential"
+    r"|(^|[_-])token$|(^|[_-])sas($|[_-]))",
+    re.IGNORECASE,
+)
+
+# Secret-looking fragments inside free-text values (exception messages, URLs)
+_SECRET_VALUE_PATTERNS = [
+    re.compile(r"(Bearer\s+)[A-Za-z0-9\-._~+/]+=*", re.IGNORECASE),
+    re.compile(r"(AccountKey=)[^;\s]+", re.IGNORECASE),
+    re.compile(r"(SharedAccessSignature=)[^;\s]+", re.IGNORECASE),
+    re.compile(r"([?&]sig=)[^&\s]+", re.IGNORECASE),
+    re.compile(r"(api[-_]?key[\"']?\s*[:=]\s*[\"']?)[A-Za-z0-9]+", re.IGNORECASE),
+]
+
+REDACTED = "[REDACTED]"
+
+
+def redact(fields: Dict[str, Any]) -> Dict[str, Any]:
+    """Return a copy of fields with secret keys and secret-looking values scrubbed"""
+    clean = {}
+    for key, value in fields.items():
+        if _SECRET_KEY_PATTERN.search(key):
+            clean[key] = REDACTED
+        elif isinstance(value, str):
+            clean[key] = redact_text(value)
+        elif isinstance(value, dict):
+            clean[key] = redact(value)
+        else:
+            clean[key] = value
+    return clean
+
+
+def redact_text(text: str) -> str:
+    for pattern in _SECRET_VALUE_PATTERNS:
+        text = pattern.sub(lambda m: m.group(1) + REDACTED, text)
+    return text
+
+
+class JsonFormatter(logging.Formatter):
+    """Format records as single-line JSON objects"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "category": record.name[len(ROOT_LOGGER_NAME) + 1:] or ROOT_LOGGER_NAME,
+            "event": record.getMessage(),
+        }
+        fields = getattr(record, "fields", None)
+        if fields:
+            entry.update(fields)
+        if record.exc_info:
+            entry["exception"] = redact_text(self.formatException(record.exc_info))
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class _DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that drops (and counts) records instead of blocking when full"""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Formatting happens on the listener thread; just freeze the message
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class _RateLimiter:
+    """Token bucket per event key; remembers how many events it suppressed"""
+
+    def __init__(self, per_minute: int, burst: Optional[int] = None):
+        self.rate = per_minute / 60.0
+        self.burst = burst or max(1, per_minute)
+        self._buckets: Dict[str, list] = {}  # key -> [tokens, last_refill, suppressed]
+        self._lock = threading.Lock()
+
+    def allow(self, key: str):
+        """Return (allowed, suppressed_since_last_allowed)"""
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [float(self.burst), now, 0]
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+            if bucket[0] >= 1.0:
+                bucket[0] -= 1.0
+                suppressed, bucket[2] = bucket[2], 0
+                return True, suppressed
+            bucket[2] += 1
+            return False, 0
+
+
+class StructuredLogger:
+    """Thin wrapper turning keyword arguments into structured, redacted fields"""
+
+    def __init__(self, logger: logging.Logger, limiter: _RateLimiter):
+        self.logger = logger
+        self._limiter = limiter
+
+    def _log(self, level: int, event: str, exc_info=None, **fields) -> None:
+        if not self.logger.isEnabledFor(level):
+            return
+        self.logger.log(level, event, exc_info=exc_info, extra={"fields": redact(fields)})
+
+    def debug(self, event: str, **fields) -> None:
+        self._log(logging.DEBUG, event, **fields)
+
+    def info(self, event: str, **fields) -> None:
+        self._log(logging.INFO, event, **fields)
+
+    def warning(self, event: str, **fields) -> None:
+        self._log(logging.WARNING, event, **fields)
+
+    def error(self, event: str, **fields) -> None:
+        self._log(logging.ERROR, event, **fields)
+
+    def exception(self, event: str, **fields) -> None:
+        self._log(logging.ERROR, event, exc_info=True, **fields)
+
+    def sampled(self, event: str, level: int = logging.INFO, key: Optional[str] = None, **fields) -> None:
+        """Log a repetitive event at most LOG_RATE_LIMIT_PER_MINUTE times per key"""
+        if not self.logger.isEnabledFor(level):
+            return
+        allowed, suppressed = self._limiter.allow(f"{self.logger.name}:{key or event}")
+        if not allowed:
+            return
+        if suppressed:
+            fields["suppressed"] = suppressed
+        self._log(level, event, **fields)
+
+
+# ============================================================================
+# Module-level configuration (configured once, on first get_logger call)
+# ============================================================================
+_configure_lock = threading.Lock()
+_listener: Optional[logging.handlers.QueueListener] = None
+_queue_handler: Optional[_DroppingQueueHandler] = None
+_limiter: Optional[_RateLimiter] = None
+
+
+def _parse_category_levels(spec: str) -> Dict[str, str]:
+    levels = {}
+    for item in (spec or "").split(","):
+        if "=" in item:
+            category, level = item.split("=", 1)
+            levels[category.strip()] = level.strip().upper()
+    return levels
+
+
+def configure_logging(level: Optional[str] = None,
+                      category_levels: Optional[str] = None,
+                      rate_limit_per_minute: Optional[int] = None,
+                      queue_size: int = 10000,
+                      stream=None) -> None:
+    """
+    Install the queue handler and background writer (idempotent)
+
+    Settings default to Config.LOG_LEVEL, LOG_LEVELS and LOG_RATE_LIMIT_PER_MINUTE.
+    """
+    global _listener, _queue_handler, _limiter
+    with _configure_lock:
+        if _listener is not None:
+            return
+
+        root = logging.getLogger(ROOT_LOGGER_NAME)
+        root.setLevel((level or Config.LOG_LEVEL).upper())
+        root.propagate = False
+        levels = _parse_category_levels(
+            category_levels if category_levels is not None else Config.LOG_LEVELS
+        )
+        for category, category_level in levels.items():
+            logging.getLogger(f"{ROOT_LOGGER_NAME}.{category}").setLevel(category_level)
+
+        writer = logging.StreamHandler(stream or sys.stdout)
+        writer.setFormatter(JsonFormatter())
+
+        log_queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        _queue_handler = _DroppingQueueHandler(log_queue)
+        root.addHandler(_queue_handler)
+
+        _limiter = _RateLimiter(
+            rate_limit_per_minute or Config.LOG_RATE_LIMIT_PER_MINUTE
+        )
+        _listener = logging.handlers.QueueListener(log_queue, writer, respect_handler_level=False)
+        _listener.start()
+        atexit.register(shutdown_logging)
+
+
+def shutdown_logging() -> None:
+    """Flush queued records and stop the background writer"""
+    global _listener
+    with _configure_lock:
+        if _listener is not None:
+            _listener.stop()
+            logging.getLogger(ROOT_LOGGER_NAME).removeHandler(_queue_handler)
+            _listener = None
+
+
+def dropped_records() -> int:
+    """Records dropped because the log queue was full"""
+    return _queue_handler.dropped if _queue_handler else 0
+
+
+def get_logger(category: str) -> StructuredLogger:
+    """Return a structured logger for a category (app, socket, agent, storage, ...)"""
+    configure_logging()
+    return StructuredLogger(logging.getLogger(f"{ROOT_LOGGER_NAME}.{category}"), _limiter)
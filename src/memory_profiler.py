@@ -0,0 +1,323 @@
+"""
+Live memory and allocation profiling for a running replica (served at /debug/memory)
+
+LEARNING NOTES:
+===============
+When a replica's memory keeps growing, the usual suspects are:
+
+1. **Resident conversations** - history held in-process for every active role-play
+2. **Model SDK objects** - OpenAI response/chunk objects accidentally kept alive
+3. **Socket.IO sessions** - per-connection state and queued outbound packets
+
+This module answers "which one?" without a debugger or a restart:
+
+- **Conversations**: count plus approximate bytes per conversation, measured on
+  a sample of conversations by walking their objects (shared objects such as
+  interned roles and ModelInfo are counted once, not once per conversation)
+- **Allocation sites**: tracemalloc snapshots grouped by file/line, and the
+  diff between any two snapshots (what grew, and where it was allocated)
+- **Object census** (on demand): live objects per type, e.g. how many
+  ChatCompletionChunk instances are still reachable
+- **GC**: per-generation collection counts, current counts and thresholds
+
+KEY CONCEPTS:
+- **Zero overhead while disabled**: tracemalloc hooks every allocation, so it is
+  never started implicitly; nothing here runs unless an admin asks for it
+- **Sampling mode** (MEMORY_PROFILE_SAMPLING): a duty cycle that traces for a
+  short window (e.g. 10s every 10 minutes, 1 frame deep), snapshots, and stops
+  again. The overhead is bounded by window/interval, so it is safe to leave on;
+  consecutive samples show which sites keep allocating long-lived memory
+- Snapshots are kept in a small ring (MEMORY_PROFILE_MAX_SNAPSHOTS)
+"""
+import gc
+import os
+import random
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter, OrderedDict
+from typing import Callable, Dict, List, Optional
+
+from log_service import get_logger
+
+log = get_logger("memory")
+
+GROUP_BY = ("lineno", "filename", "traceback")
+
+# Frames from the profiler itself are noise in every snapshot
+_SNAPSHOT_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+
+def approximate_size(obj, seen: set) -> int:
+    """
+    Bytes reachable from obj that are not already in seen (dicts, lists,
+    tuples, sets, __dict__ and __slots__ are followed; types and modules are not)
+    """
+    total = 0
+    stack = [obj]
+    while stack:
+        current = stack.pop()
+        if id(current) in seen or isinstance(current, (type, type(sys))):
+            continue
+        seen.add(id(current))
+        total += sys.getsizeof(current)
+        if isinstance(current, dict):
+            stack.extend(current.keys())
+            stack.extend(current.values())
+        elif isinstance(current, (list, tuple, set, frozenset)):
+            stack.extend(current)
+        elif not isinstance(current, (str, bytes, int, float, bool)) and current is not None:
+            if hasattr(current, "__dict__"):
+                stack.append(current.__dict__)
+            for cls in type(current).__mro__:
+                for slot in getattr(cls, "__slots__", ()):
+                    if slot != "__weakref__" and hasattr(current, slot):
+                        stack.append(getattr(current, slot))
+    return total
+
+
+def process_memory() -> Dict:
+    """Resident set size now (Linux /proc) and at its peak (getrusage)"""
+    report = {}
+    try:
+        with open("/proc/self/statm") as f:
+            report["rss_bytes"] = int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is KiB on Linux, bytes on macOS
+        report["peak_rss_bytes"] = peak if sys.platform == "darwin" else peak * 1024
+    except ImportError:
+        pass
+    return report
+
+
+def gc_stats() -> Dict:
+    return {
+        "enabled": gc.isenabled(),
+        "counts": list(gc.get_count()),
+        "thresholds": list(gc.get_threshold()),
+        "generations": gc.get_stats(),
+        "uncollectable": len(gc.garbage),
+    }
+
+
+def type_census(top: int = 25) -> List[Dict]:
+    """Live GC-tracked objects per type (walks the whole heap - on demand only)"""
+    counts = Counter(type(o).__module__ + "." + type(o).__qualname__ for o in gc.get_objects())
+    return [{"type": name, "count": count} for name, count in counts.most_common(top)]
+
+
+def _format_stat(stat, group_by: str) -> Dict:
+    site = stat.traceback.format() if group_by == "traceback" else str(stat.traceback[0])
+    entry = {"site": site, "size_bytes": stat.size, "count": stat.count}
+    if hasattr(stat, "size_diff"):
+        entry["size_diff_bytes"] = stat.size_diff
+        entry["count_diff"] = stat.count_diff
+    return entry
+
+
+class MemoryProfiler:
+    """
+    On-demand and sampled heap profiling for /debug/memory
+
+    Args:
+        conversation_store: Store whose conversations are measured
+        socket_sessions: Callable returning {"sessions": n, ...} for Socket.IO (optional)
+        max_snapshots: Snapshots kept for diffs
+        sample_frames: Traceback depth used by sampling mode
+        sample_seconds: Length of each sampling window
+        sample_interval: Seconds between the starts of sampling windows
+    """
+
+    def __init__(self, conversation_store, socket_sessions: Optional[Callable[[], Dict]] = None,
+                 max_snapshots: int = 4, sample_frames: int = 1, sample_seconds: float = 10.0,
+                 sample_interval: float = 600.0):
+        self.conversation_store = conversation_store
+        self.socket_sessions = socket_sessions
+        self.max_snapshots = max(2, max_snapshots)
+        self.sample_frames = sample_frames
+        self.sample_seconds = sample_seconds
+        self.sample_interval = max(sample_interval, sample_seconds)
+        self._lock = threading.Lock()
+        self._snapshots: "OrderedDict[str, Dict]" = OrderedDict()
+        self._counter = 0
+        self._manual = False  # tracing started by an admin (the sampler leaves it alone)
+        self._sampler: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    # ------------------------------------------------------------------
+    # Tracing control
+    # ------------------------------------------------------------------
+    def start_tracing(self, frames: int = 1) -> Dict:
+        """Start tracemalloc on demand (adds per-allocation overhead until stopped)"""
+        with self._lock:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(max(1, frames))
+            self._manual = True
+        log.info("tracemalloc_started", frames=tracemalloc.get_traceback_limit())
+        return self.tracing_status()
+
+    def stop_tracing(self) -> Dict:
+        """Stop tracemalloc and drop its traces (kept snapshots stay available)"""
+        with self._lock:
+            self._manual = False
+            if tracemalloc.is_tracing():
+                tracemalloc.stop()
+        log.info("tracemalloc_stopped")
+        return self.tracing_status()
+
+    def tracing_status(self) -> Dict:
+        tracing = tracemalloc.is_tracing()
+        status = {"tracing": tracing, "manual": self._manual, "sampling": self._sampler is not None}
+        if tracing:
+            current, peak = tracemalloc.get_traced_memory()
+            status.update(frames=tracemalloc.get_traceback_limit(), traced_bytes=current,
+                          traced_peak_bytes=peak, overhead_bytes=tracemalloc.get_tracemalloc_memory())
+        return status
+
+    # ------------------------------------------------------------------
+    # Snapshots
+    # ------------------------------------------------------------------
+    def take_snapshot(self, label: Optional[str] = None) -> Dict:
+        """Snapshot current traces into the ring; raises RuntimeError if not tracing"""
+        if not tracemalloc.is_tracing():
+            raise RuntimeError("tracemalloc is not running - start tracing first")
+        snapshot = tracemalloc.take_snapshot().filter_traces(_SNAPSHOT_FILTERS)
+        with self._lock:
+            self._counter += 1
+            snapshot_id = label or f"s{self._counter}"
+            self._snapshots[snapshot_id] = {"snapshot": snapshot, "taken_at": time.time()}
+            self._snapshots.move_to_end(snapshot_id)
+            while len(self._snapshots) > self.max_snapshots:
+                self._snapshots.popitem(last=False)
+        return {"id": snapshot_id, "traced_bytes": sum(t.size for t in snapshot.traces)}
+
+    def list_snapshots(self) -> List[Dict]:
+        with self._lock:
+            return [{"id": sid, "taken_at": entry["taken_at"]} for sid, entry in self._snapshots.items()]
+
+    def _get_snapshot(self, snapshot_id: Optional[str]):
+        with self._lock:
+            if not self._snapshots:
+                raise KeyError("no snapshots taken yet")
+            if snapshot_id is None:
+                snapshot_id = next(reversed(self._snapshots))
+            return snapshot_id, self._snapshots[snapshot_id]["snapshot"]
+
+    def top(self, snapshot_id: Optional[str] = None, limit: int = 20, group_by: str = "lineno") -> Dict:
+        """Largest allocation sites of a snapshot (the latest by default)"""
+        snapshot_id, snapshot = self._get_snapshot(snapshot_id)
+        stats = snapshot.statistics(group_by)
+        return {"snapshot": snapshot_id, "group_by": group_by,
+                "sites": [_format_stat(s, group_by) for s in stats[:limit]]}
+
+    def diff(self, older: str, newer: Optional[str] = None, limit: int = 20, group_by: str = "lineno") -> Dict:
+        """Allocation sites that changed the most between two snapshots"""
+        older_id, older_snapshot = self._get_snapshot(older)
+        newer_id, newer_snapshot = self._get_snapshot(newer)
+        stats = newer_snapshot.compare_to(older_snapshot, group_by)
+        return {"from": older_id, "to": newer_id, "group_by": group_by,
+                "size_diff_bytes": sum(s.size_diff for s in stats),
+                "sites": [_format_stat(s, group_by) for s in stats[:limit]]}
+
+    # ------------------------------------------------------------------
+    # Conversations
+    # ------------------------------------------------------------------
+    def conversation_memory(self, sample: int = 200) -> Dict:
+        """Conversation count and approximate resident bytes (measured on a sample)"""
+        store = getattr(self.conversation_store, "inner", self.conversation_store)
+        ids = self.conversation_store.ids()
+        report = {"count": len(ids), "backend": type(store).__name__}
+        # Only the in-process backend keeps conversations in this replica's memory
+        if not hasattr(store, "_conversations"):
+            report["resident"] = False
+            return report
+
+        sampled = random.sample(ids, min(sample, len(ids)))
+        seen: set = set()
+        total_bytes = messages = 0
+        for conversation_id in sampled:
+            history = self.conversation_store.get_history(conversation_id)
+            messages += len(history)
+            total_bytes += approximate_size(self.conversation_store.get(conversation_id) or {}, seen)
+            total_bytes += approximate_size(history, seen)
+        per_conversation = total_bytes / len(sampled) if sampled else 0
+        report.update(
+            resident=True,
+            sampled=len(sampled),
+            approx_bytes_per_conversation=round(per_conversation),
+            approx_bytes_per_message=round(total_bytes / messages) if messages else 0,
+            approx_total_bytes=round(per_conversation * len(ids)),
+        )
+        return report
+
+    # ------------------------------------------------------------------
+    # Report
+    # ------------------------------------------------------------------
+    def report(self, top: int = 20, group_by: str = "lineno", census: bool = False) -> Dict:
+        """Everything /debug/memory shows; the heap census only when asked for"""
+        report = {
+            "process": process_memory(),
+            "conversations": self.conversation_memory(),
+            "gc": gc_stats(),
+            "tracemalloc": self.tracing_status(),
+            "snapshots": self.list_snapshots(),
+        }
+        if self.socket_sessions is not None:
+            try:
+                report["socketio"] = self.socket_sessions()
+            except Exception as e:
+                report["socketio"] = {"error": str(e)}
+        if report["snapshots"]:
+            report["top_allocations"] = self.top(limit=top, group_by=group_by)
+        if census:
+            report["types"] = type_census()
+        return report
+
+    # ------------------------------------------------------------------
+    # Sampling mode
+    # ------------------------------------------------------------------
+    def start_sampling(self) -> None:
+        """Start the duty-cycled sampler (idempotent)"""
+        if self._sampler is not None:
+            return
+        self._sampler = threading.Thread(target=self._run_sampler, name="memory-sampler", daemon=True)
+        self._sampler.start()
+        log.info("memory_sampling_started", window_seconds=self.sample_seconds,
+                 interval_seconds=self.sample_interval, frames=self.sample_frames)
+
+    def stop_sampling(self) -> None:
+        self._stop.set()
+
+    def _run_sampler(self) -> None:
+        while not self._stop.wait(self.sample_interval - self.sample_seconds):
+            try:
+                self._sample_once()
+            except Exception as e:
+                log.error("memory_sample_failed", error=str(e))
+
+    def _sample_once(self) -> None:
+        with self._lock:
+            if self._manual or tracemalloc.is_tracing():
+                owned = False  # an admin is tracing: snapshot without touching it
+            else:
+                tracemalloc.start(self.sample_frames)
+                owned = True
+        try:
+            if self._stop.wait(self.sample_seconds):
+                return
+            self.take_snapshot()
+        finally:
+            if owned:
+                with self._lock:
+                    if not self._manual and tracemalloc.is_tracing():
+                        tracemalloc.stop()
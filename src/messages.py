@@ -0,0 +1,148 @@
+"""
+Compact in-memory representation of conversation messages
+
+LEARNING NOTES:
+===============
+Every turn used to be stored as a dict like:
+
+    {"role": "assistant", "content": "...", "timestamp": "2025-01-01T12:00:00.123456",
+     "metadata": {"agent_name": "...", "model": "gpt-4o",
+                  "usage": {"prompt_tokens": 812, "completion_tokens": 64, "total_tokens": 876}}}
+
+That is four dicts, an ISO string and three repeated strings per assistant
+turn. With thousands of resident conversations, the containers outweigh the
+text itself.
+
+A Message instead holds:
+
+1. **__slots__** (no per-instance __dict__)
+2. **Interned roles** - "user"/"assistant" are the same string object everywhere
+3. **Integer timestamps** - microseconds since the epoch (exact round trip
+   to the ISO string the API returns)
+4. **Shared metadata** - agent_name/model live in one ModelInfo object shared
+   by every turn produced by that model; token counts are plain ints
+
+The JSON shape clients and the Redis store see is unchanged: to_dict() /
+from_dict() convert at the boundary. See benchmarks/message_memory_benchmark.py
+for the before/after bytes per turn.
+"""
+import sys
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Union
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def timestamp_to_micros(timestamp: str) -> int:
+    """Naive-UTC ISO timestamp (datetime.utcnow().isoformat()) -> epoch microseconds"""
+    delta = datetime.fromisoformat(timestamp).replace(tzinfo=None) - _EPOCH
+    return (delta.days * 86400 + delta.seconds) * 1_000_000 + delta.microseconds
+
+
+def micros_to_timestamp(micros: int) -> str:
+    return (_EPOCH + timedelta(microseconds=micros)).isoformat()
+
+
+def now_micros() -> int:
+    return timestamp_to_micros(datetime.utcnow().isoformat())
+
+
+@dataclass(frozen=True, slots=True)
+class ModelInfo:
+    """Per-model metadata shared by every turn the model produced"""
+    agent_name: str
+    model: str
+
+
+_model_infos: Dict[tuple, ModelInfo] = {}
+_model_infos_lock = threading.Lock()
+
+
+def shared_model_info(agent_name: str, model: str) -> ModelInfo:
+    """Return THE ModelInfo for (agent_name, model), creating it once"""
+    key = (agent_name, model)
+    info = _model_infos.get(key)
+    if info is None:
+        with _model_infos_lock:
+            info = _model_infos.setdefault(key, ModelInfo(sys.intern(agent_name), sys.intern(model)))
+    return info
+
+
+@dataclass(slots=True)
+class Message:
+    """One conversation turn"""
+    role: str
+    content: str
+    ts: int  # microseconds since the epoch (UTC)
+    model_info: Optional[ModelInfo] = None
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
+    # Any other metadata keys (rare), kept as-is
+    extra: Optional[Dict] = None
+
+    @classmethod
+    def create(cls, role: str, content: str, ts: Optional[int] = None, **kwargs) -> "Message":
+        return cls(sys.intern(role), content, now_micros() if ts is None else ts, **kwargs)
+
+    @property
+    def timestamp(self) -> str:
+        return micros_to_timestamp(self.ts)
+
+    def metadata(self) -> Optional[Dict]:
+        """The message's metadata dict in the API shape (None if it has none)"""
+        if self.model_info is None and self.prompt_tokens is None and not self.extra:
+            return None
+        metadata = dict(self.extra) if self.extra else {}
+        if self.model_info is not None:
+            metadata["agent_name"] = self.model_info.agent_name
+            metadata["model"] = self.model_info.model
+        if self.prompt_tokens is not None:
+            metadata["usage"] = {
+                "prompt_tokens": self.prompt_tokens,
+                "completion_tokens": self.completion_tokens,
+                "total_tokens": self.prompt_tokens + (self.completion_tokens or 0),
+            }
+        return metadata
+
+    def to_dict(self) -> Dict:
+        """Serialize to the JSON shape used by the API, Socket.IO and Redis"""
+        message = {"role": self.role, "content": self.content, "timestamp": self.timestamp}
+        metadata = self.metadata()
+        if metadata is not None:
+            message["metadata"] = metadata
+        return message
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "Message":
+        """Parse the API/JSON shape, sharing metadata objects where possible"""
+        timestamp = data.get("timestamp")
+        ts = timestamp_to_micros(timestamp) if timestamp else now_micros()
+        message = cls(sys.intern(data.get("role", "user")), data.get("content", ""), ts)
+
+        metadata = data.get("metadata")
+        if metadata:
+            extra = dict(metadata)
+            agent_name = extra.pop("agent_name", None)
+            model = extra.pop("model", None)
+            if agent_name is not None and model is not None:
+                message.model_info = shared_model_info(agent_name, model)
+            else:
+                # Keep a lone field rather than inventing the other one
+                if agent_name is not None:
+                    extra["agent_name"] = agent_name
+                if model is not None:
+                    extra["model"] = model
+            usage = extra.pop("usage", None)
+            if isinstance(usage, dict) and "prompt_tokens" in usage:
+                message.prompt_tokens = int(usage["prompt_tokens"])
+                message.completion_tokens = int(usage.get("completion_tokens") or 0)
+            elif usage is not None:
+                extra["usage"] = usage
+            message.extra = extra or None
+        return message
+
+    @classmethod
+    def coerce(cls, message: Union["Message", Dict]) -> "Message":
+        return message if isinstance(message, Message) else cls.from_dict(message)
@@ -0,0 +1,402 @@
+"""
+In-process metrics with a Prometheus-compatible /metrics endpoint
+
+LEARNING NOTES:
+===============
+Application Insights only sees what OpenTelemetry exports, and only when a
+connection string is configured. These metrics live in process memory and are
+rendered in the Prometheus text exposition format, so they work:
+
+1. **Offline**: no exporter, no network, no extra packages
+2. **Anywhere**: Prometheus, Azure Monitor managed Prometheus, or `curl /metrics`
+3. **Cheaply**: an observation is a lock, a bisect and two additions
+
+KEY CONCEPTS:
+- **Counter**: only goes up (tokens used, requests served)
+- **Gauge**: goes up and down, or is computed on scrape (connected sessions)
+- **Histogram**: counts observations into cumulative buckets (latency); the
+  p50/p95/p99 are computed by the scraper with histogram_quantile()
+- **Labels**: keep cardinality low - mood, route and operation names only,
+  never conversation ids or user names
+"""
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Latency buckets in seconds, tuned for model calls (sub-second to tens of seconds)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Short-operation buckets in seconds (prompt assembly, in-process work)
+FAST_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5)
+
+# Token-count buckets
+TOKEN_BUCKETS = (16, 32, 64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384)
+
+# Route label values for the two model workloads
+ROUTE_SEND_MESSAGE = "socket:send_message"
+ROUTE_ANALYZE = "POST /api/conversation/analyze"
+
+# Route label values for Table Storage calls made outside the model workloads
+ROUTE_USER_SCORES = "GET /api/user/scores"
+ROUTE_SCORE_EXPORT = "GET /api/admin/scores/export"
+ROUTE_BACKGROUND = "background"  # Spool replay, usage ledger, CLI tools
+
+# Mood label of operations that don't belong to one conversation
+NO_MOOD = "none"
+
+# Mood comes from the client, so unknown values collapse into one series
+KNOWN_MOODS = frozenset({"neutral", "happy", "curious", "frustrated", "confused", "impatient"})
+
+
+def mood_label(mood: Optional[str]) -> str:
+    """Bound the cardinality of the mood label"""
+    return mood if mood in KNOWN_MOODS else "other"
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    escaped = [
+        (k, str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"'))
+        for k, v in pairs
+    ]
+    return "{" + ",".join(f'{k}="{v}"' for k, v in escaped) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    """Shared label handling for all metric types"""
+
+    type_name = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._children: Dict[Tuple[str, ...], object] = {}
+
+    def labels(self, **labels):
+        """Return the child series for a set of label values"""
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.get(key)
+                if child is None:
+                    child = self._new_child()
+                    self._children[key] = child
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def _default(self):
+        # Unlabelled metrics use a single child with an empty key
+        return self.labels()
+
+    def render(self) -> List[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type_name}",
+        ]
+        with self._lock:
+            children = list(self._children.items())
+        for key, child in children:
+            lines.extend(self._render_child(key, child))
+        return lines
+
+    def _render_child(self, key, child) -> Iterable[str]:
+        raise NotImplementedError
+
+
+class _Value:
+    __slots__ = ("value", "lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self.lock = threading.Lock()
+
+
+class _CounterChild(_Value):
+    __slots__ = ()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self.lock:
+            self.value += amount
+
+
+class Counter(_Metric):
+    """Monotonically increasing count"""
+
+    type_name = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._default().inc(amount)
+
+    def _render_child(self, key, child):
+        yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(child.value)}"
+
+
+class _GaugeChild(_Value):
+    __slots__ = ()
+
+    def set(self, value: float) -> None:
+        with self.lock:
+            self.value = float(value)
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self.lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        with self.lock:
+            self.value -= amount
+
+
+class Gauge(_Metric):
+    """Value that can go up and down, or be computed by a callback at scrape time"""
+
+    type_name = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 callback: Optional[Callable[[], float]] = None):
+        super().__init__(name, documentation, labelnames)
+        self.callback = callback
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value: float) -> None:
+        self._default().set(value)
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._default().inc(amount)
+
+    def dec(self, amount: float = 1.0) -> None:
+        self._default().dec(amount)
+
+    def set_callback(self, callback: Callable[[], float]) -> None:
+        self.callback = callback
+
+    def render(self) -> List[str]:
+        if self.callback is not None:
+            try:
+                self.set(self.callback())
+            except Exception:
+                # A failing callback must never break the whole scrape
+                pass
+        return super().render()
+
+    def _render_child(self, key, child):
+        yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(child.value)}"
+
+
+class _HistogramChild:
+    __slots__ = ("buckets", "counts", "sum", "lock")
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # Last slot is +Inf
+        self.sum = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    @contextmanager
+    def time(self):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+
+class Histogram(_Metric):
+    """Distribution of observations in cumulative buckets"""
+
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self._default().observe(value)
+
+    def time(self):
+        return self._default().time()
+
+    def _render_child(self, key, child):
+        with child.lock:
+            counts = list(child.counts)
+            total_sum = child.sum
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += count
+            labels = _format_labels(self.labelnames, key, ("le", _format_value(bound)))
+            yield f"{self.name}_bucket{labels} {cumulative}"
+        plain = _format_labels(self.labelnames, key)
+        yield f"{self.name}_sum{plain} {_format_value(total_sum)}"
+        yield f"{self.name}_count{plain} {cumulative}"
+
+
+class MetricsRegistry:
+    """Holds every metric and renders them in the Prometheus text format"""
+
+    CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+              callback: Optional[Callable[[], float]] = None) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames, callback))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# ============================================================================
+# Application metrics (module-level singletons shared by app, agent, storage)
+# ============================================================================
+registry = MetricsRegistry()
+
+HTTP_REQUEST_SECONDS = registry.histogram(
+    "cora_http_request_seconds", "HTTP request latency by route",
+    ["route", "method", "status"])
+
+QUEUE_WAIT_SECONDS = registry.histogram(
+    "cora_queue_wait_seconds", "Time a turn waited before processing started",
+    ["route", "mood"])
+
+PROMPT_ASSEMBLY_SECONDS = registry.histogram(
+    "cora_prompt_assembly_seconds", "Time spent building the model prompt",
+    ["route", "mood"], buckets=FAST_BUCKETS)
+
+MODEL_TTFT_SECONDS = registry.histogram(
+    "cora_model_ttft_seconds", "Model time to first token",
+    ["route", "mood"])
+
+MODEL_LATENCY_SECONDS = registry.histogram(
+    "cora_model_latency_seconds", "Total model call latency",
+    ["route", "mood"])
+
+MODEL_TOKENS = registry.histogram(
+    "cora_model_tokens", "Tokens per model call (direction=in for prompt, out for completion)",
+    ["route", "mood", "direction"], buckets=TOKEN_BUCKETS)
+
+MODEL_TOKENS_TOTAL = registry.counter(
+    "cora_model_tokens_total", "Total tokens consumed",
+    ["route", "mood", "direction"])
+
+MODEL_SLO_MISSES_TOTAL = registry.counter(
+    "cora_model_slo_misses_total", "Model calls slower than their route's latency SLO",
+    ["route"])
+
+MODEL_ERRORS_TOTAL = registry.counter(
+    "cora_model_errors_total", "Failed model calls",
+    ["route", "mood"])
+
+GENERATIONS_CANCELLED_TOTAL = registry.counter(
+    "cora_generations_cancelled_total", "Generations cancelled before completing",
+    ["reason"])
+
+TOKENS_SAVED_TOTAL = registry.counter(
+    "cora_cancelled_tokens_saved_total", "Estimated completion tokens saved by cancellation")
+
+EVALUATIONS_TOTAL = registry.counter(
+    "cora_evaluations_total", "Conversation evaluations by mode (full, short, chunked, skipped)",
+    ["mode"])
+
+TABLE_OPERATION_SECONDS = registry.histogram(
+    "cora_table_operation_seconds", "Azure Table Storage operation latency",
+    ["route", "mood", "operation", "outcome"])
+
+STORAGE_BREAKER_STATE = registry.gauge(
+    "cora_storage_breaker_state", "Table Storage circuit breaker state (0 closed, 1 half-open, 2 open)")
+
+STORAGE_BREAKER_TRANSITIONS_TOTAL = registry.counter(
+    "cora_storage_breaker_transitions_total", "Table Storage circuit breaker state changes",
+    ["state"])
+
+STORAGE_REJECTED_TOTAL = registry.counter(
+    "cora_storage_rejected_total", "Table Storage calls not made because the breaker was open",
+    ["operation"])
+
+STORAGE_STALE_READS_TOTAL = registry.counter(
+    "cora_storage_stale_reads_total", "Score reads served from the local cache while storage was unavailable")
+
+STORAGE_SPOOL_DEPTH = registry.gauge(
+    "cora_storage_spool_depth", "Score writes waiting in the local spool")
+
+STORAGE_SPOOLED_TOTAL = registry.counter(
+    "cora_storage_spooled_total", "Score writes diverted to the local spool",
+    ["reason"])
+
+STORAGE_SPOOL_REPLAYED_TOTAL = registry.counter(
+    "cora_storage_spool_replayed_total", "Spooled score writes replayed to Table Storage")
+
+ADMISSION_QUEUE_DEPTH = registry.gauge(
+    "cora_admission_queue_depth", "Turns waiting for an admission slot")
+
+ADMISSION_RUNNING = registry.gauge(
+    "cora_admission_running", "Turns holding an admission slot")
+
+ADMISSION_WAIT_SECONDS = registry.histogram(
+    "cora_admission_wait_seconds", "Time a turn waited in the admission queue",
+    ["outcome"])
+
+ADMISSION_REJECTED_TOTAL = registry.counter(
+    "cora_admission_rejected_total", "Turns shed by admission control",
+    ["reason"])
+
+SOCKETIO_SESSIONS = registry.gauge(
+    "cora_socketio_connected_sessions", "Socket.IO sessions connected to this replica")
+
+ACTIVE_CONVERSATIONS = registry.gauge(
+    "cora_active_conversations", "Conversations held in the conversation store")
@@ -0,0 +1,83 @@
+"""
+Per-workload model routing: a fast tier for live turns, a strong tier for scoring
+
+LEARNING NOTES:
+===============
+The app makes two very different model calls:
+
+1. **Conversation** (process_message): Cora's 2-4 sentence reply while the
+   trainee waits. Latency is what the user feels, so a small, fast deployment
+   (e.g. gpt-4o-mini) is the better fit.
+2. **Evaluation** (analyze_interaction): the 5-criteria rubric over the whole
+   transcript. Runs once per conversation, so a stronger deployment is worth
+   its extra seconds.
+
+Each workload gets a ModelRoute: the deployment name plus its own generation
+parameters, request timeout and latency SLO. A call slower than its SLO is
+counted in cora_model_slo_misses_total{route} so a slow tier shows up on the
+dashboard before users complain.
+
+KEY CONCEPTS:
+- Both deployment names default to AZURE_AI_MODEL_NAME, so an existing
+  single-model setup keeps working unchanged
+- The timeout is passed per request to the OpenAI client (no retries are
+  hidden behind it); an SLO is only measured, never enforced
+- See benchmarks/model_tier_benchmark.py for per-tier latency
+"""
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+CONVERSATION = "conversation"
+EVALUATION = "evaluation"
+
+
+@dataclass(frozen=True)
+class ModelRoute:
+    """Deployment and call parameters for one workload"""
+    name: str
+    deployment: str
+    temperature: Optional[float]
+    max_tokens: Optional[int]
+    timeout_seconds: float
+    slo_seconds: float
+
+    def request_options(self, max_tokens: Optional[int] = None) -> Dict:
+        """Keyword arguments for client.chat.completions.create()"""
+        options = {"model": self.deployment, "timeout": self.timeout_seconds}
+        if self.temperature is not None:
+            options["temperature"] = self.temperature
+        tokens = max_tokens or self.max_tokens
+        if tokens:
+            options["max_tokens"] = tokens
+        return options
+
+    def to_dict(self) -> Dict:
+        return {
+            "deployment": self.deployment,
+            "temperature": self.temperature,
+            "max_tokens": self.max_tokens,
+            "timeout_seconds": self.timeout_seconds,
+            "slo_seconds": self.slo_seconds,
+        }
+
+
+def build_routes(config) -> Dict[str, ModelRoute]:
+    """Routes for both workloads from Config"""
+    return {
+        CONVERSATION: ModelRoute(
+            name=CONVERSATION,
+            deployment=config.CONVERSATION_MODEL_NAME or config.AZURE_AI_MODEL_NAME,
+            temperature=config.CONVERSATION_TEMPERATURE,
+            max_tokens=config.AGENT_MAX_TOKENS,
+            timeout_seconds=config.CONVERSATION_TIMEOUT_SECONDS,
+            slo_seconds=config.CONVERSATION_SLO_SECONDS,
+        ),
+        EVALUATION: ModelRoute(
+            name=EVALUATION,
+            deployment=config.EVALUATION_MODEL_NAME or config.AZURE_AI_MODEL_NAME,
+            temperature=config.EVALUATION_TEMPERATURE,
+            max_tokens=None,  # the rubric sets its own cap (short rubric / windows) when it needs one
+            timeout_seconds=config.EVALUATION_TIMEOUT_SECONDS,
+            slo_seconds=config.EVALUATION_SLO_SECONDS,
+        ),
+    }
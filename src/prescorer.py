@@ -0,0 +1,326 @@
+"""
+Heuristic pre-scorer: instant provisional scores before (or instead of) the model rubric
+
+LEARNING NOTES:
+===============
+analyze_interaction() sends the whole transcript to the model for the 5-criteria
+rubric. That is the right call for a real role-play, but a waste for a
+conversation with one greeting, or where the trainee never replied at all.
+
+The pre-scorer extracts cheap features from the transcript and:
+
+1. **Scores instantly**: a provisional 1-5 per criterion, shown while the
+   model evaluation is still running
+2. **Triages**: decides whether the model evaluation can be
+   - "skip":  too little agent input to judge - the provisional score is final
+   - "short": a short conversation - a compact rubric with a small reply budget
+   - "full":  the normal evaluation
+
+KEY CONCEPTS:
+- The trainee is the "user" role; Cora (the simulated customer) is "assistant"
+- Conversations are processed in batches: every message of every conversation
+  is flattened into one set of NumPy arrays, and per-conversation statistics
+  are reduced with np.bincount / ufunc.at instead of Python loops
+- Lexicon hits (empathy, apology, courtesy, resolution) come from ONE regex
+  scan per message; only that tokenizing step is per-message Python
+- Inter-turn timing comes from the message timestamps: the gap between a
+  customer message and the agent reply that follows it
+
+See benchmarks/prescorer_benchmark.py for throughput on a transcript corpus.
+"""
+import re
+import warnings
+from typing import Dict, List, Sequence, Union
+
+import numpy as np
+
+from messages import Message, micros_to_timestamp, now_micros, timestamp_to_micros
+
+AGENT_ROLE = "user"
+
+# Decisions for the model evaluation
+SKIP = "skip"
+SHORT = "short"
+FULL = "full"
+
+CRITERIA = ("professionalism", "communication", "problem_resolution", "empathy", "efficiency")
+
+FEATURES = (
+    "turns",
+    "agent_turns",
+    "customer_turns",
+    "agent_words",
+    "agent_words_mean",
+    "agent_words_std",
+    "agent_words_max",
+    "question_ratio",
+    "empathy_rate",
+    "apology_rate",
+    "courtesy_rate",
+    "resolution_rate",
+    "responses_timed",
+    "response_seconds_mean",
+    "response_seconds_max",
+)
+_F = {name: i for i, name in enumerate(FEATURES)}
+
+# Lexicons: phrases are matched on word boundaries, case-insensitively
+LEXICONS = {
+    "empathy": (
+        "i understand", "i can understand", "i see", "that must be", "i can imagine",
+        "frustrating", "i hear you", "makes sense", "i appreciate", "completely understand",
+        "i know how", "that sounds",
+    ),
+    "apology": ("sorry", "apologize", "apologise", "apologies", "my apologies"),
+    "courtesy": (
+        "please", "thank you", "thanks", "you're welcome", "happy to help", "glad to help",
+        "my pleasure", "have a great day", "have a nice day",
+    ),
+    "resolution": (
+        "refund", "replace", "replacement", "resolve", "resolved", "fix", "fixed", "credit",
+        "escalate", "follow up", "i will", "i'll", "let me", "i've", "processed", "arrange",
+        "ticket", "confirm",
+    ),
+}
+_LEXICON_COLUMNS = {name: i for i, name in enumerate(LEXICONS)}
+_TERM_COLUMN = {term: _LEXICON_COLUMNS[name] for name, terms in LEXICONS.items() for term in terms}
+# Longest phrases first so "my apologies" wins over "apologies"
+_LEXICON_RE = re.compile(
+    r"\b(?:" + "|".join(re.escape(t) for t in sorted(_TERM_COLUMN, key=len, reverse=True)) + r")\b")
+
+# Responses slower than this count as the "max" but are capped (an idle tab is not a 2-hour reply)
+MAX_RESPONSE_SECONDS = 600.0
+
+
+def _message_rows(conversations: Sequence[Sequence[Union[Message, Dict]]]):
+    """Flatten a batch into per-message columns (the only per-message Python work)"""
+    conv_index: List[int] = []
+    is_agent: List[bool] = []
+    words: List[int] = []
+    questions: List[bool] = []
+    hits: List[List[int]] = []
+    stamps: List[Union[int, str, None]] = []
+    for index, conversation in enumerate(conversations):
+        for message in conversation:
+            # Dicts are read directly: building a Message per turn would dominate the cost
+            if isinstance(message, Message):
+                role, content, stamp = message.role, message.content, message.ts
+            else:
+                role, content, stamp = message.get("role"), message.get("content") or "", message.get("timestamp")
+            text = content.lower().replace("’", "'")
+            row = [0] * len(LEXICONS)
+            for term in _LEXICON_RE.findall(text):
+                row[_TERM_COLUMN[term]] += 1
+            conv_index.append(index)
+            is_agent.append(role == AGENT_ROLE)
+            words.append(len(text.split()))
+            questions.append("?" in text)
+            hits.append(row)
+            stamps.append(stamp)
+    return conv_index, is_agent, words, questions, hits, stamps
+
+
+def _epoch_seconds(stamps: List[Union[int, str, None]]) -> np.ndarray:
+    """Epoch seconds for Message.ts ints and ISO timestamp strings (parsed in one NumPy call)"""
+    micros = np.zeros(len(stamps), dtype=np.int64)
+    iso_positions = [i for i, stamp in enumerate(stamps) if not isinstance(stamp, int)]
+    if len(iso_positions) < len(stamps):
+        ints = np.ones(len(stamps), dtype=bool)
+        ints[iso_positions] = False
+        micros[ints] = [stamp for stamp in stamps if isinstance(stamp, int)]
+    if iso_positions:
+        iso = [stamps[i] or micros_to_timestamp(now_micros()) for i in iso_positions]
+        try:
+            with warnings.catch_warnings():
+                warnings.simplefilter("error")
+                micros[iso_positions] = np.array(iso, dtype="datetime64[us]").astype(np.int64)
+        except (ValueError, UserWarning):
+            # Offsets such as "+00:00" are parsed the same way Message.from_dict does
+            micros[iso_positions] = [timestamp_to_micros(t) for t in iso]
+    return micros / 1e6
+
+
+def extract_features(conversations: Sequence[Sequence[Union[Message, Dict]]]) -> np.ndarray:
+    """
+    Feature matrix for a batch of conversations
+
+    Returns an array of shape (len(conversations), len(FEATURES)); column
+    names are in FEATURES. Messages must be in conversation order.
+    """
+    n = len(conversations)
+    conv_index, is_agent, words, questions, hits, stamps = _message_rows(conversations)
+    features = np.zeros((n, len(FEATURES)))
+    if not conv_index:
+        return features
+
+    conv = np.asarray(conv_index, dtype=np.intp)
+    agent = np.asarray(is_agent, dtype=bool)
+    agent_f = agent.astype(float)
+    word_count = np.asarray(words, dtype=float)
+    hit_counts = np.asarray(hits, dtype=float).reshape(len(conv_index), len(LEXICONS))
+    seconds = _epoch_seconds(stamps)
+
+    turns = np.bincount(conv, minlength=n).astype(float)
+    agent_turns = np.bincount(conv, weights=agent_f, minlength=n)
+    safe_turns = np.maximum(agent_turns, 1.0)
+
+    agent_words = word_count * agent_f
+    words_sum = np.bincount(conv, weights=agent_words, minlength=n)
+    words_sq = np.bincount(conv, weights=agent_words ** 2, minlength=n)
+    words_mean = words_sum / safe_turns
+    words_max = np.zeros(n)
+    np.maximum.at(words_max, conv[agent], word_count[agent])
+
+    features[:, _F["turns"]] = turns
+    features[:, _F["agent_turns"]] = agent_turns
+    features[:, _F["customer_turns"]] = turns - agent_turns
+    features[:, _F["agent_words"]] = words_sum
+    features[:, _F["agent_words_mean"]] = words_mean
+    features[:, _F["agent_words_std"]] = np.sqrt(np.maximum(words_sq / safe_turns - words_mean ** 2, 0.0))
+    features[:, _F["agent_words_max"]] = words_max
+
+    asked = np.asarray(questions, dtype=float) * agent_f
+    features[:, _F["question_ratio"]] = np.bincount(conv, weights=asked, minlength=n) / safe_turns
+    for name, column in _LEXICON_COLUMNS.items():
+        agent_hits = hit_counts[:, column] * agent_f
+        features[:, _F[f"{name}_rate"]] = np.bincount(conv, weights=agent_hits, minlength=n) / safe_turns
+
+    # An agent reply directly after a customer message in the same conversation
+    replied = agent[1:] & ~agent[:-1] & (conv[1:] == conv[:-1])
+    gaps = np.clip(np.diff(seconds), 0.0, MAX_RESPONSE_SECONDS)[replied]
+    reply_conv = conv[1:][replied]
+    timed = np.bincount(reply_conv, minlength=n).astype(float)
+    gap_max = np.zeros(n)
+    np.maximum.at(gap_max, reply_conv, gaps)
+    features[:, _F["responses_timed"]] = timed
+    features[:, _F["response_seconds_mean"]] = (
+        np.bincount(reply_conv, weights=gaps, minlength=n) / np.maximum(timed, 1.0))
+    features[:, _F["response_seconds_max"]] = gap_max
+    return features
+
+
+def provisional_scores(features: np.ndarray) -> np.ndarray:
+    """Heuristic 1-5 score per criterion (columns in CRITERIA order) for a feature matrix"""
+    def f(name):
+        return features[:, _F[name]]
+
+    mean_words = f("agent_words_mean")
+    questions = f("question_ratio")
+    courtesy = np.minimum(f("courtesy_rate"), 1.0)
+    empathy = np.minimum(f("empathy_rate") * 2, 1.0)
+    apology = np.minimum(f("apology_rate") * 2, 1.0)
+    resolution = np.minimum(f("resolution_rate"), 1.0)
+
+    professionalism = 2.5 + 1.5 * courtesy + (mean_words >= 5) - (mean_words < 3)
+    communication = (5.0 - 2 * (mean_words < 6) - (mean_words < 12)
+                     - (mean_words > 60) - (mean_words > 120))
+    problem_resolution = 1.5 + 2.5 * resolution + (f("agent_turns") >= 3) + 0.5 * (questions >= 0.2)
+    empathy_score = 1.5 + 2.0 * empathy + 1.0 * apology + 0.5 * (questions >= 0.2)
+
+    # Reply speed; without timing (e.g. a single-message transcript) stay neutral
+    response = f("response_seconds_mean")
+    efficiency = np.select(
+        [f("responses_timed") == 0, response <= 20, response <= 45, response <= 90, response <= 180],
+        [3.0, 5.0, 4.0, 3.0, 2.0], default=1.0)
+    efficiency = efficiency - (f("agent_words_max") > 150)
+
+    scores = np.stack([professionalism, communication, problem_resolution, empathy_score, efficiency], axis=1)
+    scores = np.clip(np.rint(scores), 1, 5).astype(np.int64)
+    # Nothing from the agent to judge
+    scores[f("agent_turns") == 0] = 1
+    return scores
+
+
+class PreScore:
+    """Provisional result for one conversation"""
+
+    __slots__ = ("scores", "decision", "reason", "features")
+
+    def __init__(self, scores: Dict[str, int], decision: str, reason: str, features: Dict[str, float]):
+        self.scores = scores
+        self.decision = decision
+        self.reason = reason
+        self.features = features
+
+    @property
+    def total_score(self) -> int:
+        return sum(self.scores.values())
+
+    def to_dict(self) -> Dict:
+        return {
+            "scores": dict(self.scores),
+            "total_score": self.total_score,
+            "decision": self.decision,
+            "reason": self.reason,
+            "features": {k: round(v, 3) for k, v in self.features.items()},
+        }
+
+    def to_analysis(self) -> Dict:
+        """The provisional score in the shape analyze_interaction() returns"""
+        ranked = sorted(CRITERIA, key=lambda c: self.scores[c])
+        labels = {
+            "professionalism": "professional, courteous tone",
+            "communication": "clear, well-sized replies",
+            "problem_resolution": "concrete steps toward a resolution",
+            "empathy": "acknowledging the customer's feelings",
+            "efficiency": "prompt responses",
+        }
+        if self.features.get("agent_turns", 0) == 0:
+            feedback = "The agent did not reply to the customer, so there is nothing to evaluate yet."
+        else:
+            feedback = ("This conversation was too short for a full evaluation; these scores are "
+                        "estimated from the transcript. Continue the role-play for detailed feedback.")
+        return {
+            "scores": dict(self.scores),
+            "total_score": self.total_score,
+            "strengths": [f"Showed {labels[c]}" for c in reversed(ranked[-2:]) if self.scores[c] >= 4],
+            "improvements": [f"Work on {labels[c]}" for c in ranked[:2] if self.scores[c] <= 3],
+            "overall_feedback": feedback,
+            "provisional": True,
+            "evaluation": "skipped",
+        }
+
+
+class PreScorer:
+    """
+    Batch pre-scorer with the triage thresholds
+
+    Args:
+        min_agent_turns: Below this many agent replies the model evaluation is skipped
+        min_agent_words: Below this many agent words in total it is skipped as well
+        short_max_agent_turns: Up to this many agent replies the short rubric is used
+            (0 disables the short rubric)
+    """
+
+    def __init__(self, min_agent_turns: int = 2, min_agent_words: int = 8, short_max_agent_turns: int = 4):
+        self.min_agent_turns = min_agent_turns
+        self.min_agent_words = min_agent_words
+        self.short_max_agent_turns = short_max_agent_turns
+
+    def decide(self, features: np.ndarray):
+        """Vectorized triage: (decisions, reasons) arrays for a feature matrix"""
+        agent_turns = features[:, _F["agent_turns"]]
+        agent_words = features[:, _F["agent_words"]]
+        conditions = [
+            agent_turns == 0,
+            agent_turns < self.min_agent_turns,
+            agent_words < self.min_agent_words,
+            agent_turns <= self.short_max_agent_turns,
+        ]
+        decisions = np.select(conditions, [SKIP, SKIP, SKIP, SHORT], default=FULL)
+        reasons = np.select(conditions, ["no_agent_replies", "too_few_agent_turns", "too_few_agent_words",
+                                         "short_conversation"], default="")
+        return decisions, reasons
+
+    def score_batch(self, conversations: Sequence[Sequence[Union[Message, Dict]]]) -> List[PreScore]:
+        features = extract_features(conversations)
+        scores = provisional_scores(features)
+        decisions, reasons = self.decide(features)
+        return [
+            PreScore(dict(zip(CRITERIA, map(int, scores[i]))), str(decisions[i]), str(reasons[i]),
+                     dict(zip(FEATURES, map(float, features[i]))))
+            for i in range(len(conversations))
+        ]
+
+    def score(self, conversation: Sequence[Union[Message, Dict]]) -> PreScore:
+        return self.score_batch([conversation])[0]
@@ -0,0 +1,411 @@
+"""
+Replay recorded traffic traces against a local app and mock model backend
+
+LEARNING NOTES:
+===============
+traffic_recorder.py captures the SHAPE of real sessions (when conversations
+start, how long each turn is, how long trainees pause, which moods, how many
+tokens Cora replied with, which conversations get analyzed). This CLI plays
+those sessions back:
+
+1. **Mock model backend**: a local OpenAI-compatible endpoint that streams a
+   reply of the recorded length with a configurable latency model (time to
+   first token + time per token). No Azure, no cost, repeatable.
+2. **The app under test**: started here (python app.py pointed at the mock),
+   or any running instance given with --target.
+3. **Sessions**: every recorded conversation becomes one client - it logs in,
+   creates the conversation, sends its turns over Socket.IO with the recorded
+   pauses (divided by --speed) and requests the analysis if the original did.
+
+The report shows latency percentiles per event type next to the recorded
+ones. Save it with --json and compare a later run with --baseline to spot a
+performance regression under realistic traffic.
+
+USAGE (from the src/ folder):
+    python replay_traffic.py traces/*.trace --speed 10
+    python replay_traffic.py traces/*.trace --speed 1 --json before.json
+    python replay_traffic.py traces/*.trace --speed 10 --baseline before.json
+    python replay_traffic.py traces/*.trace --target http://localhost:5000 --mock-port 8089
+"""
+import argparse
+import json
+import os
+import re
+import socket
+import subprocess
+import sys
+import threading
+import time
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+from traffic_recorder import ANALYZE, NEW_CONVERSATION, SEND_MESSAGE, read_trace
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# The replayed message carries the recorded reply length to the mock backend
+_MARKER = "[replay completion_tokens={}] "
+_MARKER_RE = re.compile(r"\[replay completion_tokens=(\d+)\]")
+_FILLER = "lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor "
+
+_RUBRIC = json.dumps({
+    "scores": {"professionalism": 4, "communication": 4, "problem_resolution": 3, "empathy": 4, "efficiency": 4},
+    "total_score": 19,
+    "strengths": ["Replay"],
+    "improvements": ["Replay"],
+    "overall_feedback": "Replayed evaluation.",
+})
+
+
+# ============================================================================
+# Mock model backend
+# ============================================================================
+
+class MockModelHandler(BaseHTTPRequestHandler):
+    """OpenAI-compatible /chat/completions with a latency model (see MockModelServer)"""
+
+    protocol_version = "HTTP/1.0"
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length) or b"{}")
+        messages = body.get("messages") or []
+        prompt_chars = sum(len(m.get("content") or "") for m in messages)
+        last_user = next((m.get("content") or "" for m in reversed(messages) if m.get("role") == "user"), "")
+        marker = _MARKER_RE.search(last_user) if body.get("stream") else None
+        settings = self.server.settings
+
+        # Time to first token grows with the prompt (prefill)
+        time.sleep(settings["ttft"] + prompt_chars / 4 * settings["prefill"])
+        if body.get("stream"):
+            tokens = int(marker.group(1)) if marker else settings["default_tokens"]
+            self._stream(body.get("model", "mock"), tokens, prompt_chars // 4)
+        else:
+            tokens = settings["eval_tokens"]
+            time.sleep(tokens * settings["per_token"])
+            self._send_json({
+                "id": "replay", "object": "chat.completion", "created": int(time.time()),
+                "model": body.get("model", "mock"),
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": _RUBRIC}}],
+                "usage": {"prompt_tokens": prompt_chars // 4, "completion_tokens": tokens,
+                          "total_tokens": prompt_chars // 4 + tokens},
+            })
+
+    def _send_json(self, payload: Dict) -> None:
+        data = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _stream(self, model: str, tokens: int, prompt_tokens: int) -> None:
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+
+        def chunk(choices, usage=None):
+            payload = {"id": "replay", "object": "chat.completion.chunk", "created": int(time.time()),
+                       "model": model, "choices": choices, "usage": usage}
+            self.wfile.write(f"data: {json.dumps(payload)}\n\n".encode())
+            self.wfile.flush()
+
+        try:
+            for i in range(max(tokens, 1)):
+                if i:
+                    time.sleep(self.server.settings["per_token"])
+                chunk([{"index": 0, "delta": {"content": "word "}, "finish_reason": None}])
+            chunk([], {"prompt_tokens": prompt_tokens, "completion_tokens": tokens,
+                       "total_tokens": prompt_tokens + tokens})
+            self.wfile.write(b"data: [DONE]\n\n")
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # the app cancelled the generation (barge-in / disconnect)
+
+
+class MockModelServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, port: int, ttft_ms: float, per_token_ms: float, prefill_ms: float,
+                 eval_tokens: int, default_tokens: int = 60):
+        super().__init__(("127.0.0.1", port), MockModelHandler)
+        self.settings = {"ttft": ttft_ms / 1000, "per_token": per_token_ms / 1000,
+                         "prefill": prefill_ms / 1000, "eval_tokens": eval_tokens,
+                         "default_tokens": default_tokens}
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+
+# ============================================================================
+# Traces
+# ============================================================================
+
+def load_sessions(paths: List[str]) -> List[List[Dict]]:
+    """Events grouped by (anonymized) conversation, each session in time order"""
+    sessions: Dict[str, List[Dict]] = defaultdict(list)
+    for path in paths:
+        for event in read_trace(path):
+            sessions[event["c"]].append(event)
+    ordered = [sorted(events, key=lambda e: e["t"]) for events in sessions.values()]
+    return sorted(ordered, key=lambda events: events[0]["t"])
+
+
+def synthetic_message(event: Dict) -> str:
+    """A message with the recorded length that tells the mock how long a reply to produce"""
+    text = _MARKER.format(int(event.get("completion_tokens") or 60))
+    size = max(int(event.get("in_chars") or 40), len(text) + 1)
+    return (text + _FILLER * (size // len(_FILLER) + 1))[:size]
+
+
+# ============================================================================
+# Replay
+# ============================================================================
+
+class Results:
+    """Thread-safe latency samples per event type, with the recorded latencies alongside"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.recorded: Dict[str, List[float]] = defaultdict(list)
+        self.outcomes: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+
+    def add(self, event_type: str, outcome: str, latency_ms: Optional[float], recorded_ms: Optional[float]):
+        with self._lock:
+            self.outcomes[event_type][outcome] += 1
+            if latency_ms is not None and outcome == "ok":
+                self.latencies[event_type].append(latency_ms)
+            if recorded_ms is not None:
+                self.recorded[event_type].append(recorded_ms)
+
+
+def replay_session(target: str, events: List[Dict], start_at: float, trace_start: float, speed: float,
+                   username: str, password: str, timeout: float, results: Results) -> None:
+    """Play one recorded conversation: login, create, paced turns over Socket.IO, analysis"""
+    import requests
+    import socketio
+
+    http = requests.Session()
+    http.post(f"{target}/login/local", data={"username": username, "password": password},
+              allow_redirects=False, timeout=timeout)
+    client = socketio.Client(reconnection=False)
+    reply = threading.Event()
+    outcome = {"value": None}
+
+    def finished(kind):
+        def handler(data=None):
+            outcome["value"] = kind
+            reply.set()
+        return handler
+
+    for name, kind in (("message_response", "ok"), ("error", "error"), ("overloaded", "overloaded"),
+                       ("budget_exceeded", "budget"), ("generation_cancelled", "cancelled")):
+        client.on(name, finished(kind))
+
+    conversation_id = None
+    try:
+        for event in events:
+            # Keep the recorded pacing; a turn never starts before the previous reply arrived
+            delay = start_at + (event["t"] - trace_start) / speed - time.time()
+            if delay > 0:
+                time.sleep(delay)
+
+            if conversation_id is None or event["ev"] == NEW_CONVERSATION:
+                started = time.perf_counter()
+                response = http.post(f"{target}/api/conversation/new", json={"mood": event.get("mood", "neutral")},
+                                     timeout=timeout)
+                ok = response.ok and response.json().get("success")
+                results.add(NEW_CONVERSATION, "ok" if ok else f"http_{response.status_code}",
+                            (time.perf_counter() - started) * 1000, None)
+                if not ok:
+                    return
+                conversation_id = response.json()["conversation_id"]
+                cookie = "; ".join(f"{k}={v}" for k, v in http.cookies.items())
+                client.connect(target, headers={"Cookie": cookie}, wait_timeout=timeout)
+                if event["ev"] == NEW_CONVERSATION:
+                    continue
+
+            if event["ev"] == SEND_MESSAGE:
+                reply.clear()
+                outcome["value"] = None
+                started = time.perf_counter()
+                client.emit("send_message", {"conversation_id": conversation_id,
+                                             "message": synthetic_message(event),
+                                             "is_scenario_prompt": bool(event.get("scenario"))})
+                if not reply.wait(timeout):
+                    outcome["value"] = "timeout"
+                results.add(SEND_MESSAGE, outcome["value"], (time.perf_counter() - started) * 1000,
+                            event.get("latency_ms") if event.get("outcome") == "ok" else None)
+            elif event["ev"] == ANALYZE:
+                started = time.perf_counter()
+                response = http.post(f"{target}/api/conversation/{conversation_id}/analyze", timeout=timeout)
+                results.add(ANALYZE, "ok" if response.ok else f"http_{response.status_code}",
+                            (time.perf_counter() - started) * 1000,
+                            event.get("latency_ms") if event.get("outcome") == "ok" else None)
+    except Exception as e:
+        results.add("session", type(e).__name__, None, None)
+    finally:
+        if client.connected:
+            client.disconnect()
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_app(mock_url: str, ready_timeout: float):
+    """Start python app.py against the mock backend; returns (process, base URL)"""
+    import requests
+
+    port = _free_port()
+    env = dict(os.environ,
+               FLASK_PORT=str(port), FLASK_ENV="production",
+               AZURE_AI_FOUNDRY_ENDPOINT=mock_url, AZURE_AI_FOUNDRY_API_KEY="replay",
+               AZURE_STORAGE_CONNECTION_STRING="", AZURE_STORAGE_ACCOUNT_NAME="",
+               APPLICATIONINSIGHTS_CONNECTION_STRING="", TRAFFIC_RECORD_DIR="",
+               CONVERSATION_STORE_URL="", CONVERSATION_JOURNAL_DIR="")
+    process = subprocess.Popen([sys.executable, "app.py"], cwd=SRC_DIR, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base = f"http://127.0.0.1:{port}"
+    deadline = time.time() + ready_timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("app.py exited during startup")
+        try:
+            if requests.get(f"{base}/readyz", timeout=1).status_code == 200:
+                return process, base
+        except requests.RequestException:
+            pass
+        time.sleep(0.1)
+    process.terminate()
+    raise RuntimeError(f"app.py was not ready within {ready_timeout:.0f}s")
+
+
+# ============================================================================
+# Report
+# ============================================================================
+
+def _percentile(values: List[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def summarize(results: Results, wall_seconds: float, speed: float) -> Dict:
+    summary = {"speed": speed, "wall_seconds": round(wall_seconds, 2), "events": {}}
+    for event_type in sorted(set(results.latencies) | set(results.outcomes)):
+        values = results.latencies.get(event_type, [])
+        recorded = results.recorded.get(event_type, [])
+        summary["events"][event_type] = {
+            "count": sum(results.outcomes[event_type].values()),
+            "outcomes": dict(results.outcomes[event_type]),
+            "latency_ms": {q: _percentile(values, p) for q, p in (("p50", 0.5), ("p90", 0.9), ("p99", 0.99), ("max", 1.0))},
+            "recorded_ms": {q: _percentile(recorded, p) for q, p in (("p50", 0.5), ("p90", 0.9), ("p99", 0.99))},
+        }
+    return summary
+
+
+def _ms(value: Optional[float]) -> str:
+    return "-" if value is None else f"{value:.0f}"
+
+
+def print_report(summary: Dict, baseline: Optional[Dict]) -> None:
+    print(f"replayed at {summary['speed']}x in {summary['wall_seconds']}s")
+    print(f"{'event':<18}{'count':>7}{'p50 ms':>9}{'p90 ms':>9}{'p99 ms':>9}{'max ms':>9}"
+          f"{'rec p50':>9}{'rec p90':>9}  outcomes")
+    for event_type, stats in summary["events"].items():
+        latency, recorded = stats["latency_ms"], stats["recorded_ms"]
+        print(f"{event_type:<18}{stats['count']:>7}{_ms(latency['p50']):>9}{_ms(latency['p90']):>9}"
+              f"{_ms(latency['p99']):>9}{_ms(latency['max']):>9}{_ms(recorded['p50']):>9}"
+              f"{_ms(recorded['p90']):>9}  {stats['outcomes']}")
+        before = (baseline or {}).get("events", {}).get(event_type)
+        if before:
+            deltas = []
+            for q in ("p50", "p90", "p99"):
+                old, new = before["latency_ms"].get(q), latency.get(q)
+                if old and new:
+                    deltas.append(f"{q} {new - old:+.0f} ms ({(new - old) / old:+.0%})")
+            if deltas:
+                print(f"{'':<18}vs baseline: " + ", ".join(deltas))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay recorded traffic traces and report latency")
+    parser.add_argument("traces", nargs="+", help="Trace files written by TRAFFIC_RECORD_DIR")
+    parser.add_argument("--speed", type=float, default=1.0, help="Time compression (10 = ten times faster)")
+    parser.add_argument("--limit", type=int, help="Replay only the first N conversations")
+    parser.add_argument("--target", help="Running app to drive (default: start app.py against the mock)")
+    parser.add_argument("--username", default="user")
+    parser.add_argument("--password", default=os.getenv("LOCAL_USER_PASSWORD", "user123"))
+    parser.add_argument("--timeout", type=float, default=120.0, help="Seconds to wait for one reply")
+    parser.add_argument("--mock-port", type=int, default=0, help="Mock backend port (0 = any free port)")
+    parser.add_argument("--mock-ttft-ms", type=float, default=400.0, help="Mock time to first token")
+    parser.add_argument("--mock-token-ms", type=float, default=15.0, help="Mock time per generated token")
+    parser.add_argument("--mock-prefill-ms", type=float, default=0.05, help="Mock time per prompt token")
+    parser.add_argument("--mock-eval-tokens", type=int, default=250, help="Mock evaluation reply length")
+    parser.add_argument("--json", help="Write the summary to this file")
+    parser.add_argument("--baseline", help="Summary JSON of an earlier run to compare against")
+    args = parser.parse_args(argv)
+
+    sessions = load_sessions(args.traces)[:args.limit]
+    if not sessions:
+        print("no events in the given traces")
+        return 1
+    trace_start = sessions[0][0]["t"]
+    span = max(s[-1]["t"] for s in sessions) - trace_start
+    print(f"{len(sessions)} conversations, {sum(len(s) for s in sessions)} events, "
+          f"{span / 60:.1f} min recorded -> ~{span / args.speed / 60:.1f} min at {args.speed}x")
+
+    mock = MockModelServer(args.mock_port, args.mock_ttft_ms, args.mock_token_ms,
+                           args.mock_prefill_ms, args.mock_eval_tokens)
+    threading.Thread(target=mock.serve_forever, name="mock-model", daemon=True).start()
+    print(f"mock model backend at {mock.url}")
+
+    process = None
+    target = args.target
+    if not target:
+        process, target = start_app(mock.url, ready_timeout=60)
+        print(f"app under test at {target}")
+
+    results = Results()
+    start_at = time.time() + 1.0
+    threads = [
+        threading.Thread(target=replay_session, daemon=True,
+                         args=(target, events, start_at, trace_start, args.speed, args.username,
+                               args.password, args.timeout, results))
+        for events in sessions
+    ]
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=10)
+        mock.shutdown()
+
+    summary = summarize(results, time.time() - start_at, args.speed)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_report(summary, baseline)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,49 @@
+"""
+Live score updates for open analytics dashboards
+
+LEARNING NOTES:
+===============
+The analytics panel used to learn about a new score only by re-fetching
+/api/user/scores, which re-runs the partition query in get_user_scores and
+redraws the whole chart. Instead, save_conversation_score publishes every
+saved score to the owner's Socket.IO room ("scores:<identity>"), and an open
+dashboard appends the point in place - no HTTP request, no Table query.
+
+Event format ("score_update"), deliberately compact:
+
+    {"v": 1, "id": "<conversation_id>", "t": "2025-01-01T12:00:00.123456",
+     "s": [total, professionalism, communication, problem_resolution, empathy, efficiency],
+     "n": <message_count>}
+
+KEY CONCEPTS:
+- **Mergeable**: an event is an upsert keyed by conversation id, ordered by
+  "t". Applying the same event twice, or events out of order, converges on
+  the same list, so a client can merge pushes with an HTTP (re)load freely
+- **Scores as a positional array** in SCORE_FIELDS order: the field names
+  are not repeated in every event
+- Rooms work across replicas when SOCKETIO_MESSAGE_QUEUE is set, so the
+  dashboard gets the event whichever replica saved the score
+- Polling /api/user/scores stays as the fallback while the socket is down
+"""
+from typing import Dict
+
+EVENT = "score_update"
+VERSION = 1
+
+SCORE_FIELDS = ("total_score", "professionalism", "communication", "problem_resolution", "empathy", "efficiency")
+
+
+def score_room(user_identity: str) -> str:
+    """Socket.IO room of one user's dashboards (identities are case-insensitive)"""
+    return f"scores:{user_identity.lower()}"
+
+
+def score_delta(entity: Dict) -> Dict:
+    """Compact, mergeable event for one conversationscores entity"""
+    return {
+        "v": VERSION,
+        "id": entity["RowKey"],
+        "t": entity.get("created_at", ""),
+        "s": [entity.get(field, 0) for field in SCORE_FIELDS],
+        "n": entity.get("message_count", 0),
+    }
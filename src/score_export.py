@@ -0,0 +1,133 @@
+"""
+Streaming export of conversation scores as NDJSON or CSV
+
+LEARNING NOTES:
+===============
+The dashboard reads one user's partition at a time, and get_user_scores
+materializes and sorts the whole partition. That is fine for a dozen rows and
+useless for "give me every score from last quarter" over millions of rows.
+
+An export here is a pipeline of generators, so memory stays constant no
+matter how many rows the table holds:
+
+    StorageService.iter_score_pages()   one Table page (<= 1000 rows) at a time,
+            |                           following continuation tokens
+    export_rows()                       entity -> flat row
+            |
+    encode_ndjson() / encode_csv()      rows -> ~64 KB text chunks
+            |
+    gzip_chunks()                       optional on-the-fly gzip (one compressor,
+                                        no buffering of the whole output)
+
+The /api/admin/scores/export endpoint sends the chunks as a chunked HTTP
+response; export_scores.py writes them to a file and can resume an
+interrupted export from the last page's continuation token.
+
+KEY CONCEPTS:
+- Filters are pushed down to Table Storage: a user is a PartitionKey match
+  (one partition), dates are a range on the ISO created_at string
+- Table Storage returns rows in PartitionKey/RowKey order, not by date; sort
+  downstream if you need chronological order
+- Strengths/improvements are lists in NDJSON and JSON strings in CSV
+"""
+import csv
+import io
+import json
+import zlib
+from typing import Dict, Iterable, Iterator, List, Optional
+
+CRITERIA = ("professionalism", "communication", "problem_resolution", "empathy", "efficiency")
+
+EXPORT_FIELDS = (
+    "user_identity", "conversation_id", "created_at", "auth_method", "message_count", "total_score",
+) + CRITERIA + ("strengths", "improvements", "overall_feedback")
+
+# Properties requested from Table Storage (the keys back-fill rows written before
+# user_identity / conversation_id were stored as columns)
+SELECT_FIELDS = ["PartitionKey", "RowKey"] + list(EXPORT_FIELDS)
+
+FORMATS = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+CHUNK_BYTES = 64 * 1024
+
+
+def build_filter(user_identity: Optional[str] = None, since: Optional[str] = None,
+                 until: Optional[str] = None) -> Optional[str]:
+    """OData filter for a user and/or created_at range [since, until); None = whole table"""
+    def quote(value: str) -> str:
+        return "'" + value.replace("'", "''") + "'"
+
+    clauses = []
+    if user_identity:
+        clauses.append(f"PartitionKey eq {quote(user_identity.lower())}")
+    if since:
+        clauses.append(f"created_at ge {quote(since)}")
+    if until:
+        clauses.append(f"created_at lt {quote(until)}")
+    return " and ".join(clauses) or None
+
+
+def export_row(entity: Dict, decode_lists: bool = True) -> Dict:
+    """Flatten one conversationscores entity into an export row"""
+    row = {field: entity.get(field) for field in EXPORT_FIELDS}
+    row["user_identity"] = row["user_identity"] or entity.get("PartitionKey")
+    row["conversation_id"] = row["conversation_id"] or entity.get("RowKey")
+    if decode_lists:
+        for field in ("strengths", "improvements"):
+            try:
+                row[field] = json.loads(row[field]) if row[field] else []
+            except ValueError:
+                pass  # keep a malformed value as the raw string
+    return row
+
+
+def export_rows(pages: Iterable[List[Dict]], decode_lists: bool = True) -> Iterator[Dict]:
+    for page in pages:
+        for entity in page:
+            yield export_row(entity, decode_lists)
+
+
+def encode_ndjson(rows: Iterable[Dict]) -> Iterator[str]:
+    """One JSON object per line, yielded in ~CHUNK_BYTES chunks"""
+    buffer, size = [], 0
+    for row in rows:
+        line = json.dumps(row, ensure_ascii=False, separators=(",", ":")) + "\n"
+        buffer.append(line)
+        size += len(line)
+        if size >= CHUNK_BYTES:
+            yield "".join(buffer)
+            buffer, size = [], 0
+    if buffer:
+        yield "".join(buffer)
+
+
+def encode_csv(rows: Iterable[Dict], header: bool = True) -> Iterator[str]:
+    """CSV with an EXPORT_FIELDS header, yielded in ~CHUNK_BYTES chunks"""
+    out = io.StringIO()
+    writer = csv.DictWriter(out, fieldnames=EXPORT_FIELDS, extrasaction="ignore")
+    if header:
+        writer.writeheader()
+    for row in rows:
+        writer.writerow(row)
+        if out.tell() >= CHUNK_BYTES:
+            yield out.getvalue()
+            out.seek(0)
+            out.truncate()
+    if out.tell():
+        yield out.getvalue()
+
+
+def encode(rows: Iterable[Dict], fmt: str, header: bool = True) -> Iterator[str]:
+    if fmt == "csv":
+        return encode_csv(rows, header=header)
+    return encode_ndjson(rows)
+
+
+def gzip_chunks(chunks: Iterable[str], level: int = 6) -> Iterator[bytes]:
+    """Gzip a text stream on the fly (wbits=31 writes the gzip header and trailer)"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode("utf-8"))
+        if data:
+            yield data
+    yield compressor.flush()
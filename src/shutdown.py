@@ -0,0 +1,188 @@
+"""
+Graceful drain on SIGTERM for zero-drop rolling deploys
+
+LEARNING NOTES:
+===============
+When Container Apps scales in or rolls to a new revision, it sends SIGTERM
+and kills the container after the termination grace period (30s by default).
+Without a handler, the process dies at once: a trainee loses the reply they
+were waiting for, and an analysis finishes nowhere - its score is never written.
+
+The ShutdownCoordinator turns SIGTERM into a drain:
+
+1. **Stop taking work**: /readyz turns 503 so the ingress stops routing here;
+   new conversations and new turns are refused (clients go elsewhere)
+2. **Tell clients**: a `server_draining` event asks every connected browser
+   to reconnect - it waits for a reply it is expecting, then reconnects with a
+   random jitter so the other replicas aren't hit all at once
+3. **Finish in-flight work**: turns and analyses already running get until
+   SHUTDOWN_DRAIN_SECONDS to complete
+4. **Flush buffers**: usage ledger, traffic traces and the conversation
+   journal are flushed in order, then the log writer, then the process exits
+
+KEY CONCEPTS:
+- Work is counted per kind ("turn", "analysis") with track()/tracked(); the
+  drain waits on a condition, not a sleep loop, so it ends the moment the
+  last piece of work does
+- The drain report (duration, work finished vs dropped per kind, flush
+  results) is logged as `drain_complete`
+- Keep SHUTDOWN_DRAIN_SECONDS below the platform's grace period, leaving
+  time for the flushes; a second signal skips the drain and exits at once
+"""
+import os
+import signal
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from typing import Callable, Dict, List, Optional, Tuple
+
+from log_service import get_logger, shutdown_logging
+
+log = get_logger("shutdown")
+
+# Kinds of tracked work
+TURN = "turn"
+ANALYSIS = "analysis"
+
+
+class ShutdownCoordinator:
+    """
+    Counts in-flight work and drains it before the process exits
+
+    Args:
+        drain_seconds: Deadline for in-flight work once the drain starts
+        notify_clients: Called once when the drain starts (e.g. broadcast
+                        `server_draining` over Socket.IO)
+    """
+
+    def __init__(self, drain_seconds: float = 25.0, notify_clients: Optional[Callable[[], None]] = None):
+        self.drain_seconds = drain_seconds
+        self.notify_clients = notify_clients
+        self._cond = threading.Condition()
+        self._in_flight: Dict[str, int] = {}
+        self._finished_while_draining: Dict[str, int] = {}
+        self._flushers: List[Tuple[str, Callable[[], None]]] = []
+        self._draining_since: Optional[float] = None
+        self.report: Optional[Dict] = None
+
+    @property
+    def draining(self) -> bool:
+        return self._draining_since is not None
+
+    # ------------------------------------------------------------------
+    # Work tracking
+    # ------------------------------------------------------------------
+    @contextmanager
+    def track(self, kind: str):
+        """Count a piece of work as in flight for the duration of the block"""
+        with self._cond:
+            self._in_flight[kind] = self._in_flight.get(kind, 0) + 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._in_flight[kind] -= 1
+                if self.draining:
+                    self._finished_while_draining[kind] = self._finished_while_draining.get(kind, 0) + 1
+                self._cond.notify_all()
+
+    def tracked(self, kind: str):
+        """Decorator form of track() for route and event handlers"""
+        def decorator(fn):
+            @wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.track(kind):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def in_flight(self) -> Dict[str, int]:
+        with self._cond:
+            return {kind: count for kind, count in self._in_flight.items() if count}
+
+    def add_flusher(self, name: str, flush: Callable[[], None]) -> None:
+        """Register a buffer flush to run after the drain (in registration order)"""
+        self._flushers.append((name, flush))
+
+    # ------------------------------------------------------------------
+    # Drain
+    # ------------------------------------------------------------------
+    def begin_drain(self, reason: str = "sigterm") -> bool:
+        """Stop accepting work; returns False if a drain was already under way"""
+        with self._cond:
+            if self.draining:
+                return False
+            self._draining_since = time.monotonic()
+            in_flight = {kind: count for kind, count in self._in_flight.items() if count}
+        log.info("drain_started", reason=reason, in_flight=in_flight, deadline_seconds=self.drain_seconds)
+        if self.notify_clients is not None:
+            try:
+                self.notify_clients()
+            except Exception as e:
+                log.error("drain_notify_failed", error=str(e))
+        return True
+
+    def drain(self, reason: str = "sigterm") -> Dict:
+        """Begin draining, wait for in-flight work (up to the deadline), flush; returns the report"""
+        self.begin_drain(reason)
+        deadline = self._draining_since + self.drain_seconds
+        with self._cond:
+            while any(self._in_flight.values()):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            dropped = {kind: count for kind, count in self._in_flight.items() if count}
+            finished = dict(self._finished_while_draining)
+        drained_at = time.monotonic()
+
+        flushed = {}
+        for name, flush in self._flushers:
+            started = time.monotonic()
+            try:
+                flush()
+                flushed[name] = round(time.monotonic() - started, 3)
+            except Exception as e:
+                flushed[name] = f"error: {e}"
+
+        self.report = {
+            "reason": reason,
+            "drain_seconds": round(drained_at - self._draining_since, 3),
+            "total_seconds": round(time.monotonic() - self._draining_since, 3),
+            "finished": finished,
+            "dropped": dropped,
+            "flushed": flushed,
+        }
+        if dropped:
+            log.warning("drain_complete", **self.report)
+        else:
+            log.info("drain_complete", **self.report)
+        return self.report
+
+    def install(self, on_drained: Optional[Callable[[], None]] = None,
+                signals=(signal.SIGTERM, signal.SIGINT)) -> None:
+        """
+        Drain on SIGTERM/SIGINT, then exit the process
+
+        Args:
+            on_drained: Runs after the drain and flushes (defaults to os._exit(0);
+                        atexit handlers are not run - register flushers instead)
+        """
+        def exit_after_drain(reason):
+            self.drain(reason)
+            shutdown_logging()  # last: the drain report must reach the log
+            (on_drained or (lambda: os._exit(0)))()
+
+        def handle(signum, frame):
+            name = signal.Signals(signum).name.lower()
+            if self.draining:
+                # Second signal: the operator wants out now
+                log.warning("drain_aborted", signal=name, in_flight=self.in_flight())
+                shutdown_logging()
+                os._exit(1)
+            # The drain blocks; never block inside a signal handler
+            threading.Thread(target=exit_after_drain, args=(name,), name="shutdown-drain", daemon=True).start()
+
+        for sig in signals:
+            signal.signal(sig, handle)
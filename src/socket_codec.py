@@ -0,0 +1,168 @@
+"""
+Compact binary Socket.IO payloads, negotiated per socket
+
+LEARNING NOTES:
+===============
+Every `message_response` used to be a JSON text frame carrying the whole agent
+message plus a `metadata` block whose agent_name and model never change within
+a session. A client that supports it now opts in to a binary encoding right
+after connecting:
+
+    client -> negotiate {"codecs": ["msgpack", "json"], "compression": ["deflate"]}
+    server -> ack       {"codec": "msgpack", "compression": "deflate", "threshold": 1024}
+
+From then on, events that carry messages (message_response, messages_sync)
+are sent to that socket as ONE binary attachment instead of JSON text:
+
+    +---------+--------------------------------------+
+    | flags u8| msgpack (or JSON) body, maybe zlib'd |
+    +---------+--------------------------------------+
+
+    flags: bit 0 = deflated, bit 1 = msgpack (else UTF-8 JSON)
+
+The flags make every payload self-describing, so a payload that overtakes
+the negotiate ack can still be decoded.
+
+1. **msgpack**: smaller than JSON for numbers and short keys, and parsed
+   without building intermediate strings. Falls back to a binary JSON body
+   when the msgpack package is not installed
+2. **Deflate above a threshold**: bodies of at least `threshold` bytes are
+   zlib-compressed (flag bit 0) if that makes them smaller. Small events skip
+   it - compressing 200 bytes costs CPU and saves almost nothing
+3. **Static metadata once**: agent_name and model are sent the first time (and
+   again only if they change); the client keeps them for the session
+
+KEY CONCEPTS:
+- Why not the WebSocket permessage-deflate extension? It compresses every
+  frame with a per-connection zlib context (tens of KB of memory per socket)
+  and cannot skip small frames; here the threshold decides per event
+- Why not a server-wide msgpack Socket.IO serializer? Every client would have
+  to switch at once; negotiating per socket keeps the JSON path for old
+  clients, other events and the REST API unchanged
+- Clients may send `send_message` packed the same way; decoded bodies are
+  capped at MAX_DECODED_BYTES so a tiny compressed payload can't expand into
+  gigabytes
+"""
+import json
+import zlib
+from typing import Dict, List, Optional
+
+try:
+    import msgpack
+except ImportError:  # Optional: without it sessions negotiate the binary JSON codec
+    msgpack = None
+
+CODEC_MSGPACK = "msgpack"
+CODEC_JSON = "json"
+COMPRESSION_DEFLATE = "deflate"
+
+FLAG_DEFLATE = 0x01
+FLAG_MSGPACK = 0x02
+
+# Metadata that is the same for every message of a session
+STATIC_METADATA_KEYS = ("agent_name", "model")
+
+# Largest body a client payload may decompress to
+MAX_DECODED_BYTES = 1024 * 1024
+
+_MISSING = object()
+
+
+def supported_codecs() -> List[str]:
+    """Codecs this server can speak, preferred first"""
+    return ([CODEC_MSGPACK] if msgpack is not None else []) + [CODEC_JSON]
+
+
+def pack(obj, codec: str) -> bytes:
+    if codec == CODEC_MSGPACK:
+        return msgpack.packb(obj, use_bin_type=True)
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def unpack(data: bytes, codec: str):
+    if codec == CODEC_MSGPACK:
+        return msgpack.unpackb(data, raw=False)
+    return json.loads(data)
+
+
+class SessionCodec:
+    """Encoding chosen by one socket, and the static metadata it has been sent"""
+
+    def __init__(self, codec: str, deflate: bool = False, threshold: int = 1024, level: int = 6):
+        self.codec = codec
+        self.deflate = deflate
+        self.threshold = threshold
+        self.level = level
+        self._sent_metadata: Dict = {}
+
+    def describe(self) -> Dict:
+        """The negotiate ack"""
+        return {
+            "codec": self.codec,
+            "compression": COMPRESSION_DEFLATE if self.deflate else None,
+            "threshold": self.threshold,
+        }
+
+    def encode(self, obj) -> bytes:
+        body = pack(obj, self.codec)
+        flags = FLAG_MSGPACK if self.codec == CODEC_MSGPACK else 0
+        if self.deflate and len(body) >= self.threshold:
+            compressed = zlib.compress(body, self.level)
+            if len(compressed) < len(body):
+                body, flags = compressed, flags | FLAG_DEFLATE
+        return bytes((flags,)) + body
+
+    def decode(self, data: bytes):
+        if not data:
+            raise ValueError("empty payload")
+        flags, body = data[0], data[1:]
+        if flags & FLAG_DEFLATE:
+            inflater = zlib.decompressobj()
+            body = inflater.decompress(body, MAX_DECODED_BYTES)
+            if inflater.unconsumed_tail:
+                raise ValueError("payload too large")
+        elif len(body) > MAX_DECODED_BYTES:
+            raise ValueError("payload too large")
+        if flags & FLAG_MSGPACK and msgpack is None:
+            raise ValueError("msgpack payload, but msgpack is not installed")
+        return unpack(body, CODEC_MSGPACK if flags & FLAG_MSGPACK else CODEC_JSON)
+
+    def encode_event(self, payload: Dict) -> bytes:
+        """Encode an event carrying "message" or "messages", without static metadata already sent"""
+        compact = dict(payload)
+        if "message" in compact:
+            compact["message"] = self._compact_message(compact["message"])
+        if "messages" in compact:
+            compact["messages"] = [self._compact_message(m) for m in compact["messages"]]
+        return self.encode(compact)
+
+    def _compact_message(self, message: Dict) -> Dict:
+        metadata = message.get("metadata")
+        if not metadata:
+            return message
+        compact = {}
+        for key, value in metadata.items():
+            if key in STATIC_METADATA_KEYS:
+                if self._sent_metadata.get(key, _MISSING) == value:
+                    continue
+                self._sent_metadata[key] = value
+            compact[key] = value
+        return dict(message, metadata=compact)
+
+
+def negotiate(offer: Dict, threshold: int = 1024) -> Optional[SessionCodec]:
+    """
+    Pick the first codec in the client's preference list that this server supports
+
+    Args:
+        offer: {"codecs": [...], "compression": [...]} from the client
+
+    Returns:
+        The session's codec, or None to keep plain JSON events
+    """
+    codecs = offer.get("codecs") or []
+    codec = next((c for c in codecs if c in supported_codecs()), None)
+    if codec is None:
+        return None
+    deflate = COMPRESSION_DEFLATE in (offer.get("compression") or [])
+    return SessionCodec(codec, deflate=deflate, threshold=threshold)
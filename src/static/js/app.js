@@ -1,9 +1,31 @@
 // Voice Agent Simulator - Client Application
 
+// Order of the scores in a pushed score_update event (see score_events.py);
+// also the order of the chart datasets
+const SCORE_FIELDS = ['total_score', 'professionalism', 'communication', 'problem_resolution', 'empathy', 'efficiency'];
+const SCORE_HISTORY_LIMIT = 20;
+const SCORE_POLL_INTERVAL_MS = 30000;
+
+// Binary message events (see socket_codec.py): a flags byte, then a msgpack or JSON body
+const CODEC_FLAG_DEFLATE = 0x01;
+const CODEC_FLAG_MSGPACK = 0x02;
+// Metadata the server sends once per session instead of with every message
+const STATIC_METADATA_KEYS = ['agent_name', 'model'];
+
 class VoiceAgentSimulator {
     constructor() {
         this.socket = null;
         this.currentConversationId = null;
+        this.lastSeq = 0; // Sequence number of the newest message this client has
+        this.hasConnected = false;
+        this.codec = null; // Binary codec negotiated for this connection (null = JSON events)
+        this.sessionMetadata = {};
+        this.inbound = Promise.resolve(); // Packed events are decoded in arrival order
+        this.scoreHistory = null; // Dashboard scores, oldest first (null until first opened)
+        this.scorePollTimer = null;
+        this.serverDraining = false; // The replica is shutting down: reconnect once idle
+        this.lastSentTurn = null;
+        this.pendingResend = null; // A turn the draining replica refused
         this.messages = [];
         this.voiceEnabled = false;
         this.isListening = false;
@@ -25,6 +47,44 @@ class VoiceAgentSimulator {
         this.loadUserIdentity();
         this.populateVoiceOptions();
         this.initializeTheme();
+        this.resumeConversation();
+    }
+
+    async resumeConversation() {
+        // After a reload (or a server restart / deploy) continue the same role-play
+        const conversationId = sessionStorage.getItem('cora.conversationId');
+        if (!conversationId) return;
+        
+        try {
+            const response = await fetch(`/api/conversation/${conversationId}/messages`);
+            if (!response.ok) {
+                sessionStorage.removeItem('cora.conversationId');
+                return;
+            }
+            const data = await response.json();
+            this.currentConversationId = conversationId;
+            this.lastSeq = data.last_seq || 0;
+            this.messages = [];
+            this.clearChatMessages();
+            data.messages.forEach(m => this.addMessage(m.role, m.content, m.timestamp));
+            this.enableChatInput();
+            this.updateConversationId();
+            this.addSystemMessage('Conversation restored. You can continue where you left off.');
+            // Bind this socket to the conversation, or the server releases it after
+            // the old socket's grace period (if not connected yet, 'connect' does it)
+            if (this.socket.connected) {
+                this.emitResume();
+            }
+        } catch (error) {
+            console.error('Failed to resume conversation:', error);
+        }
+    }
+
+    emitResume() {
+        this.socket.emit('resume', {
+            conversation_id: this.currentConversationId,
+            last_seq: this.lastSeq
+        });
     }
 
     populateVoiceOptions() {
@@ -69,26 +129,140 @@ class VoiceAgentSimulator {
     }
 
     connectSocket() {
-        this.socket = io();
+        // WebSocket-only transport: long-polling needs sticky sessions once the
+        // app runs on more than one replica, a WebSocket stays on one replica
+        this.socket = io({ transports: ['websocket'] });
         
         this.socket.on('connect', () => {
             console.log('Connected to server');
             this.updateStatus('Connected');
+            this.negotiateCodec();
+            
+            // After a reconnect (or a restore that finished before the first connect)
+            // re-attach to the conversation and fetch only the messages sent meanwhile
+            if (this.currentConversationId) {
+                this.emitResume();
+            }
+            if (this.pendingResend) {
+                this.socket.emit('send_message', this.encodePayload(this.pendingResend));
+                this.pendingResend = null;
+            }
+            // Score pushes may have been missed while disconnected
+            if (this.hasConnected && this.scoreHistory && this.isAnalyticsOpen()) {
+                this.refreshScores();
+            }
+            this.hasConnected = true;
         });
 
         this.socket.on('disconnect', () => {
             console.log('Disconnected from server');
             this.updateStatus('Disconnected');
+            this.codec = null; // Negotiated again on the next connection
         });
 
-        this.socket.on('message_response', (data) => {
+        this.onPacked('message_response', (data) => {
             this.handleMessageResponse(data);
         });
 
+        this.socket.on('message_accepted', (data) => {
+            if (data.conversation_id === this.currentConversationId) {
+                this.lastSeq = Math.max(this.lastSeq, data.seq);
+            }
+        });
+
+        this.onPacked('messages_sync', (data) => {
+            this.handleMessagesSync(data);
+        });
+
+        // Rolling deploy / scale-in: this replica is draining
+        this.socket.on('server_draining', (data) => {
+            this.handleServerDraining(data);
+        });
+
+        // New scores for this user's dashboard (pushed instead of polled)
+        this.socket.on('score_update', (delta) => {
+            this.handleScoreUpdate(delta);
+        });
+
         this.socket.on('error', (data) => {
             this.showError(data.message);
             this.hideLoading();
         });
+
+        // Backpressure: the turn is waiting for a free slot
+        this.socket.on('queued', (data) => {
+            this.updateStatus(`Queued (position ${data.position}, ~${Math.ceil(data.estimated_wait_seconds)}s)`);
+        });
+
+        // Load shedding: the server is too busy to answer within its SLO
+        this.socket.on('overloaded', (data) => {
+            this.showError(`Cora is busy right now - please try again in ${data.retry_after}s`);
+            this.hideLoading();
+        });
+    }
+
+    negotiateCodec() {
+        // Offer what this browser can decode; the server's choice comes back as the ack
+        const offer = {
+            codecs: typeof MessagePack !== 'undefined' ? ['msgpack', 'json'] : ['json'],
+            compression: typeof DecompressionStream !== 'undefined' ? ['deflate'] : []
+        };
+        this.socket.emit('negotiate', offer, (reply) => {
+            this.codec = reply && reply.codec ? reply : null;
+        });
+    }
+
+    onPacked(event, handler) {
+        // Payloads may be JSON objects or packed ArrayBuffers; decoding is async
+        // (decompression), so events are chained to keep their order
+        this.socket.on(event, (data) => {
+            this.inbound = this.inbound
+                .then(() => this.decodePayload(data))
+                .then(handler)
+                .catch(error => console.error(`Failed to handle ${event}:`, error));
+        });
+    }
+
+    async decodePayload(data) {
+        if (!(data instanceof ArrayBuffer)) return data;
+        
+        const bytes = new Uint8Array(data);
+        let body = bytes.subarray(1);
+        if (bytes[0] & CODEC_FLAG_DEFLATE) {
+            const stream = new Blob([body]).stream().pipeThrough(new DecompressionStream('deflate'));
+            body = new Uint8Array(await new Response(stream).arrayBuffer());
+        }
+        const payload = (bytes[0] & CODEC_FLAG_MSGPACK)
+            ? MessagePack.decode(body)
+            : JSON.parse(new TextDecoder().decode(body));
+        
+        // Static metadata is only sent when it changes: fill it back in
+        const messages = payload.messages || (payload.message ? [payload.message] : []);
+        messages.forEach(m => {
+            if (!m.metadata) return;
+            STATIC_METADATA_KEYS.forEach(key => {
+                if (key in m.metadata) this.sessionMetadata[key] = m.metadata[key];
+            });
+            m.metadata = { ...this.sessionMetadata, ...m.metadata };
+        });
+        return payload;
+    }
+
+    encodePayload(data) {
+        // Packed like the server's events once a codec is negotiated (no compression:
+        // client payloads are small)
+        if (!this.codec) return data;
+        if (this.codec.codec === 'msgpack') {
+            const body = MessagePack.encode(data);
+            const packed = new Uint8Array(body.length + 1);
+            packed[0] = CODEC_FLAG_MSGPACK;
+            packed.set(body, 1);
+            return packed;
+        }
+        const body = new TextEncoder().encode(JSON.stringify(data));
+        const packed = new Uint8Array(body.length + 1);
+        packed.set(body, 1);
+        return packed;
     }
 
     setupEventListeners() {
@@ -680,6 +854,8 @@ class VoiceAgentSimulator {
             if (data.success) {
                 // Clear the previous conversation ID now
                 this.currentConversationId = data.conversation_id;
+                sessionStorage.setItem('cora.conversationId', data.conversation_id);
+                this.lastSeq = 0;
                 this.messages = [];
                 this.conversationVoice = null; // Reset voice lock for new conversation
                 this.isPaused = false;
@@ -727,19 +903,24 @@ class VoiceAgentSimulator {
         }
         
         // Send to server via WebSocket
-        this.socket.emit('send_message', {
+        this.lastSentTurn = {
             conversation_id: this.currentConversationId,
             message: message,
             is_scenario_prompt: isScenarioPrompt
-        });
+        };
+        this.socket.emit('send_message', this.encodePayload(this.lastSentTurn));
         
         this.showLoading();
     }
 
     handleMessageResponse(data) {
         this.hideLoading();
+        this.updateStatus('Connected');
         
         if (data.conversation_id === this.currentConversationId) {
+            // Already delivered by a resync after a reconnect
+            if (data.message.seq && data.message.seq <= this.lastSeq) return;
+            this.lastSeq = data.message.seq || this.lastSeq;
             this.addMessage('assistant', data.message.content, data.message.timestamp);
             
             // Speak the AI response if auto-speak is enabled (independent of voice mode)
@@ -752,6 +933,22 @@ class VoiceAgentSimulator {
         }
     }
 
+    handleMessagesSync(data) {
+        if (data.conversation_id !== this.currentConversationId) return;
+        
+        // Only messages newer than our cursor are added
+        const missed = data.messages.filter(m => m.seq > this.lastSeq);
+        this.lastSeq = Math.max(this.lastSeq, data.last_seq);
+        missed.forEach(m => this.addMessage(m.role, m.content, m.timestamp));
+        
+        if (missed.length && missed[missed.length - 1].role === 'assistant') {
+            this.hideLoading();
+            if (this.messages.length >= 2) {
+                document.getElementById('analyze-conversation').disabled = false;
+            }
+        }
+    }
+
     addMessage(role, content, timestamp = null) {
         this.messages.push({ role, content, timestamp: timestamp || new Date().toISOString() });
         
@@ -901,6 +1098,23 @@ class VoiceAgentSimulator {
         console.log('Analyzing conversation:', this.currentConversationId);
         this.showLoading();
         
+        // Show the instant heuristic score while the full evaluation runs
+        let analysisDone = false;
+        fetch(`/api/conversation/${this.currentConversationId}/prescore`)
+            .then(response => response.ok ? response.json() : null)
+            .then(data => {
+                if (data && data.success && !analysisDone) {
+                    this.hideLoading();
+                    this.displayAnalysis({
+                        scores: data.prescore.scores,
+                        total_score: data.prescore.total_score,
+                        provisional: true,
+                        overall_feedback: 'Provisional score estimated from the transcript. The detailed evaluation is on its way...'
+                    });
+                }
+            })
+            .catch(() => {});
+        
         try {
             const response = await fetch(`/api/conversation/${this.currentConversationId}/analyze`, {
                 method: 'POST',
@@ -931,6 +1145,7 @@ class VoiceAgentSimulator {
             console.error('Error analyzing conversation:', error);
             this.showError('Error analyzing conversation: ' + error.message);
         } finally {
+            analysisDone = true;
             this.hideLoading();
         }
     }
@@ -951,7 +1166,7 @@ class VoiceAgentSimulator {
             <div class="analysis-header">
                 <div class="total-score-card">
                     <div class="score-display">${totalScore}/25</div>
-                    <div class="score-label">Total Score</div>
+                    <div class="score-label">${analysis.provisional ? 'Provisional Score' : 'Total Score'}</div>
                 </div>
             </div>
             
@@ -1067,6 +1282,30 @@ class VoiceAgentSimulator {
 
     hideLoading() {
         document.getElementById('loading-overlay').classList.remove('active');
+        // The reply we were waiting for has arrived: now leave the draining replica
+        if (this.serverDraining) {
+            this.reconnectElsewhere();
+        }
+    }
+
+    handleServerDraining(data) {
+        if (data.conversation_id) {
+            // Our turn was refused: send it again once connected to another replica
+            this.pendingResend = this.lastSentTurn;
+        } else if (document.getElementById('loading-overlay').classList.contains('active')) {
+            // A reply is still being generated here: reconnect after it arrives
+            this.serverDraining = true;
+            return;
+        }
+        this.reconnectElsewhere();
+    }
+
+    reconnectElsewhere() {
+        this.serverDraining = false;
+        this.updateStatus('Reconnecting...');
+        this.socket.disconnect();
+        // Jitter so every client of the replica doesn't reconnect at the same instant
+        setTimeout(() => this.socket.connect(), 500 + Math.random() * 2500);
     }
 
     showError(message) {
@@ -1086,156 +1325,232 @@ class VoiceAgentSimulator {
         content.style.display = 'none';
         
         try {
-            // Fetch user scores
-            console.log('Fetching user scores from /api/user/scores');
-            const response = await fetch('/api/user/scores?limit=20');
-            const data = await response.json();
-            
-            console.log('API Response:', data);
-            console.log('User Identity:', data.user_identity);
-            console.log('Scores Count:', data.scores ? data.scores.length : 0);
-            
-            if (!data.success || !data.scores || data.scores.length === 0) {
-                console.warn('No scores found for user');
-                loading.style.display = 'none';
-                content.style.display = 'block';
-                noData.style.display = 'block';
-                return;
-            }
-            
-            const scores = data.scores.reverse(); // Oldest to newest for chart
-            
-            // Calculate summary stats
-            const totalConversations = scores.length;
-            const avgScore = (scores.reduce((sum, s) => sum + s.total_score, 0) / totalConversations).toFixed(1);
-            const bestScore = Math.max(...scores.map(s => s.total_score));
-            
-            // Update summary cards
-            document.getElementById('total-conversations').textContent = totalConversations;
-            document.getElementById('avg-score').textContent = avgScore;
-            document.getElementById('best-score').textContent = bestScore;
-            
-            // Prepare chart data
-            const labels = scores.map((s, i) => `Conv ${i + 1}`);
-            const datasets = [
-                {
-                    label: 'Total Score',
-                    data: scores.map(s => s.total_score),
-                    borderColor: 'rgb(99, 102, 241)',
-                    backgroundColor: 'rgba(99, 102, 241, 0.1)',
-                    tension: 0.3,
-                    borderWidth: 3
-                },
-                {
-                    label: 'Professionalism',
-                    data: scores.map(s => s.professionalism),
-                    borderColor: 'rgb(34, 197, 94)',
-                    backgroundColor: 'rgba(34, 197, 94, 0.1)',
-                    tension: 0.3,
-                    borderWidth: 2
-                },
-                {
-                    label: 'Communication',
-                    data: scores.map(s => s.communication),
-                    borderColor: 'rgb(249, 115, 22)',
-                    backgroundColor: 'rgba(249, 115, 22, 0.1)',
-                    tension: 0.3,
-                    borderWidth: 2
-                },
-                {
-                    label: 'Problem Resolution',
-                    data: scores.map(s => s.problem_resolution),
-                    borderColor: 'rgb(236, 72, 153)',
-                    backgroundColor: 'rgba(236, 72, 153, 0.1)',
-                    tension: 0.3,
-                    borderWidth: 2
-                },
-                {
-                    label: 'Empathy',
-                    data: scores.map(s => s.empathy),
-                    borderColor: 'rgb(168, 85, 247)',
-                    backgroundColor: 'rgba(168, 85, 247, 0.1)',
-                    tension: 0.3,
-                    borderWidth: 2
-                },
-                {
-                    label: 'Efficiency',
-                    data: scores.map(s => s.efficiency),
-                    borderColor: 'rgb(14, 165, 233)',
-                    backgroundColor: 'rgba(14, 165, 233, 0.1)',
-                    tension: 0.3,
-                    borderWidth: 2
-                }
-            ];
-            
-            // Destroy existing chart if any
-            if (this.performanceChart) {
-                this.performanceChart.destroy();
+            this.scoreHistory = await this.fetchScores();
+            this.renderAnalytics();
+            this.startScorePolling();
+        } catch (error) {
+            console.error('Failed to load analytics:', error);
+            loading.style.display = 'none';
+            content.style.display = 'block';
+            noData.style.display = 'block';
+            document.querySelector('#no-data-message p').textContent = '⚠️ Failed to load analytics data';
+        }
+    }
+
+    async fetchScores() {
+        // Fetch user scores
+        console.log('Fetching user scores from /api/user/scores');
+        const response = await fetch(`/api/user/scores?limit=${SCORE_HISTORY_LIMIT}`);
+        const data = await response.json();
+        
+        console.log('Scores Count:', data.scores ? data.scores.length : 0);
+        
+        if (!data.success || !data.scores) return [];
+        return data.scores.reverse(); // Oldest to newest for chart
+    }
+
+    isAnalyticsOpen() {
+        return document.getElementById('analytics-modal').style.display === 'block';
+    }
+
+    renderAnalytics() {
+        const loading = document.getElementById('analytics-loading');
+        const content = document.getElementById('analytics-content');
+        const noData = document.getElementById('no-data-message');
+        const scores = this.scoreHistory || [];
+        
+        if (scores.length === 0) {
+            console.warn('No scores found for user');
+            loading.style.display = 'none';
+            content.style.display = 'block';
+            noData.style.display = 'block';
+            return;
+        }
+        
+        this.updateAnalyticsSummary();
+        
+        // Prepare chart data
+        const labels = scores.map((s, i) => `Conv ${i + 1}`);
+        const datasets = [
+            {
+                label: 'Total Score',
+                data: scores.map(s => s.total_score),
+                borderColor: 'rgb(99, 102, 241)',
+                backgroundColor: 'rgba(99, 102, 241, 0.1)',
+                tension: 0.3,
+                borderWidth: 3
+            },
+            {
+                label: 'Professionalism',
+                data: scores.map(s => s.professionalism),
+                borderColor: 'rgb(34, 197, 94)',
+                backgroundColor: 'rgba(34, 197, 94, 0.1)',
+                tension: 0.3,
+                borderWidth: 2
+            },
+            {
+                label: 'Communication',
+                data: scores.map(s => s.communication),
+                borderColor: 'rgb(249, 115, 22)',
+                backgroundColor: 'rgba(249, 115, 22, 0.1)',
+                tension: 0.3,
+                borderWidth: 2
+            },
+            {
+                label: 'Problem Resolution',
+                data: scores.map(s => s.problem_resolution),
+                borderColor: 'rgb(236, 72, 153)',
+                backgroundColor: 'rgba(236, 72, 153, 0.1)',
+                tension: 0.3,
+                borderWidth: 2
+            },
+            {
+                label: 'Empathy',
+                data: scores.map(s => s.empathy),
+                borderColor: 'rgb(168, 85, 247)',
+                backgroundColor: 'rgba(168, 85, 247, 0.1)',
+                tension: 0.3,
+                borderWidth: 2
+            },
+            {
+                label: 'Efficiency',
+                data: scores.map(s => s.efficiency),
+                borderColor: 'rgb(14, 165, 233)',
+                backgroundColor: 'rgba(14, 165, 233, 0.1)',
+                tension: 0.3,
+                borderWidth: 2
             }
-            
-            // Create new chart
-            const ctx = document.getElementById('performance-chart').getContext('2d');
-            this.performanceChart = new Chart(ctx, {
-                type: 'line',
-                data: {
-                    labels: labels,
-                    datasets: datasets
+        ];
+        
+        // Destroy existing chart if any
+        if (this.performanceChart) {
+            this.performanceChart.destroy();
+        }
+        
+        // Create new chart
+        const ctx = document.getElementById('performance-chart').getContext('2d');
+        this.performanceChart = new Chart(ctx, {
+            type: 'line',
+            data: {
+                labels: labels,
+                datasets: datasets
+            },
+            options: {
+                responsive: true,
+                maintainAspectRatio: false,
+                plugins: {
+                    title: {
+                        display: true,
+                        text: 'Performance Metrics Over Time',
+                        font: { size: 16, weight: 'bold' }
+                    },
+                    legend: {
+                        position: 'bottom'
+                    },
+                    tooltip: {
+                        mode: 'index',
+                        intersect: false
+                    }
                 },
-                options: {
-                    responsive: true,
-                    maintainAspectRatio: false,
-                    plugins: {
+                scales: {
+                    y: {
+                        beginAtZero: true,
+                        max: 100,
                         title: {
                             display: true,
-                            text: 'Performance Metrics Over Time',
-                            font: { size: 16, weight: 'bold' }
-                        },
-                        legend: {
-                            position: 'bottom'
-                        },
-                        tooltip: {
-                            mode: 'index',
-                            intersect: false
+                            text: 'Score'
                         }
                     },
-                    scales: {
-                        y: {
-                            beginAtZero: true,
-                            max: 100,
-                            title: {
-                                display: true,
-                                text: 'Score'
-                            }
-                        },
-                        x: {
-                            title: {
-                                display: true,
-                                text: 'Conversations'
-                            }
+                    x: {
+                        title: {
+                            display: true,
+                            text: 'Conversations'
                         }
-                    },
-                    interaction: {
-                        mode: 'nearest',
-                        axis: 'x',
-                        intersect: false
                     }
+                },
+                interaction: {
+                    mode: 'nearest',
+                    axis: 'x',
+                    intersect: false
                 }
-            });
-            
-            // Show content
-            loading.style.display = 'none';
-            content.style.display = 'block';
-            noData.style.display = 'none';
-            
+            }
+        });
+        
+        // Show content
+        loading.style.display = 'none';
+        content.style.display = 'block';
+        noData.style.display = 'none';
+    }
+
+    updateAnalyticsSummary() {
+        const scores = this.scoreHistory;
+        const totalConversations = scores.length;
+        const avgScore = (scores.reduce((sum, s) => sum + s.total_score, 0) / totalConversations).toFixed(1);
+        const bestScore = Math.max(...scores.map(s => s.total_score));
+        
+        document.getElementById('total-conversations').textContent = totalConversations;
+        document.getElementById('avg-score').textContent = avgScore;
+        document.getElementById('best-score').textContent = bestScore;
+    }
+
+    mergeScore(score) {
+        // Upsert by conversation id, ordered by timestamp: duplicates and
+        // out-of-order pushes converge on the same history
+        const history = this.scoreHistory.filter(s => s.conversation_id !== score.conversation_id);
+        let index = history.length;
+        while (index > 0 && (history[index - 1].timestamp || '') > (score.timestamp || '')) index--;
+        history.splice(index, 0, score);
+        this.scoreHistory = history.slice(-SCORE_HISTORY_LIMIT);
+    }
+
+    handleScoreUpdate(delta) {
+        // Compact event from score_events.py: {v, id, t, s: [total, ...criteria], n}
+        if (delta.v !== 1 || !this.scoreHistory) return; // Not loaded yet: the next open fetches it
+        
+        const score = { conversation_id: delta.id, timestamp: delta.t, message_count: delta.n };
+        SCORE_FIELDS.forEach((field, i) => { score[field] = delta.s[i]; });
+        this.mergeScore(score);
+        
+        if (!this.isAnalyticsOpen()) return;
+        if (!this.performanceChart) {
+            this.renderAnalytics();
+            return;
+        }
+        
+        // Update the chart in place: no HTTP request, no Table query, no redraw from scratch
+        const chart = this.performanceChart;
+        chart.data.labels = this.scoreHistory.map((s, i) => `Conv ${i + 1}`);
+        chart.data.datasets.forEach((dataset, i) => {
+            dataset.data = this.scoreHistory.map(s => s[SCORE_FIELDS[i]]);
+        });
+        chart.update();
+        this.updateAnalyticsSummary();
+    }
+
+    async refreshScores() {
+        try {
+            const scores = await this.fetchScores();
+            this.scoreHistory = [];
+            scores.forEach(s => this.mergeScore(s));
+            if (this.isAnalyticsOpen()) this.renderAnalytics();
         } catch (error) {
-            console.error('Failed to load analytics:', error);
-            loading.style.display = 'none';
-            content.style.display = 'block';
-            noData.style.display = 'block';
-            document.querySelector('#no-data-message p').textContent = '⚠️ Failed to load analytics data';
+            console.error('Failed to refresh analytics:', error);
         }
     }
 
+    startScorePolling() {
+        // Fallback only: scores are pushed over the socket while it is connected
+        if (this.scorePollTimer) return;
+        this.scorePollTimer = setInterval(() => {
+            if (!this.isAnalyticsOpen()) {
+                clearInterval(this.scorePollTimer);
+                this.scorePollTimer = null;
+            } else if (!this.socket.connected) {
+                this.refreshScores();
+            }
+        }, SCORE_POLL_INTERVAL_MS);
+    }
+
     escapeHtml(text) {
         const div = document.createElement('div');
         div.textContent = text;
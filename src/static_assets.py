@@ -0,0 +1,100 @@
+"""
+Serving fingerprinted, precompressed static assets
+
+LEARNING NOTES:
+===============
+Flask's default static handler re-reads files through the Python worker,
+never serves precompressed variants and sets a short cache lifetime, so
+every page load re-validates app.js, style.css and Cora.png.
+
+build_assets.py produces content-hashed copies under static/dist/ plus
+.br/.gz variants. This blueprint:
+
+1. Exposes asset_url('js/app.js') to templates, which returns the hashed URL
+   from the manifest (or the plain /static URL if assets were not built)
+2. Serves /assets/<hashed name> choosing the Brotli or gzip variant the
+   browser accepts, with `Cache-Control: immutable` - a hashed URL never
+   changes content, so repeat visits never reach the app server at all
+"""
+import json
+import mimetypes
+import os
+from typing import Dict, Optional
+
+from flask import Blueprint, abort, current_app, request, send_from_directory, url_for
+
+from build_assets import DIST_DIRNAME, MANIFEST_NAME
+
+# One year - the maximum that browsers and CDNs honour
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+assets = Blueprint('assets', __name__)
+
+_manifest: Optional[Dict[str, str]] = None
+_hashed_names: frozenset = frozenset()
+
+
+def _dist_dir() -> str:
+    return os.path.join(current_app.static_folder, DIST_DIRNAME)
+
+
+def load_manifest(reload: bool = False) -> Dict[str, str]:
+    """Load static/dist/manifest.json once"""
+    global _manifest, _hashed_names
+    if _manifest is None or reload:
+        try:
+            with open(os.path.join(_dist_dir(), MANIFEST_NAME)) as f:
+                _manifest = json.load(f)
+        except (OSError, ValueError):
+            _manifest = {}
+        _hashed_names = frozenset(_manifest.values())
+    return _manifest
+
+
+def asset_url(filename: str) -> str:
+    """URL of a static asset - hashed and immutable when assets have been built"""
+    # In debug mode edits to static/ must show up without re-running the build
+    hashed = None if current_app.debug else load_manifest().get(filename)
+    if hashed is None:
+        return url_for('static', filename=filename)
+    return url_for('assets.hashed_asset', filename=hashed)
+
+
+@assets.app_context_processor
+def inject_asset_url():
+    return {"asset_url": asset_url}
+
+
+def _accepted_encodings() -> set:
+    """Encodings the client accepts (ignoring any with q=0)"""
+    accepted = set()
+    for part in request.headers.get('Accept-Encoding', '').split(','):
+        token, _, params = part.strip().partition(';')
+        if token and params.replace(' ', '') not in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'):
+            accepted.add(token.lower())
+    return accepted
+
+
+@assets.route('/assets/<path:filename>')
+def hashed_asset(filename):
+    """Serve a fingerprinted asset, preferring a precompressed variant"""
+    dist_dir = _dist_dir()
+    load_manifest()
+    if filename not in _hashed_names:
+        abort(404)
+
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    accepted = _accepted_encodings()
+    for encoding, suffix in (('br', '.br'), ('gzip', '.gz')):
+        if encoding in accepted and os.path.isfile(os.path.join(dist_dir, filename + suffix)):
+            response = send_from_directory(dist_dir, filename + suffix, mimetype=mimetype,
+                                           max_age=None, conditional=True)
+            response.headers['Content-Encoding'] = encoding
+            break
+    else:
+        response = send_from_directory(dist_dir, filename, mimetype=mimetype,
+                                       max_age=None, conditional=True)
+
+    response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+    response.headers['Vary'] = 'Accept-Encoding'
+    return response
@@ -10,6 +10,10 @@ This module demonstrates enterprise-grade Azure Table Storage integration:
 3. **Error Handling**: Graceful degradation if storage unavailable
 4. **Case Normalization**: Ensures consistent querying with lowercase keys
 5. **Data Serialization**: Properly handles JSON for complex fields
+6. **Outage Tolerance**: Calls go through a circuit breaker (circuit_breaker.py)
+   that fails fast while Table Storage is down; score saves then go to a
+   durable local spool (storage_spool.py) that is replayed in batches when the
+   breaker closes, and dashboard reads are served from the last good result
 
 KEY AZURE CONCEPTS:
 - **PartitionKey**: Groups related entities (we use user_identity for fast user queries)
@@ -24,26 +28,76 @@ SCHEMA DESIGN:
 """
 import os
 import json
+import logging
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime
-from typing import Dict, List, Optional
-from azure.data.tables import TableServiceClient, TableEntity
-from azure.identity import DefaultAzureCredential
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
 from config import Config
+import metrics
+from circuit_breaker import CLOSED, OPEN, STATE_VALUES, CircuitBreaker, CircuitOpen
+from log_service import get_logger
+from storage_spool import StorageSpool
+
+log = get_logger("storage")
 
 class StorageService:
     """Service for managing conversation scores in Azure Table Storage"""
     
-    def __init__(self):
+    # Azure Table Storage limit for one entity group transaction
+    MAX_BATCH_OPERATIONS = 100
+    
+    # Azure Table Storage maximum rows per query page
+    EXPORT_PAGE_SIZE = 1000
+    
+    # Recent scores kept per user for stale reads during an outage
+    READ_CACHE_ROWS = 100
+    
+    # Fields returned by get_user_scores (what the analytics dashboard needs)
+    SUMMARY_FIELDS = ["RowKey", "created_at", "total_score", "professionalism",
+                      "communication", "problem_resolution", "empathy", "efficiency",
+                      "message_count"]
+    
+    def __init__(self, on_score_saved: Optional[Callable[[str, Dict], None]] = None):
         """
         Initialize the storage service with managed identity or connection string
         
+        Args:
+            on_score_saved: Called with (user_identity, entity) after a score is
+                            saved, e.g. to push it to open dashboards (score_events.py)
+        
         LEARNING NOTE: This pattern allows the same code to work in:
         - Local development (using connection string from .env)
         - Production (using managed identity - no secrets needed!)
         """
         self.table_name = "conversationscores"
         self.table_client = None
+        self.on_score_saved = on_score_saved
+        
+        # Token usage ledger (see usage_ledger.py)
+        self.usage_table_name = "tokenusage"
+        self.usage_table_client = None
+        
+        # Fail fast while Table Storage is down (see circuit_breaker.py)
+        self.breaker = CircuitBreaker(
+            "table_storage",
+            failure_threshold=Config.STORAGE_BREAKER_FAILURES,
+            reset_timeout=Config.STORAGE_BREAKER_RESET_SECONDS,
+            slow_call_seconds=Config.STORAGE_SLOW_CALL_SECONDS,
+            on_state_change=self._on_breaker_change
+        )
+        
+        # Last good get_user_scores result per user, served while storage is down
+        self._score_cache: "OrderedDict[str, List[Dict]]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        
+        self.spool: Optional[StorageSpool] = None
+        self._replay_wakeup = threading.Event()
+        self._replayer: Optional[threading.Thread] = None
+        
         self._initialize_storage()
+        self._initialize_spool()
     
     def _initialize_storage(self):
         """
@@ -55,22 +109,30 @@ class StorageService:
         3. If neither works, disable storage (app continues without analytics)
         """
         try:
+            # Azure SDK imports are deferred until storage is first warmed up
+            from azure.data.tables import TableServiceClient
+            from azure.identity import DefaultAzureCredential
+            
             # Try connection string first (for local development)
             # Get from environment: AZURE_STORAGE_CONNECTION_STRING
             connection_string = os.getenv('AZURE_STORAGE_CONNECTION_STRING')
             
+            # A hung request must fail in seconds so the circuit breaker can count it
+            timeouts = {"connection_timeout": Config.STORAGE_TIMEOUT_SECONDS,
+                        "read_timeout": Config.STORAGE_TIMEOUT_SECONDS}
+            
             if connection_string:
-                print("✓ Using Azure Storage connection string (local development)")
-                table_service = TableServiceClient.from_connection_string(connection_string)
+                log.info("storage_auth", method="connection_string")
+                table_service = TableServiceClient.from_connection_string(connection_string, **timeouts)
             else:
                 # Use managed identity in production (Azure Container Apps)
                 # This is MORE SECURE - no secrets to manage!
                 storage_account_name = Config.AZURE_STORAGE_ACCOUNT_NAME
                 if not storage_account_name:
-                    print("⚠ No storage account configured - score storage disabled")
+                    log.warning("storage_disabled", reason="no storage account configured")
                     return
                 
-                print(f"✓ Using managed identity for storage: {storage_account_name}")
+                log.info("storage_auth", method="managed_identity", account=storage_account_name)
                 
                 # DefaultAzureCredential tries multiple authentication methods:
                 # 1. Environment variables (AZURE_CLIENT_ID, etc.)
@@ -79,30 +141,48 @@ class StorageService:
                 # 4. Visual Studio / VS Code credentials
                 credential = DefaultAzureCredential()
                 table_endpoint = f"https://{storage_account_name}.table.core.windows.net"
-                table_service = TableServiceClient(endpoint=table_endpoint, credential=credential)
+                table_service = TableServiceClient(endpoint=table_endpoint, credential=credential, **timeouts)
             
             # Get table client for our specific table
             self.table_client = table_service.get_table_client(self.table_name)
             
-            # Create table if it doesn't exist (idempotent operation)
-            try:
-                self.table_client.create_table()
-                print(f"✓ Created Azure Table: {self.table_name}")
-            except Exception:
-                # Table already exists - this is normal
-                print(f"✓ Azure Table '{self.table_name}' already exists")
+            self.usage_table_client = table_service.get_table_client(self.usage_table_name)
+            
+            # Create tables if they don't exist (idempotent operation)
+            for client in (self.table_client, self.usage_table_client):
+                try:
+                    client.create_table()
+                    log.info("table_created", table=client.table_name)
+                except Exception:
+                    # Table already exists - this is normal
+                    log.debug("table_exists", table=client.table_name)
                 
         except Exception as e:
-            print(f"⚠ Failed to initialize Azure Table Storage: {e}")
-            print("   App will continue without score storage")
+            log.warning("storage_init_failed", error=str(e), impact="app continues without score storage")
             self.table_client = None
+            self.usage_table_client = None
+    
+    def _initialize_spool(self):
+        """Open the local spool (STORAGE_SPOOL_DIR) and start replaying it in the background"""
+        if not Config.STORAGE_SPOOL_DIR or not self.table_client:
+            return
+        try:
+            self.spool = StorageSpool(Config.STORAGE_SPOOL_DIR, fsync=Config.STORAGE_SPOOL_FSYNC)
+        except Exception as e:
+            log.warning("spool_disabled", directory=Config.STORAGE_SPOOL_DIR, error=str(e),
+                        impact="score writes are lost during storage outages")
+            return
+        metrics.STORAGE_SPOOL_DEPTH.set_callback(lambda: self.spool.depth)
+        self._replayer = threading.Thread(target=self._run_replay, name="storage-spool-replay", daemon=True)
+        self._replayer.start()
     
     def save_conversation_score(self, 
                                 conversation_id: str,
                                 user_identity: str,
                                 auth_method: str,
                                 analysis: Dict,
-                                message_count: int) -> bool:
+                                message_count: int,
+                                labels: Optional[Dict] = None) -> bool:
         """
         Save conversation score to Azure Table Storage
         
@@ -112,9 +192,10 @@ class StorageService:
             auth_method: How user authenticated (Azure AD, Local, Anonymous)
             analysis: AI-generated analysis with scores and feedback
             message_count: Number of messages exchanged
+            labels: Metric labels (route, mood) of the request saving the score
             
         Returns:
-            True if successful, False otherwise
+            True if saved (or spooled for a later write), False otherwise
             
         LEARNING NOTES:
         - PartitionKey = user_identity: Groups all conversations for one user
@@ -123,53 +204,120 @@ class StorageService:
         - Normalization to lowercase ensures case-insensitive matching
         """
         if not self.table_client:
-            print("⚠ Table client not initialized - cannot save score")
+            log.sampled("score_not_saved", level=logging.WARNING, reason="table client not initialized")
             return False
         
         try:
-            # IMPORTANT: Normalize to lowercase for case-insensitive queries
-            # Azure Table Storage is case-sensitive, so "user@email.com" != "User@Email.com"
-            user_identity_normalized = user_identity.lower()
-            
-            # Create entity (row) for Table Storage
-            score_entity = TableEntity()
-            
-            # PRIMARY KEYS (required for every entity)
-            score_entity['PartitionKey'] = user_identity_normalized  # Groups related data
-            score_entity['RowKey'] = conversation_id  # Unique within partition
-            
-            # METADATA FIELDS
-            score_entity['created_at'] = datetime.utcnow().isoformat()
-            score_entity['user_identity'] = user_identity_normalized
-            score_entity['auth_method'] = auth_method
-            score_entity['conversation_id'] = conversation_id
-            score_entity['message_count'] = message_count
-            
-            # SCORE FIELDS (all integers 1-5, total 5-25)
-            # These are flattened from the analysis dict for easy querying
-            score_entity['total_score'] = analysis.get('total_score', 0)
-            score_entity['professionalism'] = analysis['scores'].get('professionalism', 0)
-            score_entity['communication'] = analysis['scores'].get('communication', 0)
-            score_entity['problem_resolution'] = analysis['scores'].get('problem_resolution', 0)
-            score_entity['empathy'] = analysis['scores'].get('empathy', 0)
-            score_entity['efficiency'] = analysis['scores'].get('efficiency', 0)
+            score_entity = self.build_score_entity(conversation_id, user_identity, auth_method,
+                                                   analysis, message_count)
             
-            # COMPLEX FIELDS (stored as JSON strings)
-            # Table Storage doesn't natively support arrays, so we JSON-encode them
-            score_entity['strengths'] = json.dumps(analysis.get('strengths', []))
-            score_entity['improvements'] = json.dumps(analysis.get('improvements', []))
-            score_entity['overall_feedback'] = analysis.get('overall_feedback', '')
+            try:
+                # UPSERT: Insert if new, update if exists (safer than insert-only)
+                self._call("write", self.table_client.upsert_entity, score_entity, labels=labels)
+                log.debug("score_saved", conversation_id=conversation_id)
+            except Exception as e:
+                # Storage is down: keep the score locally and write it later. A
+                # rejected entity (4xx) would be rejected again on replay: not spooled
+                if not isinstance(e, CircuitOpen) and not self._is_outage(e):
+                    log.error("score_save_failed", conversation_id=conversation_id, error=str(e))
+                    return False
+                if not self._spool_score(score_entity, e):
+                    return False
+            self._remember_score(score_entity)
             
-            # UPSERT: Insert if new, update if exists (safer than insert-only)
-            self.table_client.upsert_entity(score_entity)
-            print(f"✓ Stored score for conversation {conversation_id} by {user_identity}")
+            if self.on_score_saved:
+                try:
+                    self.on_score_saved(score_entity['PartitionKey'], score_entity)
+                except Exception as e:
+                    # The score is saved; a failed push only means dashboards poll for it
+                    log.sampled("score_publish_failed", conversation_id=conversation_id, error=str(e))
             return True
             
         except Exception as e:
-            print(f"⚠ Failed to store score in Azure Table: {e}")
+            log.error("score_save_failed", conversation_id=conversation_id, error=str(e))
             return False
     
-    def get_user_scores(self, user_identity: str, limit: int = 10) -> List[Dict]:
+    @staticmethod
+    def build_score_entity(conversation_id: str,
+                           user_identity: str,
+                           auth_method: str,
+                           analysis: Dict,
+                           message_count: int,
+                           created_at: Optional[str] = None):
+        """
+        Build the conversationscores entity for one analyzed conversation
+        
+        Shared by save_conversation_score (one row per request) and
+        save_score_batch (bulk loads such as demo_data.py).
+        """
+        # IMPORTANT: Normalize to lowercase for case-insensitive queries
+        # Azure Table Storage is case-sensitive, so "user@email.com" != "User@Email.com"
+        user_identity_normalized = user_identity.lower()
+        
+        # Create entity (row) for Table Storage
+        from azure.data.tables import TableEntity
+        score_entity = TableEntity()
+        
+        # PRIMARY KEYS (required for every entity)
+        score_entity['PartitionKey'] = user_identity_normalized  # Groups related data
+        score_entity['RowKey'] = conversation_id  # Unique within partition
+        
+        # METADATA FIELDS
+        score_entity['created_at'] = created_at or datetime.utcnow().isoformat()
+        score_entity['user_identity'] = user_identity_normalized
+        score_entity['auth_method'] = auth_method
+        score_entity['conversation_id'] = conversation_id
+        score_entity['message_count'] = message_count
+        
+        # SCORE FIELDS (all integers 1-5, total 5-25)
+        # These are flattened from the analysis dict for easy querying
+        score_entity['total_score'] = analysis.get('total_score', 0)
+        score_entity['professionalism'] = analysis['scores'].get('professionalism', 0)
+        score_entity['communication'] = analysis['scores'].get('communication', 0)
+        score_entity['problem_resolution'] = analysis['scores'].get('problem_resolution', 0)
+        score_entity['empathy'] = analysis['scores'].get('empathy', 0)
+        score_entity['efficiency'] = analysis['scores'].get('efficiency', 0)
+        
+        # COMPLEX FIELDS (stored as JSON strings)
+        # Table Storage doesn't natively support arrays, so we JSON-encode them
+        score_entity['strengths'] = json.dumps(analysis.get('strengths', []))
+        score_entity['improvements'] = json.dumps(analysis.get('improvements', []))
+        score_entity['overall_feedback'] = analysis.get('overall_feedback', '')
+        return score_entity
+    
+    def save_score_batch(self, entities: List[Dict]) -> int:
+        """
+        Upsert score entities of ONE partition (user) as entity group transactions
+        
+        Args:
+            entities: Entities from build_score_entity, all with the same PartitionKey
+            
+        Returns:
+            Number of entities written
+            
+        LEARNING NOTES:
+        - A transaction may hold up to 100 operations, all in the same partition
+        - One round trip writes 100 rows instead of one: bulk loads become
+          network-bound on bandwidth rather than latency
+        - Transactions are atomic: a failed batch writes none of its rows
+        """
+        if not self.table_client:
+            return 0
+        
+        written = 0
+        for start in range(0, len(entities), self.MAX_BATCH_OPERATIONS):
+            chunk = entities[start:start + self.MAX_BATCH_OPERATIONS]
+            try:
+                self._call("batch_write", self.table_client.submit_transaction,
+                           [("upsert", entity) for entity in chunk])
+            except Exception as e:
+                log.error("score_batch_failed", partition=chunk[0].get('PartitionKey'),
+                          rows=len(chunk), error=str(e))
+                continue
+            written += len(chunk)
+        return written
+    
+    def get_user_scores(self, user_identity: str, limit: int = 10, labels: Optional[Dict] = None) -> List[Dict]:
         """
         Retrieve recent conversation scores for a user
         
@@ -188,47 +336,101 @@ class StorageService:
         if not self.table_client:
             return []
         
+        # Normalize to lowercase for consistent querying
+        user_identity_normalized = user_identity.lower()
+        escaped = user_identity_normalized.replace("'", "''")
+        
         try:
-            # Normalize to lowercase for consistent querying
-            user_identity_normalized = user_identity.lower()
-            
             # Query all entities for this user (PartitionKey match)
-            # This is efficient because Table Storage indexes PartitionKey
-            entities = self.table_client.query_entities(
-                query_filter=f"PartitionKey eq '{user_identity_normalized}'",
+            # This is efficient because Table Storage indexes PartitionKey.
+            # The query is lazy: pages are fetched while list() iterates
+            entities = self._call("read", lambda: list(self.table_client.query_entities(
+                query_filter=f"PartitionKey eq '{escaped}'",
                 # SELECT only fields we need (reduces network transfer)
-                select=["RowKey", "created_at", "total_score", "professionalism", 
-                       "communication", "problem_resolution", "empathy", "efficiency",
-                       "message_count"]
-            )
-            
-            scores = []
-            for entity in entities:
-                # Skip old records without timestamps (data migration safety)
-                if not entity.get('created_at'):
-                    continue
-                    
-                # Convert entity to dictionary format expected by frontend
-                scores.append({
-                    'conversation_id': entity['RowKey'],
-                    'timestamp': entity.get('created_at', ''),
-                    'total_score': entity.get('total_score', 0),
-                    'professionalism': entity.get('professionalism', 0),
-                    'communication': entity.get('communication', 0),
-                    'problem_resolution': entity.get('problem_resolution', 0),
-                    'empathy': entity.get('empathy', 0),
-                    'efficiency': entity.get('efficiency', 0),
-                    'message_count': entity.get('message_count', 0)
-                })
-            
-            # Sort by timestamp descending (newest first) and apply limit
-            scores.sort(key=lambda x: x['timestamp'] or '', reverse=True)
-            return scores[:limit]
-            
+                select=self.SUMMARY_FIELDS
+            )), labels=labels)
         except Exception as e:
-            print(f"⚠ Failed to retrieve scores: {e}")
-            return []
+            # Storage is down: the last good result beats an empty dashboard
+            with self._cache_lock:
+                cached = self._score_cache.get(user_identity_normalized)
+            if cached is None:
+                log.sampled("scores_read_failed", level=logging.ERROR, error=str(e) or type(e).__name__)
+                return []
+            metrics.STORAGE_STALE_READS_TOTAL.inc()
+            log.sampled("scores_read_stale", level=logging.WARNING, error=str(e) or type(e).__name__)
+            return cached[:limit]
+        
+        # Skip old records without timestamps (data migration safety)
+        scores = [self.score_summary(entity) for entity in entities if entity.get('created_at')]
+        
+        # Sort by timestamp descending (newest first) and apply limit
+        scores.sort(key=lambda x: x['timestamp'] or '', reverse=True)
+        self._cache_scores(user_identity_normalized, scores[:self.READ_CACHE_ROWS])
+        return scores[:limit]
+    
+    @staticmethod
+    def score_summary(entity: Dict) -> Dict:
+        """Convert a score entity to the dictionary format expected by the frontend"""
+        return {
+            'conversation_id': entity['RowKey'],
+            'timestamp': entity.get('created_at', ''),
+            'total_score': entity.get('total_score', 0),
+            'professionalism': entity.get('professionalism', 0),
+            'communication': entity.get('communication', 0),
+            'problem_resolution': entity.get('problem_resolution', 0),
+            'empathy': entity.get('empathy', 0),
+            'efficiency': entity.get('efficiency', 0),
+            'message_count': entity.get('message_count', 0)
+        }
     
+    def iter_score_pages(self,
+                         query_filter: Optional[str] = None,
+                         select: Optional[List[str]] = None,
+                         continuation_token: Optional[Dict] = None,
+                         page_size: int = EXPORT_PAGE_SIZE,
+                         labels: Optional[Dict] = None) -> Iterator[Tuple[List[Dict], Optional[Dict]]]:
+        """
+        Stream conversationscores one service page at a time
+
+        Args:
+            query_filter: OData filter (see score_export.build_filter); None = whole table
+            select: Properties to return (None = all)
+            continuation_token: Resume after the page that returned this token
+            page_size: Rows per request (Table Storage returns at most 1000)
+            labels: Metric labels (route, mood) of the export request
+
+        Yields:
+            (entities of one page, continuation token of the NEXT page or None)
+
+        LEARNING NOTES:
+        - Only one page is held in memory at a time, whatever the table size
+        - The token is what a caller persists to resume an interrupted export
+        - Unlike the other readers, errors are raised: a silently truncated
+          export would look complete
+        """
+        if not self.table_client:
+            return
+
+        if query_filter:
+            entities = self.table_client.query_entities(query_filter=query_filter, select=select,
+                                                        results_per_page=page_size)
+        else:
+            entities = self.table_client.list_entities(select=select, results_per_page=page_size)
+        pages = entities.by_page(continuation_token=continuation_token)
+
+        while True:
+            started = time.perf_counter()
+            try:
+                page = list(next(pages))
+            except StopIteration:
+                return
+            except Exception as e:
+                self._observe("export_page", "error", started, labels)
+                log.error("score_export_page_failed", error=str(e))
+                raise
+            self._observe("export_page", "ok", started, labels)
+            yield page, pages.continuation_token
+
     def get_conversation_score(self, user_identity: str, conversation_id: str) -> Optional[Dict]:
         """
         Retrieve a specific conversation score
@@ -251,10 +453,8 @@ class StorageService:
         try:
             # Point query: Get exact entity by both keys
             # This is the FASTEST query type in Table Storage
-            entity = self.table_client.get_entity(
-                partition_key=user_identity.lower(),
-                row_key=conversation_id
-            )
+            entity = self._call("point_read", self.table_client.get_entity,
+                                partition_key=user_identity.lower(), row_key=conversation_id)
             
             # Return full details including complex fields
             return {
@@ -275,5 +475,195 @@ class StorageService:
             }
             
         except Exception as e:
-            print(f"⚠ Failed to retrieve conversation score: {e}")
+            log.error("score_read_failed", conversation_id=conversation_id, error=str(e))
+            return None
+    
+    def save_usage_records(self, records: List[Dict]) -> int:
+        """
+        Upsert token usage aggregates from the usage ledger
+        
+        Args:
+            records: Dicts with PartitionKey ("<scope>:<key>"), RowKey ("<day>:<replica>"),
+                     prompt_tokens, completion_tokens, total_tokens, turns
+            
+        Returns:
+            Number of records written
+            
+        LEARNING NOTE: Each replica writes its OWN row per scope and day, holding
+        absolute totals. Upserts are therefore idempotent and replicas never
+        overwrite each other's counts; readers sum the rows.
+        """
+        if not self.usage_table_client:
+            return 0
+        
+        written = 0
+        for record in records:
+            try:
+                self._call("usage_write", self.usage_table_client.upsert_entity, record)
+            except CircuitOpen:
+                # The ledger keeps unwritten rows dirty and retries on its next flush
+                break
+            except Exception as e:
+                log.error("usage_save_failed", partition=record.get('PartitionKey'), error=str(e))
+                continue
+            written += 1
+        return written
+    
+    def get_usage_rows(self, partition_key: str, day: str) -> Optional[List[Dict]]:
+        """
+        Retrieve every replica's usage row for one scope and day
+        
+        Uses a PartitionKey match plus a RowKey prefix range ("<day>:" <= RowKey < "<day>;"),
+        which stays inside a single partition.
+        
+        Returns None if the read failed (breaker open included): unlike "no rows",
+        that must not reset the ledger's view of the usage.
+        """
+        if not self.usage_table_client:
+            return []
+        
+        try:
+            escaped = partition_key.replace("'", "''")
+            return self._call("usage_read", lambda: [dict(entity) for entity in self.usage_table_client.query_entities(
+                query_filter=(f"PartitionKey eq '{escaped}' and RowKey ge '{day}:' and RowKey lt '{day};'"),
+                select=["RowKey", "prompt_tokens", "completion_tokens", "total_tokens", "turns"]
+            )])
+        except Exception as e:
+            log.error("usage_read_failed", partition=partition_key, error=str(e) or type(e).__name__)
             return None
+    
+    # ------------------------------------------------------------------
+    # Outage handling: circuit breaker, read cache, spool
+    # ------------------------------------------------------------------
+    def _call(self, operation: str, fn: Callable, *args, labels: Optional[Dict] = None, **kwargs):
+        """
+        Make one Table Storage call through the circuit breaker, recording its latency
+        
+        labels: route and mood of the request the call serves (default: background)
+        
+        Raises CircuitOpen without calling while the breaker is open, or the call's own error.
+        """
+        if not self.breaker.allow():
+            metrics.STORAGE_REJECTED_TOTAL.labels(operation=operation).inc()
+            raise CircuitOpen(self.breaker.name)
+        started = time.perf_counter()
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            self._observe(operation, "error", started, labels)
+            if self._is_outage(e):
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_success()  # e.g. 404: the service answered
+            raise
+        except BaseException:
+            # Interrupted (eventlet.Timeout, GreenletExit, KeyboardInterrupt): the outcome
+            # is unknown, but a half-open probe must never stay claimed
+            self.breaker.record_failure()
+            raise
+        self._observe(operation, "ok", started, labels)
+        self.breaker.record_result(time.perf_counter() - started)
+        return result
+    
+    @staticmethod
+    def _is_outage(error: Exception) -> bool:
+        """
+        Whether an error says the service is unavailable (not e.g. a missing entity)
+        
+        Only 5xx/408/429 answers and azure-core transport errors (no connection, no
+        response) count. Anything else - a 4xx, or a client-side error such as an
+        entity that can't be serialized - would fail the same way on every retry.
+        """
+        status = getattr(error, 'status_code', None)
+        if status is not None:
+            return status >= 500 or status in (408, 429)
+        try:
+            from azure.core.exceptions import ServiceRequestError, ServiceResponseError
+        except ImportError:
+            return False
+        return isinstance(error, (ServiceRequestError, ServiceResponseError))
+    
+    def _on_breaker_change(self, old: str, new: str) -> None:
+        metrics.STORAGE_BREAKER_STATE.set(STATE_VALUES[new])
+        metrics.STORAGE_BREAKER_TRANSITIONS_TOTAL.labels(state=new).inc()
+        (log.warning if new == OPEN else log.info)("storage_breaker_state", state=new, previous=old,
+                reset_seconds=self.breaker.reset_timeout,
+                spool_depth=self.spool.depth if self.spool else None)
+        if new == CLOSED:
+            # Storage is back: replay the spool now rather than at the next tick
+            self._replay_wakeup.set()
+    
+    def _cache_scores(self, user_identity: str, scores: List[Dict]) -> None:
+        with self._cache_lock:
+            self._score_cache[user_identity] = scores
+            self._score_cache.move_to_end(user_identity)
+            while len(self._score_cache) > Config.STORAGE_READ_CACHE_USERS:
+                self._score_cache.popitem(last=False)
+    
+    def _remember_score(self, entity: Dict) -> None:
+        """Add a saved (or spooled) score to its user's cached scores, if cached"""
+        summary = self.score_summary(entity)
+        with self._cache_lock:
+            cached = self._score_cache.get(entity['PartitionKey'])
+            if cached is None:
+                return
+            scores = [s for s in cached if s['conversation_id'] != summary['conversation_id']] + [summary]
+            scores.sort(key=lambda x: x['timestamp'] or '', reverse=True)
+            self._score_cache[entity['PartitionKey']] = scores[:self.READ_CACHE_ROWS]
+    
+    def _spool_score(self, entity: Dict, error: Exception) -> bool:
+        """Keep a score that could not be written in the local spool; False if it is lost"""
+        reason = "breaker_open" if isinstance(error, CircuitOpen) else "error"
+        if self.spool is None:
+            log.error("score_save_failed", conversation_id=entity['RowKey'], reason=reason,
+                      error=str(error) or type(error).__name__)
+            return False
+        try:
+            self.spool.append(entity)
+        except Exception as e:
+            log.error("score_spool_failed", conversation_id=entity['RowKey'], error=str(e),
+                      cause=str(error) or type(error).__name__)
+            return False
+        metrics.STORAGE_SPOOLED_TOTAL.labels(reason=reason).inc()
+        log.sampled("score_spooled", level=logging.WARNING, conversation_id=entity['RowKey'],
+                    reason=reason, spool_depth=self.spool.depth)
+        return True
+    
+    def replay_spool(self) -> int:
+        """
+        Write spooled scores to Table Storage in per-user transactions of up to 100
+        
+        Returns:
+            Number of scores replayed. Stops (keeping the rest) as soon as a batch
+            fails or the breaker is open.
+        """
+        if self.spool is None or not self.spool.depth:
+            return 0
+        
+        def submit(entities: List[Dict]) -> None:
+            self._call("spool_replay", self.table_client.submit_transaction,
+                       [("upsert", entity) for entity in entities])
+            metrics.STORAGE_SPOOL_REPLAYED_TOTAL.inc(len(entities))
+        
+        return self.spool.replay(submit, batch_size=self.MAX_BATCH_OPERATIONS,
+                                 is_retryable=lambda e: isinstance(e, CircuitOpen) or self._is_outage(e))
+    
+    def _run_replay(self) -> None:
+        while True:
+            self._replay_wakeup.wait(Config.STORAGE_SPOOL_REPLAY_SECONDS)
+            self._replay_wakeup.clear()
+            # Once the breaker's reset timeout has passed, the first replayed batch is its probe
+            if self.breaker.rejecting:
+                continue
+            try:
+                self.replay_spool()
+            except Exception as e:
+                log.error("spool_replay_failed", error=str(e))
+    
+    @staticmethod
+    def _observe(operation: str, outcome: str, started: float, labels: Optional[Dict] = None) -> None:
+        """Record Table Storage latency for the /metrics endpoint"""
+        labels = labels or {"route": metrics.ROUTE_BACKGROUND, "mood": metrics.NO_MOOD}
+        metrics.TABLE_OPERATION_SECONDS.labels(operation=operation, outcome=outcome, **labels).observe(
+            time.perf_counter() - started
+        )
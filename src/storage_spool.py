@@ -0,0 +1,202 @@
+"""
+Durable local spool for Table Storage writes that could not be made
+
+LEARNING NOTES:
+===============
+A score is the result of a whole role-play and an analysis call: losing it
+because Table Storage was down for a minute is a bad trade. When a score
+write fails (or the circuit breaker is open, see circuit_breaker.py), the
+entity is appended to a local spool instead, and replayed once storage is
+back:
+
+1. **Crash-safe appends**: each entity is one length-prefixed, checksummed
+   record (see framing.py), flushed and fsynced before the save returns.
+   A crash mid-write leaves a torn tail that replay ignores
+2. **Segments**: records go to spool-NNNNNNNN.log files. Replay seals the
+   current segment first, so new writes never touch a file being replayed
+3. **Batched replay**: records are grouped by PartitionKey and sent as entity
+   group transactions of up to 100 upserts - one round trip per 100 scores
+4. **At-least-once**: a segment is deleted only after every one of its
+   records was written. A replay that fails part-way keeps the segment and
+   retries it later; upserts are idempotent, so a record written twice is
+   harmless
+5. **Poison records set aside**: a batch the service REJECTS (e.g. 400 for
+   a bad entity) would fail forever and block everything queued behind it.
+   Its entities are retried one by one and those still rejected are moved to
+   rejected-NNNNNNNN.log for inspection; replay continues
+
+DIRECTORY LAYOUT (STORAGE_SPOOL_DIR):
+    spool-00000003.log    oldest unreplayed segment
+    spool-00000004.log    segment currently being appended to
+    rejected-00000002.log entities the service refused (never replayed)
+
+KEY CONCEPTS:
+- Entities are stored as JSON; they hold only strings and numbers
+- Point the directory at persistent storage (e.g. an Azure Files mount) so
+  spooled scores survive container replacement as well as process restarts
+"""
+import json
+import os
+import re
+import threading
+from typing import Callable, Dict, List, Optional
+
+from framing import encode_frame, iter_frames
+from log_service import get_logger
+
+log = get_logger("storage_spool")
+
+_SEGMENT = re.compile(r"^spool-(\d{8})\.log$")
+
+
+class StorageSpool:
+    """Append-only, segmented spool of entities waiting to be written"""
+
+    def __init__(self, directory: str, fsync: bool = True, segment_records: int = 1000):
+        """
+        Args:
+            directory: Spool directory (created if missing)
+            fsync: fsync every append (False = survive process restarts only)
+            segment_records: Records per segment file before rotating
+        """
+        self.directory = directory
+        self.fsync = fsync
+        self.segment_records = max(1, segment_records)
+        os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._replay_lock = threading.Lock()
+        self._file = None
+        self._records_in_segment = 0
+
+        # Records left by a previous process are replayed like any other
+        segments = self._segments()
+        self._segment_seq = (self._seq(segments[-1]) + 1) if segments else 0
+        self._depth = sum(len(self._read(path)) for path in segments)
+        if self._depth:
+            log.info("spool_recovered", records=self._depth, segments=len(segments))
+
+    @property
+    def depth(self) -> int:
+        """Records waiting to be replayed"""
+        return self._depth
+
+    def append(self, entity: Dict) -> None:
+        """Durably add one entity (returns once it is on disk)"""
+        record = encode_frame(json.dumps(dict(entity), separators=(",", ":")).encode("utf-8"))
+        with self._lock:
+            if self._file is None:
+                path = os.path.join(self.directory, f"spool-{self._segment_seq:08d}.log")
+                self._file = open(path, "ab")
+                self._segment_seq += 1
+            self._file.write(record)
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+            self._depth += 1
+            self._records_in_segment += 1
+            if self._records_in_segment >= self.segment_records:
+                self._seal()
+
+    def replay(self, submit: Callable[[List[Dict]], None], batch_size: int = 100,
+               is_retryable: Optional[Callable[[Exception], bool]] = None) -> int:
+        """
+        Write spooled entities through `submit`, oldest segment first
+
+        Args:
+            submit: Writes one batch of entities of the SAME partition; raises on failure
+            batch_size: Entities per batch (Table Storage transactions hold at most 100)
+            is_retryable: Whether a failure is transient (outage) rather than a
+                          rejection of the entities; default: every failure is transient
+
+        Returns:
+            Number of records replayed (segments are deleted as they complete).
+            Stops at the first transient failure; the rest stays spooled.
+            Rejected entities are set aside and count as handled.
+        """
+        is_retryable = is_retryable or (lambda e: True)
+        if not self._replay_lock.acquire(blocking=False):
+            return 0  # Another replay is already draining the spool
+        try:
+            with self._lock:
+                self._seal()
+                segments = self._segments()
+            replayed = 0
+            for path in segments:
+                entities = self._read(path)
+                partitions: Dict[str, List[Dict]] = {}
+                for entity in entities:
+                    partitions.setdefault(entity.get("PartitionKey", ""), []).append(entity)
+                try:
+                    for batch_entities in partitions.values():
+                        for start in range(0, len(batch_entities), batch_size):
+                            self._submit_batch(submit, batch_entities[start:start + batch_size],
+                                               is_retryable, path)
+                except Exception as e:
+                    log.warning("spool_replay_stopped", segment=os.path.basename(path),
+                                replayed=replayed, remaining=self._depth, error=str(e))
+                    return replayed
+                os.remove(path)
+                with self._lock:
+                    self._depth -= len(entities)
+                replayed += len(entities)
+            if replayed:
+                log.info("spool_replayed", records=replayed, remaining=self._depth)
+            return replayed
+        finally:
+            self._replay_lock.release()
+
+    def _submit_batch(self, submit, entities: List[Dict], is_retryable, segment: str) -> None:
+        """Submit one batch; entities the service rejects are set aside instead of raising"""
+        try:
+            submit(entities)
+            return
+        except Exception as e:
+            if is_retryable(e):
+                raise
+            if len(entities) == 1:
+                self._set_aside(entities, segment, e)
+                return
+        # A transaction fails as a whole: find the rejected entities one by one
+        for entity in entities:
+            try:
+                submit([entity])
+            except Exception as e:
+                if is_retryable(e):
+                    raise
+                self._set_aside([entity], segment, e)
+
+    def _set_aside(self, entities: List[Dict], segment: str, error: Exception) -> None:
+        path = os.path.join(self.directory, "rejected-" + os.path.basename(segment)[len("spool-"):])
+        with open(path, "ab") as f:
+            for entity in entities:
+                f.write(encode_frame(json.dumps(entity, separators=(",", ":")).encode("utf-8")))
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+        log.error("spool_entity_rejected", row_key=entities[0].get("RowKey"), count=len(entities),
+                  rejected_file=os.path.basename(path), error=str(error))
+
+    def close(self) -> None:
+        with self._lock:
+            self._seal()
+
+    def _seal(self) -> None:
+        """Close the current segment (caller holds the lock); the next append starts a new one"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            self._records_in_segment = 0
+
+    def _segments(self) -> List[str]:
+        names = sorted(name for name in os.listdir(self.directory) if _SEGMENT.match(name))
+        return [os.path.join(self.directory, name) for name in names]
+
+    @staticmethod
+    def _seq(path: str) -> int:
+        return int(_SEGMENT.match(os.path.basename(path)).group(1))
+
+    @staticmethod
+    def _read(path: str) -> List[Dict]:
+        with open(path, "rb") as f:
+            return [json.loads(payload) for payload in iter_frames(f)]
@@ -0,0 +1,208 @@
+"""
+Opt-in recorder of anonymized interaction traces for record-and-replay load tests
+
+LEARNING NOTES:
+===============
+Synthetic load (demo_data.py, fixed-rate scripts) doesn't look like real
+training sessions: real turns vary in length, trainees pause to think, moods
+are not uniform and some conversations are analyzed while others are
+abandoned. Performance work needs that shape, not the content.
+
+When TRAFFIC_RECORD_DIR is set, every new conversation, customer turn
+(send_message) and analysis appends one small event to a trace file:
+
+    {"t": 1718000000.123, "ev": "send_message", "c": "3f9a1c0e5b2d", "u": "9c1e...",
+     "mood": "frustrated", "in_chars": 84, "out_chars": 231, "prompt_tokens": 912,
+     "completion_tokens": 58, "latency_ms": 1840.2, "outcome": "ok"}
+
+replay_traffic.py drives those traces against a local mock model backend at
+1x or accelerated speed and reports latency distributions.
+
+KEY CONCEPTS:
+- **Anonymized**: no message text is ever recorded, only sizes and timings;
+  conversation and user ids are replaced by keyed hashes (HMAC with a random
+  per-process key, or TRAFFIC_RECORD_SALT to correlate across replicas)
+- **Whole sessions**: sampling is per conversation, so a sampled conversation
+  is recorded from start to finish and its pacing survives replay
+- **Compact**: events are buffered and written in batches, each batch one
+  zlib-compressed, checksummed frame (see framing.py); a crash loses at most
+  the unflushed batch and never corrupts earlier ones
+- **Off the hot path**: record() only appends to a list; a background thread
+  compresses and writes
+"""
+import hashlib
+import hmac
+import json
+import os
+import socket
+import threading
+import time
+import zlib
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional
+
+from framing import encode_frame, iter_frames
+from log_service import get_logger
+
+log = get_logger("traffic")
+
+TRACE_FORMAT = "cora-trace"
+TRACE_VERSION = 1
+TRACE_SUFFIX = ".trace"
+
+# Event types
+NEW_CONVERSATION = "new_conversation"
+SEND_MESSAGE = "send_message"
+ANALYZE = "analyze"
+
+
+class TrafficRecorder:
+    """
+    Buffered, anonymizing trace writer (a no-op unless a directory is given)
+
+    Args:
+        directory: Where trace files are written (None/empty = disabled)
+        sample_rate: Fraction of conversations recorded (0-1)
+        salt: Key for the id hashes (random per process if empty)
+        flush_interval: Seconds between batch writes
+        max_buffer: Events held in memory; beyond this new events are dropped
+    """
+
+    def __init__(self, directory: Optional[str], sample_rate: float = 1.0, salt: Optional[str] = None,
+                 flush_interval: float = 5.0, max_buffer: int = 50000):
+        self.directory = directory or None
+        self.sample_rate = max(0.0, min(1.0, sample_rate))
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+        self._key = salt.encode() if salt else os.urandom(16)
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._buffer: List[Dict] = []
+        self._dropped = 0
+        self._recorded = 0
+        self._path: Optional[str] = None
+        self._file = None
+        self._flusher: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    @property
+    def enabled(self) -> bool:
+        return self.directory is not None
+
+    @property
+    def path(self) -> Optional[str]:
+        return self._path
+
+    def anonymize(self, value: str) -> str:
+        return hmac.new(self._key, value.encode(), hashlib.sha256).hexdigest()[:12]
+
+    def _sampled(self, conversation_hash: str) -> bool:
+        return self.sample_rate >= 1.0 or int(conversation_hash[:8], 16) / 0xFFFFFFFF < self.sample_rate
+
+    # ------------------------------------------------------------------
+    # Recording
+    # ------------------------------------------------------------------
+    def record(self, event: str, conversation_id: str, user_identity: Optional[str] = None,
+               at: Optional[float] = None, **fields) -> None:
+        """
+        Append one event (cheap; never raises on the request path)
+
+        Args:
+            event: NEW_CONVERSATION, SEND_MESSAGE or ANALYZE
+            conversation_id: Real id - only its keyed hash is stored
+            user_identity: Real identity - only its keyed hash is stored
+            at: Arrival time (epoch seconds); defaults to now
+            **fields: Sizes, counts, latency, mood, outcome... (never text)
+        """
+        if not self.enabled:
+            return
+        conversation_hash = self.anonymize(conversation_id)
+        if not self._sampled(conversation_hash):
+            return
+        entry = {"t": round(at if at is not None else time.time(), 3), "ev": event, "c": conversation_hash}
+        if user_identity:
+            entry["u"] = self.anonymize(user_identity.lower())
+        entry.update((k, v) for k, v in fields.items() if v is not None)
+        with self._lock:
+            if len(self._buffer) >= self.max_buffer:
+                self._dropped += 1
+                return
+            self._buffer.append(entry)
+
+    # ------------------------------------------------------------------
+    # Writing
+    # ------------------------------------------------------------------
+    def _open(self) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        name = f"traffic-{socket.gethostname()}-{datetime.utcnow().strftime('%Y%m%dT%H%M%S')}-{os.getpid()}"
+        self._path = os.path.join(self.directory, name + TRACE_SUFFIX)
+        self._file = open(self._path, "ab")
+        header = {"format": TRACE_FORMAT, "version": TRACE_VERSION, "started": time.time(),
+                  "sample_rate": self.sample_rate}
+        self._file.write(encode_frame(zlib.compress(json.dumps(header).encode())))
+        self._file.flush()
+        log.info("traffic_recording", path=self._path, sample_rate=self.sample_rate)
+
+    def flush(self) -> int:
+        """Write buffered events as one compressed frame; returns the number written"""
+        with self._lock:
+            events, self._buffer = self._buffer, []
+            dropped, self._dropped = self._dropped, 0
+        if dropped:
+            log.warning("traffic_events_dropped", dropped=dropped, max_buffer=self.max_buffer)
+        if not events:
+            return 0
+        payload = "\n".join(json.dumps(e, separators=(",", ":")) for e in events).encode()
+        with self._write_lock:
+            if self._file is None:
+                self._open()
+            self._file.write(encode_frame(zlib.compress(payload, 6)))
+            self._file.flush()
+            self._recorded += len(events)
+        return len(events)
+
+    def start(self) -> None:
+        """Start the periodic flush thread (idempotent; no-op when disabled)"""
+        if not self.enabled or self._flusher is not None:
+            return
+        self._flusher = threading.Thread(target=self._run, name="traffic-recorder-flush", daemon=True)
+        self._flusher.start()
+
+    def stop(self) -> None:
+        """Stop the flush thread, write pending events and close the trace"""
+        self._stop.set()
+        if not self.enabled:
+            return
+        try:
+            self.flush()
+        finally:
+            with self._write_lock:
+                if self._file is not None:
+                    self._file.close()
+                    self._file = None
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception as e:
+                log.error("traffic_flush_failed", error=str(e))
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            buffered = len(self._buffer)
+        return {"enabled": self.enabled, "path": self._path, "recorded": self._recorded,
+                "buffered": buffered, "sample_rate": self.sample_rate}
+
+
+def read_trace(path: str) -> Iterator[Dict]:
+    """Yield the events of a trace file in order (the header frame is skipped)"""
+    with open(path, "rb") as f:
+        frames = iter_frames(f)
+        first = next(frames, None)
+        header = json.loads(zlib.decompress(first)) if first else {}
+        if header.get("format") != TRACE_FORMAT:
+            raise ValueError(f"{path} is not a {TRACE_FORMAT} file")
+        for frame in frames:
+            for line in zlib.decompress(frame).splitlines():
+                yield json.loads(line)
@@ -0,0 +1,386 @@
+"""
+Token usage ledger and budget enforcement
+
+LEARNING NOTES:
+===============
+Every model call reports prompt/completion tokens, but nothing accumulated
+them, so one runaway conversation could consume a shared deployment's
+tokens-per-minute (TPM) quota at everyone else's expense.
+
+The ledger:
+
+1. **Aggregates** tokens in memory per user per day, per conversation, and
+   per day overall (cheap: a dict update per turn, no I/O on the request path)
+2. **Enforces budgets** with graceful degradation:
+   - below the soft budget: normal replies
+   - over the soft budget: max_tokens is capped (shorter replies)
+   - at the hard budget: new turns are refused until the next day / a new conversation
+3. **Flushes periodically** to Azure Table Storage ("tokenusage" table) so
+   usage survives restarts and is visible across replicas
+
+SCHEMA DESIGN (tokenusage table):
+- PartitionKey: "<scope>:<key>" (user:alice@contoso.com, conversation:<uuid>, day:all)
+- RowKey: "<YYYY-MM-DD>:<replica>" - each replica owns its own row, so
+  upserts of absolute totals never clobber another replica's counts.
+  Conversation rows use "lifetime:<replica>": a conversation's budget does
+  not reset at midnight
+- A replica reads the other replicas' rows for a user or conversation when it
+  first checks it, and again at most once per flush interval after that, so
+  budgets hold (with flush-interval lag) across replicas. Its own row is read
+  once too, so a restarted replica continues its counts instead of
+  overwriting them
+"""
+import os
+import socket
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, Optional, Tuple
+
+from log_service import get_logger
+
+log = get_logger("usage")
+
+SCOPE_USER = "user"
+SCOPE_CONVERSATION = "conversation"
+SCOPE_DAY = "day"
+
+# Day slot of conversation aggregates: they span days
+LIFETIME = "lifetime"
+
+# Seconds before a failed baseline read is retried (capped at the flush interval)
+BASELINE_RETRY_SECONDS = 5.0
+
+_FIELDS = ("prompt_tokens", "completion_tokens", "total_tokens", "turns")
+
+
+def _today() -> str:
+    return datetime.now(timezone.utc).strftime("%Y-%m-%d")
+
+
+def _replica_name() -> str:
+    # Container Apps sets CONTAINER_APP_REPLICA_NAME; fall back to the hostname
+    return os.getenv("CONTAINER_APP_REPLICA_NAME") or socket.gethostname()
+
+
+class BudgetDecision:
+    """Outcome of a budget check for one turn"""
+
+    __slots__ = ("allowed", "max_tokens", "degraded", "reason", "retry_after")
+
+    def __init__(self, allowed: bool, max_tokens: int, degraded: bool = False,
+                 reason: Optional[str] = None, retry_after: Optional[int] = None):
+        self.allowed = allowed
+        self.max_tokens = max_tokens
+        self.degraded = degraded
+        self.reason = reason
+        self.retry_after = retry_after
+
+    def to_dict(self) -> Dict:
+        return {
+            "allowed": self.allowed,
+            "max_tokens": self.max_tokens,
+            "degraded": self.degraded,
+            "reason": self.reason,
+            "retry_after": self.retry_after,
+        }
+
+
+class UsageLedger:
+    """In-memory token aggregates with soft/hard budgets and periodic flushing"""
+
+    def __init__(self,
+                 storage=None,
+                 user_daily_soft: int = 0,
+                 user_daily_hard: int = 0,
+                 conversation_soft: int = 0,
+                 conversation_hard: int = 0,
+                 degraded_max_tokens: int = 200,
+                 flush_interval: float = 60.0,
+                 conversation_idle: float = 86400.0,
+                 replica: Optional[str] = None,
+                 clock: Callable[[], str] = _today):
+        """
+        Args:
+            storage: StorageService (or None to keep usage in memory only)
+            user_daily_soft / user_daily_hard: Tokens per user per UTC day (0 = unlimited)
+            conversation_soft / conversation_hard: Tokens per conversation (0 = unlimited)
+            degraded_max_tokens: max_tokens used once a soft budget is exceeded
+            flush_interval: Seconds between flushes to storage (and between
+                baseline refreshes of a user or conversation)
+            conversation_idle: Seconds after its last check or turn that a
+                conversation's aggregates are dropped from memory
+        """
+        self.storage = storage
+        self.user_daily_soft = user_daily_soft
+        self.user_daily_hard = user_daily_hard
+        self.conversation_soft = conversation_soft
+        self.conversation_hard = conversation_hard
+        self.degraded_max_tokens = degraded_max_tokens
+        self.flush_interval = flush_interval
+        self.conversation_idle = conversation_idle
+        self.replica = replica or _replica_name()
+        self._clock = clock
+
+        self._lock = threading.Lock()
+        # (scope, key, day) -> this replica's counters
+        self._local: Dict[Tuple[str, str, str], Dict[str, int]] = {}
+        # (scope, key, day) -> other replicas' totals, refreshed from storage
+        self._baseline: Dict[Tuple[str, str, str], Dict[str, int]] = {}
+        # (scope, key, day) -> monotonic time the baseline is due for a refresh
+        self._next_load: Dict[Tuple[str, str, str], float] = {}
+        # Keys whose _local already includes this replica's stored row
+        self._seeded: set = set()
+        # Conversation key -> monotonic time it was last checked or recorded
+        self._touched: Dict[Tuple[str, str, str], float] = {}
+        self._dirty: set = set()
+        self._flusher: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    # ------------------------------------------------------------------
+    # Recording
+    # ------------------------------------------------------------------
+    def record(self, user_identity: str, conversation_id: str,
+               prompt_tokens: int, completion_tokens: int) -> None:
+        """Add one turn's token usage to the user, conversation and day aggregates"""
+        day = self._clock()
+        user = user_identity.lower()
+        delta = {
+            "prompt_tokens": int(prompt_tokens or 0),
+            "completion_tokens": int(completion_tokens or 0),
+            "total_tokens": int(prompt_tokens or 0) + int(completion_tokens or 0),
+            "turns": 1,
+        }
+        with self._lock:
+            self._touched[(SCOPE_CONVERSATION, conversation_id, LIFETIME)] = time.monotonic()
+            for key in ((SCOPE_USER, user, day),
+                        (SCOPE_CONVERSATION, conversation_id, LIFETIME),
+                        (SCOPE_DAY, "all", day)):
+                counters = self._local.setdefault(key, dict.fromkeys(_FIELDS, 0))
+                for field, value in delta.items():
+                    counters[field] += value
+                self._dirty.add(key)
+
+    def _total(self, key: Tuple[str, str, str]) -> int:
+        """Total tokens for a key across replicas (caller holds the lock)"""
+        local = self._local.get(key)
+        baseline = self._baseline.get(key)
+        return ((local["total_tokens"] if local else 0)
+                + (baseline["total_tokens"] if baseline else 0))
+
+    # ------------------------------------------------------------------
+    # Enforcement
+    # ------------------------------------------------------------------
+    def check(self, user_identity: str, conversation_id: str, default_max_tokens: int) -> BudgetDecision:
+        """
+        Decide whether a new turn may run, and with which max_tokens
+
+        Refuses at a hard budget, caps max_tokens at degraded_max_tokens over a
+        soft budget, and never lets max_tokens exceed what is left of a hard budget.
+        """
+        day = self._clock()
+        user_key = (SCOPE_USER, user_identity.lower(), day)
+        conversation_key = (SCOPE_CONVERSATION, conversation_id, LIFETIME)
+        with self._lock:
+            self._touched[conversation_key] = time.monotonic()
+        self._ensure_baseline(user_key)
+        self._ensure_baseline(conversation_key)
+
+        with self._lock:
+            user_used = self._total(user_key)
+            conversation_used = self._total(conversation_key)
+
+        if self.user_daily_hard and user_used >= self.user_daily_hard:
+            return BudgetDecision(False, 0, reason="user_daily_budget_exhausted",
+                                  retry_after=self._seconds_until_midnight())
+        if self.conversation_hard and conversation_used >= self.conversation_hard:
+            return BudgetDecision(False, 0, reason="conversation_budget_exhausted")
+
+        max_tokens = default_max_tokens
+        degraded = False
+        reason = None
+        if ((self.user_daily_soft and user_used >= self.user_daily_soft)
+                or (self.conversation_soft and conversation_used >= self.conversation_soft)):
+            max_tokens = min(max_tokens, self.degraded_max_tokens)
+            degraded = True
+            reason = "soft_budget_exceeded"
+
+        # Never let a single reply overshoot the hard budgets
+        for hard, used in ((self.user_daily_hard, user_used), (self.conversation_hard, conversation_used)):
+            if hard:
+                max_tokens = min(max_tokens, max(1, hard - used))
+        return BudgetDecision(True, max_tokens, degraded=degraded, reason=reason)
+
+    @staticmethod
+    def _seconds_until_midnight() -> int:
+        now = datetime.now(timezone.utc)
+        return int(86400 - (now.hour * 3600 + now.minute * 60 + now.second))
+
+    def _ensure_baseline(self, key: Tuple[str, str, str]) -> None:
+        """Load other replicas' usage for a key when first checked, then once per flush interval"""
+        now = time.monotonic()
+        with self._lock:
+            if self.storage is None or now < self._next_load.get(key, float("-inf")):
+                return
+            # Claim the refresh first so concurrent checks don't query twice
+            self._next_load[key] = now + self.flush_interval
+        if not self._load_baseline(key):
+            with self._lock:
+                self._next_load[key] = now + min(self.flush_interval, BASELINE_RETRY_SECONDS)
+
+    def _load_baseline(self, key: Tuple[str, str, str]) -> bool:
+        """Read every replica's row for a key; False (nothing changed) if the read failed"""
+        scope, identifier, day = key
+        try:
+            rows = self.storage.get_usage_rows(f"{scope}:{identifier}", day)
+        except Exception as e:
+            rows = None
+            log.warning("usage_baseline_failed", scope=scope, error=str(e))
+        if rows is None:
+            return False  # Keep the previous baseline; the key stays unseeded if it was
+        totals = dict.fromkeys(_FIELDS, 0)
+        own = None
+        for row in rows:
+            if row.get("RowKey") == f"{day}:{self.replica}":
+                own = row
+                continue
+            for field in _FIELDS:
+                totals[field] += int(row.get(field, 0) or 0)
+        with self._lock:
+            self._baseline[key] = totals
+            if key not in self._seeded:
+                # Our own row holds counts from before a restart or an eviction;
+                # after this, _local is the source of truth for it
+                self._seeded.add(key)
+                if own is not None:
+                    counters = self._local.setdefault(key, dict.fromkeys(_FIELDS, 0))
+                    for field in _FIELDS:
+                        counters[field] += int(own.get(field, 0) or 0)
+        return True
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+    def flush(self) -> int:
+        """Write dirty aggregates to storage; returns the number of rows written"""
+        if self.storage is not None:
+            # Rows hold absolute totals: one is only written once _local includes
+            # this replica's stored counts, or a restart would overwrite them
+            with self._lock:
+                unseeded = [key for key in self._dirty if key not in self._seeded]
+            for key in unseeded:
+                self._load_baseline(key)
+        with self._lock:
+            dirty = [key for key in self._dirty if self.storage is None or key in self._seeded]
+            self._dirty.difference_update(dirty)
+            records = []
+            for scope, identifier, day in dirty:
+                counters = self._local.get((scope, identifier, day))
+                if counters is None:
+                    continue
+                record = {
+                    "PartitionKey": f"{scope}:{identifier}",
+                    "RowKey": f"{day}:{self.replica}",
+                    "scope": scope,
+                    "day": day,
+                    "replica": self.replica,
+                    "updated_at": datetime.now(timezone.utc).isoformat(),
+                }
+                record.update(counters)
+                records.append(record)
+        if not records or self.storage is None:
+            with self._lock:
+                self._evict_old_days()
+            return 0
+        written = self.storage.save_usage_records(records)
+        with self._lock:
+            if written < len(records):
+                # Rows hold absolute totals, so rewriting all of them next time is safe
+                self._dirty.update(dirty)
+            self._evict_old_days()
+        log.debug("usage_flushed", rows=written, pending=len(records) - written)
+        return written
+
+    def _evict_old_days(self) -> None:
+        """Drop flushed aggregates of previous days and idle conversations (caller holds the lock)"""
+        today = self._clock()
+        idle_before = time.monotonic() - self.conversation_idle
+
+        def stale(key):
+            if key in self._dirty:
+                return False
+            if key[2] == LIFETIME:
+                return self._touched.get(key, float("-inf")) < idle_before
+            return key[2] != today
+
+        keys = set(self._local) | set(self._baseline) | set(self._next_load) | set(self._touched)
+        for key in [k for k in keys if stale(k)]:
+            for store in (self._local, self._baseline, self._next_load, self._touched):
+                store.pop(key, None)
+            self._seeded.discard(key)
+
+    def start(self) -> None:
+        """Start the periodic flush thread (idempotent)"""
+        if self._flusher is not None:
+            return
+        self._flusher = threading.Thread(target=self._run, name="usage-ledger-flush", daemon=True)
+        self._flusher.start()
+
+    def stop(self) -> None:
+        """Stop the flush thread and write any pending usage"""
+        self._stop.set()
+        self.flush()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception as e:
+                log.error("usage_flush_failed", error=str(e))
+
+    # ------------------------------------------------------------------
+    # Reporting
+    # ------------------------------------------------------------------
+    def budgets(self) -> Dict:
+        return {
+            "user_daily_soft": self.user_daily_soft,
+            "user_daily_hard": self.user_daily_hard,
+            "conversation_soft": self.conversation_soft,
+            "conversation_hard": self.conversation_hard,
+            "degraded_max_tokens": self.degraded_max_tokens,
+        }
+
+    def report(self, user_identity: Optional[str] = None) -> Dict:
+        """
+        Usage report for today
+
+        With user_identity: that user's usage and remaining budget.
+        Without: per-user and overall totals, plus the lifetime totals of
+        conversations still in memory (admin view).
+        """
+        day = self._clock()
+        with self._lock:
+            def merged(key):
+                totals = dict.fromkeys(_FIELDS, 0)
+                for source in (self._local.get(key), self._baseline.get(key)):
+                    if source:
+                        for field in _FIELDS:
+                            totals[field] += source[field]
+                return totals
+
+            if user_identity is not None:
+                usage = merged((SCOPE_USER, user_identity.lower(), day))
+                remaining = (max(0, self.user_daily_hard - usage["total_tokens"])
+                             if self.user_daily_hard else None)
+                return {"day": day, "usage": usage, "remaining_today": remaining,
+                        "budgets": self.budgets()}
+
+            keys = set(self._local) | set(self._baseline)
+            return {
+                "day": day,
+                "replica": self.replica,
+                "total": merged((SCOPE_DAY, "all", day)),
+                "users": {k[1]: merged(k) for k in keys if k[0] == SCOPE_USER and k[2] == day},
+                "conversations": {k[1]: merged(k) for k in keys if k[0] == SCOPE_CONVERSATION},
+                "budgets": self.budgets(),
+            }
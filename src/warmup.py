@@ -0,0 +1,181 @@
+"""
+Lazy service initialization and concurrent warm-up
+
+LEARNING NOTES:
+===============
+Constructing the voice agent fetches an Entra ID token and builds an OpenAI
+client; constructing the storage service calls create_table() over the
+network. Doing that at import time means the container cannot bind its port
+(or answer health probes) until every external dependency has answered, which
+slows scale-from-zero and makes every test import slow.
+
+This module wraps each external client in a LazyService:
+
+1. **Lazy**: nothing is constructed at import time
+2. **Concurrent warm-up**: WarmupCoordinator.start() initializes all services
+   in parallel background threads while the server is already listening
+3. **On demand**: the first request that needs a service before warm-up has
+   finished simply waits for it (or initializes it itself)
+4. **Observable**: /healthz (liveness) answers immediately, /readyz
+   (readiness) reports 503 until the required services are warm
+
+KEY CONCEPTS:
+- Liveness = "the process is responsive" (restart me if not)
+- Readiness = "send me traffic" (take me out of rotation if not)
+- A failed required service is retried in the background, so a transient
+  token or network error does not leave the replica permanently unready
+"""
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from log_service import get_logger
+
+log = get_logger("app")
+
+PENDING = "pending"
+WARMING = "warming"
+READY = "ready"
+FAILED = "failed"
+
+
+class LazyService:
+    """
+    Proxy that constructs a service on first use
+
+    Attribute access is forwarded to the underlying instance, so callers can
+    keep writing `voice_agent.process_message(...)`.
+    """
+
+    def __init__(self, name: str, factory: Callable[[], object], required: bool = True):
+        self._name = name
+        self._factory = factory
+        self._required = required
+        self._instance = None
+        self._lock = threading.Lock()
+        self._state = PENDING
+        self._error: Optional[str] = None
+        self._duration: Optional[float] = None
+        self._last_attempt: Optional[float] = None
+
+    @property
+    def name(self) -> str:
+        return self._name
+
+    @property
+    def required(self) -> bool:
+        return self._required
+
+    @property
+    def state(self) -> str:
+        return self._state
+
+    @property
+    def last_attempt(self) -> Optional[float]:
+        return self._last_attempt
+
+    def get(self):
+        """Return the service instance, constructing it if needed"""
+        instance = self._instance
+        if instance is not None:
+            return instance
+        with self._lock:
+            if self._instance is None:
+                self._initialize()
+            return self._instance
+
+    def _initialize(self) -> None:
+        self._state = WARMING
+        self._last_attempt = time.monotonic()
+        started = time.perf_counter()
+        try:
+            instance = self._factory()
+        except Exception as e:
+            self._state = FAILED
+            self._error = str(e)
+            self._duration = time.perf_counter() - started
+            log.error("service_warmup_failed", service=self._name, error=str(e),
+                      duration_ms=round(self._duration * 1000, 1))
+            raise
+        self._instance = instance
+        self._state = READY
+        self._error = None
+        self._duration = time.perf_counter() - started
+        log.info("service_ready", service=self._name, duration_ms=round(self._duration * 1000, 1))
+
+    def warm(self) -> bool:
+        """Initialize without raising; returns True when the service is ready"""
+        try:
+            self.get()
+            return True
+        except Exception:
+            return False
+
+    def status(self) -> Dict:
+        return {
+            "state": self._state,
+            "required": self._required,
+            "duration_ms": round(self._duration * 1000, 1) if self._duration is not None else None,
+            "error": self._error,
+        }
+
+    def __getattr__(self, item):
+        # Only called for attributes not found on the proxy itself
+        if item.startswith("__"):
+            raise AttributeError(item)
+        return getattr(self.get(), item)
+
+
+class WarmupCoordinator:
+    """Starts concurrent warm-up of lazy services and reports readiness"""
+
+    def __init__(self, services: List[LazyService], retry_interval: float = 30.0):
+        self.services = services
+        self.retry_interval = retry_interval
+        self.created_at = time.monotonic()
+        self.started_at: Optional[float] = None
+        self.ready_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        """Warm every service in its own background thread (idempotent)"""
+        with self._lock:
+            if self.started_at is not None:
+                return
+            self.started_at = time.monotonic()
+        for service in self.services:
+            self._spawn(service)
+
+    def _spawn(self, service: LazyService) -> None:
+        thread = threading.Thread(target=self._warm, args=(service,),
+                                  name=f"warmup-{service.name}", daemon=True)
+        thread.start()
+
+    def _warm(self, service: LazyService) -> None:
+        service.warm()
+        if self.is_ready():
+            with self._lock:
+                if self.ready_at is None:
+                    self.ready_at = time.monotonic()
+                    log.info("replica_ready",
+                             warmup_ms=round((self.ready_at - self.started_at) * 1000, 1))
+
+    def is_ready(self) -> bool:
+        return all(s.state == READY for s in self.services if s.required)
+
+    def readiness(self) -> Dict:
+        """Readiness report; retries failed required services in the background"""
+        now = time.monotonic()
+        for service in self.services:
+            if (service.required and service.state == FAILED and service.last_attempt is not None
+                    and now - service.last_attempt >= self.retry_interval):
+                self._spawn(service)
+        return {
+            "ready": self.is_ready(),
+            "warmup_started": self.started_at is not None,
+            "uptime_seconds": round(now - self.created_at, 3),
+            "time_to_ready_seconds": (
+                round(self.ready_at - self.started_at, 3) if self.ready_at is not None else None
+            ),
+            "services": {s.name: s.status() for s in self.services},
+        }